@@ -1,12 +1,15 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as DjangoUserAdmin
-from .models import StudentProfile, Request, User, MentorProfile, Proposal, Meeting
+from .models import StudentProfile, Request, User, MentorProfile, Proposal, Meeting, Skill, EmailOutbox, Notification
 
 admin.site.register(StudentProfile)
 admin.site.register(Request)
 admin.site.register(MentorProfile)
 admin.site.register(Proposal)
 admin.site.register(Meeting)
+admin.site.register(Skill)
+admin.site.register(EmailOutbox)
+admin.site.register(Notification)
 
 @admin.register(User)
 class UserAdmin(DjangoUserAdmin):
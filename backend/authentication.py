@@ -0,0 +1,128 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+
+from .cache import LocalTTLCache, is_process_local
+from .tokens import ROLE_CLAIM, revoked_families, token_family
+
+User = get_user_model()
+
+# never cached; a user rebuilt from the cache has it deferred, so save() can't overwrite it
+UNCACHED_USER_FIELDS = {"password"}
+
+
+class UserCache:
+    """
+    Users by id as plain field values, in-process for JWT_USER_CACHE_LOCAL_TTL seconds and in the shared
+    cache for JWT_USER_CACHE_TIMEOUT. Entries are dropped when the user is saved or deleted (signals) and at
+    logout; other processes notice within the local TTL. That needs a cache every worker shares (Redis,
+    Memcached, database); with a process-local backend entries live no longer than the local TTL.
+    """
+
+    key_prefix = "jwt:user:"
+    inactive_key_prefix = "jwt:inactive:"
+
+    def __init__(self):
+        self._local = LocalTTLCache(self.local_ttl)
+
+    @staticmethod
+    def local_ttl():
+        return getattr(settings, "JWT_USER_CACHE_LOCAL_TTL", 5)
+
+    @property
+    def cache(self):
+        return caches[getattr(settings, "JWT_USER_CACHE", "default")]
+
+    def get(self, user_id):
+        values = self._local.get(user_id)
+        if values is None:
+            values = self.cache.get(f"{self.key_prefix}{user_id}")
+            if values is None:
+                return None
+            self._local.set(user_id, values)
+        return User.from_db("default", list(values), list(values.values()))
+
+    def set(self, user):
+        values = {f.attname: getattr(user, f.attname) for f in User._meta.concrete_fields
+                  if f.attname not in UNCACHED_USER_FIELDS}
+        timeout = getattr(settings, "JWT_USER_CACHE_TIMEOUT", 300)
+        if is_process_local(self.cache):
+            # other workers would never see this entry invalidated
+            timeout = min(timeout, self.local_ttl())
+        self.cache.set(f"{self.key_prefix}{user.pk}", values, timeout)
+        self._local.set(user.pk, values)
+
+    def invalidate(self, user_id):
+        self.cache.delete(f"{self.key_prefix}{user_id}")
+        self._local.delete(user_id)
+
+    def set_inactive(self, user_id, inactive):
+        # role-claim tokens never load the row, so deactivation is remembered here for an access token's lifetime
+        key = f"{self.inactive_key_prefix}{user_id}"
+        if inactive:
+            self.cache.set(key, True, int(api_settings.ACCESS_TOKEN_LIFETIME.total_seconds()))
+        else:
+            self.cache.delete(key)
+
+    def is_inactive(self, user_id):
+        return bool(self.cache.get(f"{self.inactive_key_prefix}{user_id}"))
+
+    def clear(self):
+        self._local.clear()
+
+
+user_cache = UserCache()
+
+
+def claim_user(user_id, role):
+    """
+    request.user for a token carrying a role claim: a User with only id, role and is_active loaded, so
+    permission checks and filters like Q(mentor=request.user) run without a query. Any other field is
+    deferred and read from the database on first access.
+    """
+    claims = {User._meta.pk.attname: user_id, "role": role, "is_active": True}
+    # from_db takes values in the model's field order
+    names = [f.attname for f in User._meta.concrete_fields if f.attname in claims]
+    return User.from_db("default", names, [claims[name] for name in names])
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication that resolves the user through user_cache instead of a query per request, and refuses
+    access tokens whose refresh family was revoked at logout.
+    """
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+
+        if revoked_families.is_revoked(token_family(validated_token)):
+            raise AuthenticationFailed(_("Token has been revoked"), code="token_revoked")
+
+        user = user_cache.get(user_id)
+        if user is None:
+            role = validated_token.get(ROLE_CLAIM) if getattr(settings, "JWT_ROLE_CLAIM", False) else None
+            if role is not None:
+                if user_cache.is_inactive(user_id):
+                    raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+                return claim_user(user_id, role)
+            user = self.load_user(user_id)
+        elif not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+        return user
+
+    def load_user(self, user_id):
+        try:
+            user = User.objects.get(**{api_settings.USER_ID_FIELD: user_id})
+        except User.DoesNotExist:
+            raise AuthenticationFailed(_("User not found"), code="user_not_found")
+        if not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+        user_cache.set(user)
+        return user
@@ -0,0 +1,181 @@
+import hashlib
+import logging
+import math
+import threading
+import time
+from collections import deque
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils import timezone
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+
+logger = logging.getLogger(__name__)
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter over strings, sized for `capacity` items at about `error_rate` false positives."""
+
+    def __init__(self, capacity, error_rate=0.001):
+        self.capacity = max(int(capacity), 1)
+        self.size = max(64, int(-self.capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / self.capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, item):
+        # double hashing: k positions from the two halves of a single digest
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        a, b = int.from_bytes(digest[:8], "little"), int.from_bytes(digest[8:], "little") | 1
+        return [(a + i * b) % self.size for i in range(self.hashes)]
+
+    def add(self, item):
+        for pos in self._positions(item):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+
+    def __contains__(self, item):
+        return all(self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(item))
+
+
+class BlacklistFilter:
+    """
+    Bloom filter of the jtis of blacklisted refresh tokens that have not expired (expired ones fail
+    verification before the blacklist is consulted). Every JWT_BLACKLIST_SYNC_INTERVAL seconds the rows above
+    a floor id are pulled in; the floor only moves past an id once it has been seen for JWT_BLACKLIST_SYNC_MARGIN
+    seconds, because ids are handed out at insert but become visible at commit, possibly out of order. The
+    filter is rebuilt from scratch when it fills up or every JWT_BLACKLIST_REBUILD_INTERVAL seconds, which also
+    forgets tokens that expired meanwhile. Only the first build runs on a request; later ones run on a
+    background thread while lookups keep using, and syncing, the old filter.
+    """
+
+    def __init__(self, error_rate=0.001, min_capacity=10000):
+        self.error_rate = error_rate
+        self.min_capacity = min_capacity
+        self._lock = threading.Lock()
+        # held for a whole rebuild; only the first build makes lookups wait on it
+        self._rebuild_lock = threading.Lock()
+        self._filter = None
+        self._floor = 0
+        self._watermarks = deque()
+        self._added_during_rebuild = None
+        self._synced_at = self._rebuilt_at = 0.0
+        self._thread_lock = threading.Lock()
+        self._thread = None
+
+    def might_contain(self, jti):
+        now = time.monotonic()
+        rebuild_every = getattr(settings, "JWT_BLACKLIST_REBUILD_INTERVAL", 3600)
+        sync_every = getattr(settings, "JWT_BLACKLIST_SYNC_INTERVAL", 2)
+        if self._filter is None:
+            self._rebuild(now, rebuild_every)
+        elif now - self._rebuilt_at >= rebuild_every:
+            self._rebuild_in_background()
+        with self._lock:
+            if now - self._synced_at >= sync_every:
+                self._sync(now)
+            return jti in self._filter
+
+    def add(self, jti):
+        # this process's own logouts are visible at once, without waiting for the next sync
+        with self._lock:
+            if self._filter is not None:
+                self._filter.add(jti)
+            if self._added_during_rebuild is not None:
+                self._added_during_rebuild.append(jti)
+
+    def reset(self):
+        with self._lock:
+            self._filter = None
+
+    def _rebuild_in_background(self):
+        with self._thread_lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._rebuild_quietly, daemon=True)
+            self._thread.start()
+
+    def _rebuild_quietly(self):
+        try:
+            self._rebuild(time.monotonic(), getattr(settings, "JWT_BLACKLIST_REBUILD_INTERVAL", 3600))
+        except Exception:
+            logger.exception("Rebuilding the token blacklist filter failed; keeping the old one")
+        finally:
+            connection.close()
+
+    def _rebuild(self, now, rebuild_every):
+        # with a filter in place, lookups carry on with it instead of queueing behind another thread's rebuild
+        if not self._rebuild_lock.acquire(blocking=self._filter is None):
+            return
+        try:
+            if self._filter is not None and now - self._rebuilt_at < rebuild_every:
+                return  # another thread rebuilt while we waited
+            with self._lock:
+                self._added_during_rebuild = []
+            margin = timedelta(seconds=getattr(settings, "JWT_BLACKLIST_SYNC_MARGIN", 60))
+            started = timezone.now()
+            # rows older than the margin have all committed; everything above is re-read by the next syncs
+            floor = (BlacklistedToken.objects.filter(blacklisted_at__lte=started - margin)
+                     .aggregate(floor=Max("id"))["floor"] or 0)
+            live = BlacklistedToken.objects.filter(token__expires_at__gt=started)
+            bloom = BloomFilter(max(self.min_capacity, 2 * live.count()), self.error_rate)
+            for jti in live.values_list("token__jti", flat=True).iterator(chunk_size=10000):
+                bloom.add(jti)
+            with self._lock:
+                for jti in self._added_during_rebuild:
+                    bloom.add(jti)
+                self._added_during_rebuild = None
+                self._filter, self._floor, self._watermarks = bloom, floor, deque()
+                self._synced_at = self._rebuilt_at = now
+        finally:
+            self._rebuild_lock.release()
+
+    def _sync(self, now):
+        margin = getattr(settings, "JWT_BLACKLIST_SYNC_MARGIN", 60)
+        while self._watermarks and now - self._watermarks[0][0] >= margin:
+            self._floor = max(self._floor, self._watermarks.popleft()[1])
+        rows = list(BlacklistedToken.objects.filter(id__gt=self._floor).values_list("id", "token__jti"))
+        for _, jti in rows:
+            # re-read rows are already in; skipping them keeps the count honest
+            if jti not in self._filter:
+                self._filter.add(jti)
+        if rows:
+            self._watermarks.append((now, max(row_id for row_id, _ in rows)))
+        self._synced_at = now
+        if self._filter.count > self._filter.capacity:
+            self._rebuilt_at = float("-inf")  # full: the next lookup starts a rebuild
+
+
+blacklist_filter = BlacklistFilter()
+
+
+def is_blacklisted(jti):
+    """Only a Bloom filter hit (a real entry or the rare false positive) costs a database query."""
+    if not blacklist_filter.might_contain(jti):
+        return False
+    return BlacklistedToken.objects.filter(token__jti=jti).exists()
+
+
+def prune_expired_tokens(chunk_size=1000, grace=0):
+    """
+    Delete outstanding tokens that expired over `grace` seconds ago, with their blacklist entries, walking
+    the primary key in chunks of one short transaction each instead of flushexpiredtokens' single
+    table-wide delete. Yields the number of tokens removed per chunk.
+    """
+    cutoff = timezone.now() - timedelta(seconds=grace)
+    last_id = 0
+    while True:
+        ids = list(OutstandingToken.objects.filter(id__gt=last_id, expires_at__lte=cutoff)
+                   .order_by("id").values_list("id", flat=True)[:chunk_size])
+        if not ids:
+            return
+        # bounds rather than an IN list keep every statement a primary key range scan with two parameters
+        first, last_id = ids[0], ids[-1]
+        with transaction.atomic():
+            BlacklistedToken.objects.filter(token_id__gte=first, token_id__lte=last_id,
+                                            token__expires_at__lte=cutoff).delete()
+            deleted, _ = OutstandingToken.objects.filter(id__gte=first, id__lte=last_id,
+                                                         expires_at__lte=cutoff).delete()
+        yield deleted
@@ -0,0 +1,111 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import transaction
+from rest_framework.response import Response
+
+DIRECTORY_VERSION_KEY = "mentors:version"
+DIRECTORY_PARAMS = ("skill", "skill_match", "skill_prefix", "location", "q", "facets", "page", "page_size", "cursor")
+
+
+def _cache():
+    return caches[getattr(settings, "MENTOR_DIRECTORY_CACHE", "default")]
+
+
+def is_process_local(cache):
+    # every worker process has its own LocMemCache; what one writes or deletes there the others never see
+    return isinstance(cache, LocMemCache)
+
+
+def directory_version():
+    cache = _cache()
+    version = cache.get(DIRECTORY_VERSION_KEY)
+    if version is None:
+        cache.add(DIRECTORY_VERSION_KEY, uuid4().hex, None)
+        version = cache.get(DIRECTORY_VERSION_KEY)
+    return version
+
+
+def bump_directory_version():
+    # a fresh random token orphans every cached page at once; nothing has to be scanned or deleted
+    _cache().set(DIRECTORY_VERSION_KEY, uuid4().hex, None)
+
+
+def schedule_directory_bump():
+    """
+    Bump the directory version once the current transaction commits: bumped earlier, a concurrent reader
+    could cache the pre-commit rows under the new version. A profile save fires several signals; each
+    registers a callback, and the first to run after the commit does the one bump.
+    """
+    connection = transaction.get_connection()
+    connection.directory_bump_due = True
+
+    def bump():
+        # a flag left over from a rolled-back transaction only matters once a committed callback runs
+        if connection.directory_bump_due:
+            connection.directory_bump_due = False
+            bump_directory_version()
+
+    transaction.on_commit(bump)
+
+
+def directory_cache_key(request, action, pk=None):
+    params = request.query_params
+    normalized = [(name, sorted(params.getlist(name))) for name in DIRECTORY_PARAMS if name in params]
+    raw = repr((request.get_host(), action, pk, normalized)).encode()
+    return f"mentors:{directory_version()}:{action}:{hashlib.sha1(raw).hexdigest()}"
+
+
+def cached_directory_response(request, action, build, pk=None):
+    cache = _cache()
+    key = directory_cache_key(request, action, pk)
+    hit = cache.get(key)
+    if hit is not None:
+        return Response(hit)
+    response = build()
+    if response.status_code == 200:
+        cache.set(key, response.data, getattr(settings, "MENTOR_DIRECTORY_CACHE_TIMEOUT", 300))
+    return response
+
+
+class LocalTTLCache:
+    """
+    A small thread-safe LRU whose entries expire after `ttl` seconds (a number, or a callable so settings are
+    read at use time); sits in front of the shared cache.
+    """
+
+    def __init__(self, ttl, max_size=10000):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[1] < time.monotonic():
+                return default
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def set(self, key, value):
+        ttl = self.ttl() if callable(self.ttl) else self.ttl
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
@@ -0,0 +1,40 @@
+from uuid import uuid4
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+from . import utils
+
+
+class CalendarBackend:
+    def create_meet_link(self, start, end, summary, description, attendees, organizer_email=None):
+        raise NotImplementedError
+
+
+class GoogleCalendarBackend(CalendarBackend):
+    def create_meet_link(self, start, end, summary, description, attendees, organizer_email=None):
+        return utils.create_google_meet_event(start, end, summary, description, attendees,
+                                              organizer_email=organizer_email)
+
+
+class FakeCalendarBackend(CalendarBackend):
+    """Offline backend for tests and local development; remembers every event it was asked for."""
+
+    def __init__(self):
+        self.events = []
+
+    def create_meet_link(self, start, end, summary, description, attendees, organizer_email=None):
+        link = f"https://meet.example.com/{uuid4()}"
+        self.events.append({"start": start, "end": end, "summary": summary, "description": description,
+                            "attendees": list(attendees), "organizer_email": organizer_email, "link": link})
+        return link
+
+
+_backends = {}
+
+
+def get_calendar_backend():
+    path = getattr(settings, "CALENDAR_BACKEND", "backend.calendar_backends.GoogleCalendarBackend")
+    if path not in _backends:
+        _backends[path] = import_string(path)()
+    return _backends[path]
@@ -1,32 +1,70 @@
+from datetime import timedelta
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
+from django.contrib.auth import get_user_model
 from django.shortcuts import get_object_or_404
-from .models import Meeting
+from django.utils import timezone
+from django.db.models import Q
+from .models import Meeting, Proposal, Request
+from .freebusy import busy_intervals, iter_free
+from .meet_links import schedule_meet_link
 from . import utils
+
+User = get_user_model()
+MAX_FREEBUSY_DAYS = 90
+
 class MeetingAddToCalendarView(APIView):
+    """Hand a meeting without a link to the meet-link provisioning queue; Google is never called inline."""
     permission_classes = [IsAuthenticated]
     def post(self, request, pk):
         meeting = get_object_or_404(Meeting, pk=pk)
-        if request.user != meeting.student and request.user != meeting.mentor:
+        if request.user.id not in (meeting.student_id, meeting.mentor_id):
+            return Response({'detail': 'Forbidden'}, status=403)
+        if meeting.meet_link:
+            return Response({'status': 'ok', 'link': meeting.meet_link})
+        # rows from before provisioning say 'ready' without a link; failed ones get a fresh round of attempts
+        if meeting.link_status in ('ready', 'failed'):
+            Meeting.objects.filter(pk=meeting.pk, link_status=meeting.link_status).update(
+                link_status='pending', link_attempts=0)
+            meeting.link_status = 'pending'
+        schedule_meet_link(meeting)
+        return Response({'status': 'pending', 'link_status': meeting.link_status}, status=202)
+
+def shares_request_or_proposal(user, other_id):
+    pair = Q(student=user, mentor_id=other_id) | Q(mentor=user, student_id=other_id)
+    return Request.objects.filter(pair).exists() or Proposal.objects.filter(pair).exists()
+
+class UserFreeBusyView(APIView):
+    """A user's busy/free time, visible to the user and to anyone they have a request or proposal with."""
+    permission_classes = [IsAuthenticated]
+    def get(self, request, pk):
+        user = get_object_or_404(User, pk=pk)
+        if request.user.id != user.id and not shares_request_or_proposal(request.user, user.id):
             return Response({'detail': 'Forbidden'}, status=403)
-        start = meeting.start
-        end = meeting.end
-        summary = f"Meeting #{meeting.id}: {meeting.student.username} ⇄ {meeting.mentor.username}"
-        description = f"Meet link: {meeting.meet_link or ''}"
-        attendees = []
-        if meeting.student.email:
-            attendees.append(meeting.student.email)
-        if meeting.mentor.email and meeting.mentor.email not in attendees:
-            attendees.append(meeting.mentor.email)
-        organizer_email = request.user.email or None
         try:
-            link = utils.create_google_meet_event(start, end, summary, description, attendees, organizer_email=organizer_email)
-            if link:
-                if not meeting.meet_link:
-                    meeting.meet_link = link
-                    meeting.save(update_fields=['meet_link'])
-                return Response({'status': 'ok', 'link': link})
-            return Response({'status': 'error', 'detail': 'No link created'}, status=500)
-        except Exception as e:
-            return Response({'status': 'error', 'detail': str(e)}, status=500)
\ No newline at end of file
+            start_dt = utils.parse_iso_to_utc(request.query_params.get('from')) or timezone.now()
+            end_dt = utils.parse_iso_to_utc(request.query_params.get('to')) or start_dt + timedelta(days=7)
+        except (AttributeError, ValueError):
+            return Response({'detail': 'from and to must be ISO datetimes.'}, status=400)
+        if start_dt >= end_dt or end_dt - start_dt > timedelta(days=MAX_FREEBUSY_DAYS):
+            return Response({'detail': f'to must be after from and at most {MAX_FREEBUSY_DAYS} days later.'}, status=400)
+        start, end = utils.to_epoch_minutes(start_dt), utils.to_epoch_minutes(end_dt)
+        if user.role == User.ROLE_MENTOR:
+            profile = getattr(user, 'mentor_profile', None)
+        else:
+            profile = getattr(user, 'student_profile', None)
+        busy = busy_intervals([user.id], start, end).get(user.id, [])
+        free = []
+        for s, e in iter_free(utils.profile_availability(profile), busy, after=start, until=end):
+            if s >= end:
+                break
+            free.append((max(s, start), min(e, end)))
+        busy = [(max(s, start), min(e, end)) for s, e in busy]
+        return Response({
+            'user_id': user.id,
+            'from': utils.to_iso_z(start_dt),
+            'to': utils.to_iso_z(end_dt),
+            'busy': utils.minutes_to_availability(busy),
+            'free': utils.minutes_to_availability(free),
+        })
@@ -0,0 +1,167 @@
+import asyncio
+import time
+from collections import deque
+from datetime import timedelta
+from uuid import uuid4
+
+from channels.db import database_sync_to_async
+from channels.exceptions import ChannelFull
+from channels.layers import BaseChannelLayer
+from django.db import IntegrityError
+from django.db.models import Count
+from django.utils import timezone
+
+from .cache import LocalTTLCache
+from .models import ChannelGroupMembership, ChannelMessage
+
+
+class DatabaseChannelLayer(BaseChannelLayer):
+    """
+    Channel layer backed by the project database, so every ASGI worker on every host sees the same
+    channels and groups. Receivers poll their channel with backoff and claim messages in batches; the polls
+    run in the thread pool (`poll_thread_sensitive=False`) rather than on the single thread consumers share
+    for their own database work. Senders count a channel's queue only when the headroom this process last
+    saw for it is used up, so capacity is a soft limit when several processes write the same channel.
+    Every open socket polls, so idle database load grows with connections and delivery can lag by up to
+    `max_poll_interval`; it is opt-in (CHANNEL_LAYER_BACKEND) for deployments without Redis.
+    """
+
+    extensions = ["groups", "flush"]
+
+    def __init__(self, expiry=60, group_expiry=86400, capacity=100, channel_capacity=None,
+                 poll_interval=0.05, max_poll_interval=1.0, batch_size=100, cleanup_interval=30,
+                 poll_thread_sensitive=False, **kwargs):
+        super().__init__(expiry=expiry, capacity=capacity, channel_capacity=channel_capacity, **kwargs)
+        self.channel_capacity = self.compile_capacities(self.channel_capacity)
+        self.group_expiry = group_expiry
+        self.poll_interval = poll_interval
+        self.max_poll_interval = max_poll_interval
+        self.batch_size = batch_size
+        self.cleanup_interval = cleanup_interval
+        self.poll_thread_sensitive = poll_thread_sensitive
+        self._buffers = {}
+        # channel -> messages it can still take, as of this process's last count
+        self._headroom = LocalTTLCache(expiry)
+        self._next_cleanup = 0.0
+
+    # channel API
+
+    async def new_channel(self, prefix="specific"):
+        return f"{prefix}.{uuid4().hex}"
+
+    async def send(self, channel, message):
+        assert isinstance(message, dict), "message is not a dict"
+        self.require_valid_channel_name(channel)
+        await database_sync_to_async(self._send)(channel, message)
+
+    async def receive(self, channel):
+        self.require_valid_channel_name(channel, receive=True)
+        buffer = self._buffers.setdefault(channel, deque())
+        delay = self.poll_interval
+        while not buffer:
+            buffer.extend(await database_sync_to_async(
+                self._claim, thread_sensitive=self.poll_thread_sensitive)(channel))
+            if not buffer:
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, self.max_poll_interval)
+        message = buffer.popleft()
+        if not buffer:
+            del self._buffers[channel]
+        return message
+
+    # groups extension
+
+    async def group_add(self, group, channel):
+        self.require_valid_group_name(group)
+        self.require_valid_channel_name(channel)
+        await database_sync_to_async(self._group_add)(group, channel)
+
+    async def group_discard(self, group, channel):
+        self.require_valid_group_name(group)
+        self.require_valid_channel_name(channel)
+        await database_sync_to_async(
+            ChannelGroupMembership.objects.filter(group=group, channel=channel).delete)()
+
+    async def group_send(self, group, message):
+        assert isinstance(message, dict), "message is not a dict"
+        self.require_valid_group_name(group)
+        await database_sync_to_async(self._group_send)(group, message)
+
+    # flush extension
+
+    async def flush(self):
+        self._buffers.clear()
+        self._headroom.clear()
+        await database_sync_to_async(self._flush)()
+
+    # database side, run in the sync thread
+
+    def _send(self, channel, message):
+        now = timezone.now()
+        self._maybe_cleanup(now)
+        if not self._take_room([channel], now):
+            raise ChannelFull(channel)
+        ChannelMessage.objects.create(channel=channel, payload=message,
+                                      expires_at=now + timedelta(seconds=self.expiry))
+
+    def _claim(self, channel):
+        # a channel has exactly one receiver, so reading then deleting by id needs no row locks; keeping the
+        # read outside a transaction also spares SQLite a shared-to-write lock upgrade under contention
+        rows = list(ChannelMessage.objects.filter(channel=channel, expires_at__gt=timezone.now())
+                    .order_by("id").values_list("id", "payload")[:self.batch_size])
+        if rows:
+            ChannelMessage.objects.filter(id__in=[pk for pk, _ in rows]).delete()
+        return [payload for _, payload in rows]
+
+    def _group_add(self, group, channel):
+        # single-statement writes instead of update_or_create, whose read-then-write transaction SQLite
+        # refuses to upgrade ("database is locked") while another process writes
+        expires_at = timezone.now() + timedelta(seconds=self.group_expiry)
+        membership = ChannelGroupMembership.objects.filter(group=group, channel=channel)
+        if membership.update(expires_at=expires_at):
+            return
+        try:
+            ChannelGroupMembership.objects.create(group=group, channel=channel, expires_at=expires_at)
+        except IntegrityError:
+            membership.update(expires_at=expires_at)
+
+    def _group_send(self, group, message):
+        now = timezone.now()
+        self._maybe_cleanup(now)
+        channels = list(ChannelGroupMembership.objects.filter(group=group, expires_at__gt=now)
+                        .values_list("channel", flat=True))
+        if not channels:
+            return
+        expires_at = now + timedelta(seconds=self.expiry)
+        # like the other layers, a full member channel silently misses this message
+        ChannelMessage.objects.bulk_create([
+            ChannelMessage(channel=channel, payload=message, expires_at=expires_at)
+            for channel in self._take_room(channels, now)
+        ])
+
+    def _take_room(self, channels, now):
+        """The channels that can take one more message, each charged for it; COUNTs only those out of headroom."""
+        recount = [channel for channel in channels if (self._headroom.get(channel) or 0) <= 0]
+        if recount:
+            queued = dict(ChannelMessage.objects.filter(channel__in=recount, expires_at__gt=now)
+                          .values("channel").annotate(n=Count("id")).values_list("channel", "n"))
+            for channel in recount:
+                self._headroom.set(channel, self.get_capacity(channel) - queued.get(channel, 0))
+        room = []
+        for channel in channels:
+            left = self._headroom.get(channel) or 0
+            if left > 0:
+                self._headroom.set(channel, left - 1)
+                room.append(channel)
+        return room
+
+    def _maybe_cleanup(self, now):
+        if time.monotonic() < self._next_cleanup:
+            return
+        self._next_cleanup = time.monotonic() + self.cleanup_interval
+        ChannelMessage.objects.filter(expires_at__lte=now).delete()
+        ChannelGroupMembership.objects.filter(expires_at__lte=now).delete()
+
+    def _flush(self):
+        ChannelMessage.objects.all().delete()
+        ChannelGroupMembership.objects.all().delete()
@@ -0,0 +1,31 @@
+from django.conf import settings
+from django.core.cache import caches
+from django.core.checks import Tags, Warning, register
+
+from .cache import is_process_local
+
+
+@register(Tags.caches, deploy=True)
+def check_jwt_user_cache(app_configs, **kwargs):
+    alias = getattr(settings, "JWT_USER_CACHE", "default")
+    if not is_process_local(caches[alias]):
+        return []
+    return [Warning(
+        f"JWT_USER_CACHE uses the process-local cache {alias!r}.",
+        hint="Saving a user only invalidates the worker that saved it, so cached users are kept no longer than "
+             "JWT_USER_CACHE_LOCAL_TTL. Point it at a cache every worker shares (Redis, Memcached, database).",
+        id="backend.W001",
+    )]
+
+
+@register(Tags.caches, deploy=True)
+def check_jwt_revocation_cache(app_configs, **kwargs):
+    alias = getattr(settings, "JWT_REVOCATION_CACHE", "default")
+    if not is_process_local(caches[alias]):
+        return []
+    return [Warning(
+        f"JWT_REVOCATION_CACHE uses the process-local cache {alias!r}.",
+        hint="A logout is only seen by the worker that handled it; the other workers keep accepting its access "
+             "tokens until they expire. Point it at a cache every worker shares (Redis, Memcached, database).",
+        id="backend.W002",
+    )]
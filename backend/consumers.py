@@ -1,23 +1,127 @@
+import asyncio
 import json
+import time
 from urllib.parse import parse_qs
+from channels.db import database_sync_to_async
 from channels.generic.websocket import AsyncWebsocketConsumer
 
+from . import metrics
+from .notifications import inbox_since, user_group
+from .serializers import NotificationSerializer
+
+
 class NotificationConsumer(AsyncWebsocketConsumer):
+    # events are queued per connection and written out together flush_interval seconds after the first one
+    # arrives; a newer event of the same type about the same proposal/request/meeting replaces the queued one,
+    # and past max_queue the oldest are dropped and the client is told to resync from the inbox. Idle
+    # connections only wake up for the heartbeat
+    max_queue = 100
+    flush_interval = 0.1
+    heartbeat_interval = 25
+    coalesce_keys = ("proposal_id", "request_id", "meeting_id")
+
     async def connect(self):
+        user = self.scope.get('user')
+        if user is None or not user.is_authenticated:
+            await self.close()
+            return
         qs = parse_qs(self.scope.get('query_string', b'').decode())
-        user_ids = qs.get('user_id', [])
-        if not user_ids:
+        try:
+            since = int(qs['since'][0]) if 'since' in qs else None
+        except ValueError:
             await self.close()
             return
-        self.group_name = f"user_{user_ids[0]}"
+        # the group comes from the verified token (see ws_auth), never from the query string
+        self.user_id = user.id
+        self.group_name = user_group(self.user_id)
+        self.last_id = 0
+        self.replayed = set()
+        self.pending = {}
+        self.dropped = 0
+        self.flusher = None
+        self.last_sent = time.monotonic()
+        # join the group before reading the inbox so nothing committed in between is lost;
+        # anything delivered both ways is dropped in notify() by the ids the replay carried
         await self.channel_layer.group_add(self.group_name, self.channel_name)
-        await self.accept()
+        await self.accept(subprotocol=self.scope.get('jwt_subprotocol'))
+        if since is not None:
+            await self.replay(since)
+        self.heartbeat = asyncio.ensure_future(self.heartbeat_loop())
 
     async def disconnect(self, close_code):
-        await self.channel_layer.group_discard(self.group_name, self.channel_name)
+        for task in (getattr(self, 'flusher', None), getattr(self, 'heartbeat', None)):
+            if task is not None:
+                task.cancel()
+        if hasattr(self, 'group_name'):
+            await self.channel_layer.group_discard(self.group_name, self.channel_name)
+
+    async def replay(self, since):
+        notifications, has_more = await database_sync_to_async(self.load_inbox)(since)
+        if notifications:
+            self.last_id = notifications[-1]["id"]
+        self.replayed = {n["id"] for n in notifications}
+        await self.send_frame({
+            "event": "replay",
+            "data": {"notifications": notifications, "latest_id": self.last_id or since, "has_more": has_more},
+        })
+
+    def load_inbox(self, since):
+        rows, has_more = inbox_since(self.user_id, since)
+        return NotificationSerializer(rows, many=True).data, has_more
 
     async def notify(self, event):
-        await self.send(text_data=json.dumps({
-            "event": event.get("event"),
-            "data": event.get("data")
-        }))
\ No newline at end of file
+        # not `id <= last_id`: ids are taken at insert but commit in any order, so a live event can carry a
+        # lower id than the newest one replayed and still be new
+        if event.get("id") in self.replayed:
+            self.replayed.discard(event["id"])
+            return
+        key = self.coalesce_key(event)
+        if self.pending.pop(key, None) is not None:
+            metrics.incr("notifications.coalesced", event=event.get("event"))
+        elif len(self.pending) >= self.max_queue:
+            del self.pending[next(iter(self.pending))]
+            self.dropped += 1
+            metrics.incr("notifications.dropped")
+        self.pending[key] = {"id": event.get("id"), "event": event.get("event"), "data": event.get("data")}
+        if self.flusher is None or self.flusher.done():
+            self.flusher = asyncio.ensure_future(self.flush_later())
+
+    def coalesce_key(self, event):
+        # only an event of the same type supersedes a queued one: request_accepted_need_slots and
+        # mentor_proposed_slots for one proposal both reach the client
+        data = event.get("data") or {}
+        for name in self.coalesce_keys:
+            if data.get(name) is not None:
+                return event.get("event"), name, data[name]
+        return "id", event.get("id") if event.get("id") is not None else object()
+
+    async def flush_later(self):
+        await asyncio.sleep(self.flush_interval)
+        if self.pending or self.dropped:
+            await self.flush()
+
+    async def heartbeat_loop(self):
+        while True:
+            idle = time.monotonic() - self.last_sent
+            if idle >= self.heartbeat_interval:
+                await self.send_frame({"event": "heartbeat", "data": {"latest_id": self.last_id}})
+                idle = 0
+            await asyncio.sleep(self.heartbeat_interval - idle)
+
+    async def flush(self):
+        metrics.gauge("notifications.queue_depth", len(self.pending))
+        frames = list(self.pending.values())
+        self.pending = {}
+        if self.dropped:
+            # the inbox still has everything; the client refetches from the last id it saw
+            frames.insert(0, {"event": "overflow", "data": {"dropped": self.dropped, "resume_from": self.last_id}})
+            self.dropped = 0
+        self.last_id = max([self.last_id] + [f["id"] for f in frames if f.get("id") is not None])
+        if len(frames) == 1:
+            await self.send_frame(frames[0])
+        else:
+            await self.send_frame({"event": "batch", "data": {"events": frames}})
+
+    async def send_frame(self, frame):
+        self.last_sent = time.monotonic()
+        await self.send(text_data=json.dumps(frame))
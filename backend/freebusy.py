@@ -0,0 +1,62 @@
+from collections import defaultdict
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+
+from .models import Meeting
+from .utils import (
+    from_epoch_minutes,
+    to_epoch_minutes,
+    merge_intervals,
+    iter_availability,
+    iter_subtract_intervals,
+)
+
+ACTIVE_MEETING_STATUSES = ("scheduled", "confirmed")
+# longest meeting that may be written; lets busy lookups bound meeting starts from below
+MAX_MEETING_MINUTES = 24 * 60
+
+
+def exceeds_max_meeting(start_dt, end_dt):
+    return end_dt - start_dt > timedelta(minutes=MAX_MEETING_MINUTES)
+
+
+def _active_meetings(role, user_ids, start, end):
+    # no meeting runs longer than MAX_MEETING_MINUTES, so the (mentor|student, start) index bounds both ends
+    return Meeting.objects.filter(
+        **{f"{role}_id__in": user_ids},
+        status__in=ACTIVE_MEETING_STATUSES,
+        start__gte=from_epoch_minutes(start - MAX_MEETING_MINUTES),
+        start__lt=from_epoch_minutes(end),
+        end__gt=from_epoch_minutes(start),
+    )
+
+
+def busy_intervals(user_ids, start, end):
+    user_ids = list(set(user_ids))
+    if not user_ids:
+        return {}
+    as_mentor = _active_meetings("mentor", user_ids, start, end).values_list("mentor_id", "start", "end")
+    as_student = _active_meetings("student", user_ids, start, end).values_list("student_id", "start", "end")
+    busy = defaultdict(list)
+    for user_id, s, e in as_mentor.union(as_student, all=True):
+        busy[user_id].append((to_epoch_minutes(s), -(-int(e.timestamp()) // 60)))
+    return {user_id: merge_intervals(pairs) for user_id, pairs in busy.items()}
+
+
+def lock_participants(user_ids):
+    """
+    Lock the users' rows, lowest id first so two bookings never wait on each other, until the transaction
+    ends: a conflict check and the meeting insert after it then run one booking at a time per user.
+    """
+    User = get_user_model()
+    list(User.objects.select_for_update().filter(id__in=set(user_ids)).order_by("id").values_list("id", flat=True))
+
+
+def has_conflict(user_ids, start_dt, end_dt):
+    start, end = to_epoch_minutes(start_dt), -(-int(end_dt.timestamp()) // 60)
+    return any(_active_meetings(role, user_ids, start, end).exists() for role in ("mentor", "student"))
+
+
+def iter_free(availability, busy, after=None, until=None):
+    return iter_subtract_intervals(iter_availability(availability, after=after, until=until), busy)
@@ -0,0 +1,164 @@
+import logging
+import re
+import threading
+import time
+from functools import lru_cache
+
+import jwt
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.utils.module_loading import import_string
+
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+GOOGLE_CERTS_URL = "https://www.googleapis.com/oauth2/v1/certs"
+GOOGLE_ISSUERS = ("accounts.google.com", "https://accounts.google.com")
+_MAX_AGE = re.compile(r"max-age=(\d+)")
+
+
+def cache_max_age(cache_control, default=300):
+    match = _MAX_AGE.search(cache_control or "")
+    return int(match.group(1)) if match else default
+
+
+@lru_cache(maxsize=None)
+def _session():
+    # one keep-alive session per process instead of a new connection (and TLS handshake) per login
+    import requests
+    return requests.Session()
+
+
+def fetch_google_certs(url=GOOGLE_CERTS_URL):
+    with metrics.timer("google_auth.certs_fetch") as labels:
+        resp = _session().get(url, timeout=5)
+        labels["status"] = resp.status_code
+        resp.raise_for_status()
+    return resp.json(), cache_max_age(resp.headers.get("Cache-Control"))
+
+
+class CertCache:
+    """
+    Signing certs held for the max-age Google sends with them. Once `refresh_margin` of that lifetime is
+    left a background thread fetches the next set while requests keep using the current one; if a refresh
+    fails the old set is kept and retried every `retry_interval` seconds, so verification only waits on
+    the network for the very first fetch. A set is never used more than `max_stale` seconds past its max-age:
+    after that a failed refresh fails verification instead of trusting keys Google may have rotated out.
+    """
+
+    def __init__(self, fetch, refresh_margin=0.2, retry_interval=30, max_stale=3600, clock=time.monotonic):
+        self.fetch = fetch
+        self.refresh_margin = refresh_margin
+        self.retry_interval = retry_interval
+        self.max_stale = max_stale
+        self.clock = clock
+        self._lock = threading.Lock()
+        # separate from _lock, which is held for the whole fetch; get() must never wait on a background refresh
+        self._thread_lock = threading.Lock()
+        self._certs = None
+        self._expires_at = self._refresh_at = self._stale_at = 0.0
+        self._thread = None
+
+    def get(self):
+        now = self.clock()
+        certs = self._certs
+        if certs is None or now >= self._expires_at:
+            return self.refresh()
+        if now >= self._refresh_at:
+            self._refresh_in_background()
+        return certs
+
+    def refresh(self):
+        with self._lock:
+            now = self.clock()
+            if self._certs is not None and now < self._refresh_at:
+                return self._certs  # another thread refreshed while we waited
+            try:
+                certs, max_age = self.fetch()
+            except Exception:
+                if self._certs is None or now >= self._stale_at:
+                    raise
+                logger.warning("Refreshing Google signing certs failed; keeping the cached set", exc_info=True)
+                self._refresh_at = now + self.retry_interval
+                self._expires_at = min(max(self._expires_at, self._refresh_at + self.retry_interval), self._stale_at)
+                return self._certs
+            self._certs = certs
+            self._expires_at = now + max_age
+            self._stale_at = self._expires_at + self.max_stale
+            self._refresh_at = now + max_age * (1 - self.refresh_margin)
+            return certs
+
+    def _refresh_in_background(self):
+        with self._thread_lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._refresh_quietly, daemon=True)
+            self._thread.start()
+
+    def _refresh_quietly(self):
+        try:
+            self.refresh()
+        except Exception:
+            logger.exception("Background refresh of Google signing certs crashed")
+
+
+class GoogleIdTokenVerifier:
+    """Checks Google ID tokens against Google's signing certs, kept in a process-wide CertCache."""
+
+    def __init__(self):
+        self.certs = CertCache(fetch_google_certs)
+
+    def verify(self, token, audience):
+        """Return the token's claims; ValueError if it is forged, expired or not for `audience`."""
+        from google.auth import jwt as google_jwt
+        claims = google_jwt.decode(token, certs=self.certs.get(), audience=audience, clock_skew_in_seconds=10)
+        if claims.get("iss") not in GOOGLE_ISSUERS:
+            raise ValueError(f"Wrong issuer: {claims.get('iss')}")
+        return claims
+
+
+class FakeGoogleIdTokenVerifier:
+    """
+    Offline verifier for tests and local development: a local key set of HS256 secrets by key id stands in
+    for Google's certs, and issue() mints tokens signed with it. Anyone holding those secrets can log in as
+    anybody, so without explicit `keys` it only loads with DEBUG on and GOOGLE_FAKE_ID_TOKEN_KEYS set.
+    """
+
+    def __init__(self, keys=None):
+        if keys is None:
+            keys = getattr(settings, "GOOGLE_FAKE_ID_TOKEN_KEYS", None)
+            if not (settings.DEBUG and keys):
+                raise ImproperlyConfigured(
+                    "FakeGoogleIdTokenVerifier needs DEBUG and GOOGLE_FAKE_ID_TOKEN_KEYS; never use it in production.")
+        self.keys = keys
+
+    def issue(self, audience, email, kid=None, lifetime=3600, **claims):
+        kid = kid or next(iter(self.keys))
+        now = int(time.time())
+        payload = {"iss": GOOGLE_ISSUERS[1], "email": email, "iat": now, "exp": now + lifetime, **claims}
+        if audience is not None:
+            payload["aud"] = audience
+        return jwt.encode(payload, self.keys[kid], algorithm="HS256", headers={"kid": kid})
+
+    def verify(self, token, audience):
+        try:
+            kid = jwt.get_unverified_header(token).get("kid")
+            if kid not in self.keys:
+                raise ValueError(f"Unknown key id: {kid}")
+            claims = jwt.decode(token, self.keys[kid], algorithms=["HS256"], audience=audience)
+        except jwt.InvalidTokenError as e:
+            raise ValueError(str(e))
+        if claims.get("iss") not in GOOGLE_ISSUERS:
+            raise ValueError(f"Wrong issuer: {claims.get('iss')}")
+        return claims
+
+
+_verifiers = {}
+
+
+def get_google_verifier():
+    path = getattr(settings, "GOOGLE_ID_TOKEN_VERIFIER", "backend.google_auth.GoogleIdTokenVerifier")
+    if path not in _verifiers:
+        _verifiers[path] = import_string(path)()
+    return _verifiers[path]
@@ -0,0 +1,81 @@
+import asyncio
+import multiprocessing
+import time
+
+from asgiref.sync import async_to_sync
+from django.core.management.base import BaseCommand, CommandError
+
+GROUP = "benchmark"
+
+
+def _worker(index, workers, messages, barrier, results):
+    # spawned processes start from a bare interpreter, so Django is set up again here
+    import django
+    django.setup()
+    from channels.layers import get_channel_layer
+
+    layer = get_channel_layer()
+    # every worker's channel has to hold the whole run, or group sends would be dropped as full
+    layer.capacity = max(layer.capacity, messages * workers)
+
+    async def receive_all(channel, started):
+        for _ in range(messages * workers):
+            await layer.receive(channel)
+        return time.perf_counter() - started
+
+    async def run():
+        channel = await layer.new_channel()
+        await layer.group_add(GROUP, channel)
+        await asyncio.get_running_loop().run_in_executor(None, barrier.wait)
+        started = time.perf_counter()
+        receiver = asyncio.ensure_future(receive_all(channel, started))
+        for n in range(messages):
+            await layer.group_send(GROUP, {"type": "benchmark", "worker": index, "n": n})
+        sent = time.perf_counter() - started
+        received = await receiver
+        await layer.group_discard(GROUP, channel)
+        return sent, received
+
+    results.put((index,) + async_to_sync(run)())
+
+
+class Command(BaseCommand):
+    help = ("Measure channel layer throughput across worker processes: every worker joins one group, "
+            "sends --messages group messages and receives everyone else's.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=4)
+        parser.add_argument("--messages", type=int, default=500)
+        parser.add_argument("--timeout", type=float, default=300.0)
+
+    def handle(self, *args, **options):
+        from channels.layers import get_channel_layer
+
+        workers, messages = options["workers"], options["messages"]
+        layer = get_channel_layer()
+        if "flush" in getattr(layer, "extensions", []):
+            async_to_sync(layer.flush)()
+        self.stdout.write(f"{type(layer).__name__}: {workers} processes x {messages} group messages")
+
+        ctx = multiprocessing.get_context("spawn")
+        barrier = ctx.Barrier(workers)
+        results = ctx.Queue()
+        procs = [ctx.Process(target=_worker, args=(i, workers, messages, barrier, results)) for i in range(workers)]
+        for proc in procs:
+            proc.start()
+        try:
+            rows = [results.get(timeout=options["timeout"]) for _ in procs]
+        except Exception:
+            for proc in procs:
+                proc.terminate()
+            raise CommandError("Workers did not finish; is the layer shared between processes?")
+        for proc in procs:
+            proc.join()
+
+        for index, sent, received in sorted(rows):
+            self.stdout.write(f"  worker {index}: sent {messages} in {sent:.2f}s, "
+                              f"received {messages * workers} in {received:.2f}s")
+        elapsed = max(received for _, _, received in rows)
+        delivered = messages * workers * workers
+        self.stdout.write(f"Delivered {delivered} messages in {elapsed:.2f}s: {delivered / elapsed:.0f} msg/s, "
+                          f"{messages * workers / elapsed:.0f} group sends/s")
@@ -0,0 +1,118 @@
+import os
+import random
+import statistics
+import time
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from backend.freebusy import _active_meetings
+from backend.models import Meeting, Proposal, Request
+from backend.utils import to_epoch_minutes
+
+User = get_user_model()
+BATCH_SIZE = 10000
+
+
+class Command(BaseCommand):
+    help = ("Seed a throwaway dataset and compare EXPLAIN plans and latencies of the hot lookups "
+            "with and without the model indexes. Everything runs in a transaction that is rolled back.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--meetings", type=int, default=10000)
+        parser.add_argument("--users", type=int, default=5000)
+        parser.add_argument("--repeat", type=int, default=50)
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--force", action="store_true",
+                            help="Run against a database that is not a test or in-memory one.")
+
+    def handle(self, *args, **options):
+        if not (options["force"] or self.is_scratch_database()):
+            raise CommandError(f"Refusing to drop indexes on {connection.settings_dict['NAME']}: "
+                               "point it at a test_* or in-memory database, or pass --force.")
+        self.rng = random.Random(options["seed"])
+        with transaction.atomic():
+            self.seed(options["meetings"], options["users"])
+            lookups = self.lookups()
+            self.run("with indexes", lookups, options["repeat"])
+            # plain DROP INDEX statements: SQLite refuses to enter a schema editor inside atomic()
+            editor = connection.schema_editor()
+            for model in (Meeting, Proposal, Request):
+                for index in model._meta.indexes:
+                    editor.execute(index.remove_sql(model, editor))
+            self.run("without indexes", lookups, options["repeat"])
+            transaction.set_rollback(True)
+
+    def is_scratch_database(self):
+        if connection.vendor == "sqlite" and connection.is_in_memory_db():
+            return True
+        return os.path.basename(str(connection.settings_dict["NAME"])).startswith("test_")
+
+    def seed(self, meetings, users):
+        started = time.perf_counter()
+        half = max(users // 2, 1)
+        User.objects.bulk_create(
+            [User(username=f"bench-mentor-{i}", password="!", role=User.ROLE_MENTOR) for i in range(half)]
+            + [User(username=f"bench-student-{i}", password="!", role=User.ROLE_STUDENT) for i in range(half)],
+            batch_size=BATCH_SIZE,
+        )
+        self.mentor_ids = list(User.objects.filter(username__startswith="bench-mentor-").values_list("id", flat=True))
+        self.student_ids = list(User.objects.filter(username__startswith="bench-student-").values_list("id", flat=True))
+
+        base = timezone.now().replace(minute=0, second=0, microsecond=0)
+        statuses = [status for status, _ in Meeting.STATUS_CHOICES]
+        for offset in range(0, meetings, BATCH_SIZE):
+            rows = []
+            for _ in range(min(BATCH_SIZE, meetings - offset)):
+                start = base + timedelta(hours=self.rng.randrange(-24 * 365, 24 * 365))
+                rows.append(Meeting(mentor_id=self.rng.choice(self.mentor_ids),
+                                    student_id=self.rng.choice(self.student_ids),
+                                    start=start, end=start + timedelta(hours=1),
+                                    status=self.rng.choice(statuses)))
+            Meeting.objects.bulk_create(rows)
+
+        pairs = {(self.rng.choice(self.student_ids), self.rng.choice(self.mentor_ids)) for _ in range(meetings // 20)}
+        Request.objects.bulk_create(
+            [Request(student_id=s, mentor_id=m, message="", status=self.rng.choice(["pending", "accepted", "rejected"]))
+             for s, m in pairs], batch_size=BATCH_SIZE)
+        Proposal.objects.bulk_create(
+            [Proposal(student_id=s, mentor_id=m, status=self.rng.choice([c for c, _ in Proposal.STATUS_CHOICES]))
+             for s, m in pairs], batch_size=BATCH_SIZE)
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+        self.stdout.write(f"Seeded {meetings} meetings and {len(pairs)} requests/proposals "
+                          f"in {time.perf_counter() - started:.1f}s")
+
+    def lookups(self):
+        # each lookup builds the queryset a hot path runs for a (student, mentor) pair
+        now = to_epoch_minutes(timezone.now())
+        week = now + 7 * 24 * 60
+        return {
+            "latest meeting per pair": lambda s, m: Meeting.objects.filter(
+                student_id=s, mentor_id=m).order_by("-created_at", "-id").values("id")[:1],
+            "mentor busy window": lambda s, m: _active_meetings("mentor", [m], now, week).values_list("start", "end"),
+            "student busy window": lambda s, m: _active_meetings("student", [s], now, week).values_list("start", "end"),
+            "mentor pending proposals": lambda s, m: Proposal.objects.filter(mentor_id=m, status="pending").values("id"),
+            "student pending proposals": lambda s, m: Proposal.objects.filter(student_id=s, status="pending").values("id"),
+            "mentor pending requests": lambda s, m: Request.objects.filter(mentor_id=m, status="pending").values("id"),
+        }
+
+    def run(self, label, lookups, repeat):
+        self.stdout.write(self.style.MIGRATE_HEADING(label))
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+        samples = [(self.rng.choice(self.student_ids), self.rng.choice(self.mentor_ids)) for _ in range(repeat)]
+        for name, lookup in lookups.items():
+            timings = []
+            for s, m in samples:
+                started = time.perf_counter()
+                list(lookup(s, m))
+                timings.append((time.perf_counter() - started) * 1000)
+            timings.sort()
+            self.stdout.write(f"  {name}: median {statistics.median(timings):.3f}ms, "
+                              f"p95 {timings[max(int(len(timings) * 0.95) - 1, 0)]:.3f}ms")
+            plan = lookup(*samples[0]).explain()
+            self.stdout.write("    " + plan.replace("\n", "\n    "))
@@ -0,0 +1,85 @@
+import random
+import time
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.utils import timezone
+from rest_framework_simplejwt.serializers import TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+
+from backend.blacklist import blacklist_filter, prune_expired_tokens
+from backend.middleware import record_queries
+from backend.tokens import FamilyRefreshToken, FamilyTokenRefreshSerializer
+
+User = get_user_model()
+BATCH_SIZE = 10000
+
+
+class Command(BaseCommand):
+    help = ("Seed a throwaway history of refresh tokens and compare refresh throughput with simplejwt's "
+            "blacklist query and with the Bloom filter. Everything runs in a transaction that is rolled back.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--tokens", type=int, default=10000000, help="Historical outstanding tokens.")
+        parser.add_argument("--blacklist-every", type=int, default=20, help="Blacklist every Nth historical token.")
+        parser.add_argument("--refreshes", type=int, default=2000)
+        parser.add_argument("--prune", action="store_true", help="Also time prune_tokens over the history.")
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options["seed"])
+        with transaction.atomic():
+            user = User.objects.create(username="bench-refresh", password="!")
+            self.seed(user, options["tokens"], options["blacklist_every"])
+            tokens = [str(FamilyRefreshToken.for_user(user)) for _ in range(options["refreshes"])]
+
+            self.run("simplejwt blacklist query", TokenRefreshSerializer, tokens)
+            blacklist_filter.reset()
+            started = time.perf_counter()
+            blacklist_filter.might_contain("")
+            self.stdout.write(f"Bloom filter built in {time.perf_counter() - started:.2f}s")
+            self.run("bloom filter", FamilyTokenRefreshSerializer, tokens)
+
+            if options["prune"]:
+                started = time.perf_counter()
+                pruned = sum(prune_expired_tokens())
+                self.stdout.write(f"Pruned {pruned} expired tokens in {time.perf_counter() - started:.1f}s")
+            transaction.set_rollback(True)
+        blacklist_filter.reset()
+
+    def seed(self, user, count, blacklist_every):
+        # raw executemany: building ten million model instances would dominate the run
+        started = time.perf_counter()
+        lifetime = api_settings.REFRESH_TOKEN_LIFETIME
+        now = timezone.now()
+        adapt = connection.ops.adapt_datetimefield_value
+        qn = connection.ops.quote_name
+        outstanding, blacklisted = OutstandingToken._meta.db_table, BlacklistedToken._meta.db_table
+        insert = (f"INSERT INTO {qn(outstanding)} (jti, token, created_at, expires_at, user_id) "
+                  f"VALUES (%s, %s, %s, %s, %s)")
+        with connection.cursor() as cursor:
+            for offset in range(0, count, BATCH_SIZE):
+                rows = []
+                for i in range(offset, min(offset + BATCH_SIZE, count)):
+                    created = now - timedelta(seconds=self.rng.randrange(365 * 24 * 3600))
+                    rows.append((f"bench-{i}", "", adapt(created), adapt(created + lifetime), user.id))
+                cursor.executemany(insert, rows)
+            cursor.execute(
+                f"INSERT INTO {qn(blacklisted)} (token_id, blacklisted_at) "
+                f"SELECT id, expires_at FROM {qn(outstanding)} WHERE id %% %s = 0", [blacklist_every])
+            cursor.execute(f"SELECT COUNT(*) FROM {qn(blacklisted)}")
+            listed = cursor.fetchone()[0]
+        self.stdout.write(f"Seeded {count} outstanding tokens, {listed} blacklisted, "
+                          f"in {time.perf_counter() - started:.1f}s")
+
+    def run(self, label, serializer_class, tokens):
+        with record_queries() as stats:
+            started = time.perf_counter()
+            for raw in tokens:
+                serializer_class(data={"refresh": raw}).is_valid(raise_exception=True)
+            elapsed = time.perf_counter() - started
+        self.stdout.write(f"  {label}: {len(tokens) / elapsed:.0f} refreshes/s, "
+                          f"{stats.count / len(tokens):.2f} queries per refresh")
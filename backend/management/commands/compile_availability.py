@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+
+from backend.models import MentorProfile, StudentProfile
+from backend.utils import split_availability
+
+
+class Command(BaseCommand):
+    help = "Rebuild availability_compiled and availability_rules for mentor and student profiles from their availability JSON."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500)
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        for model in (MentorProfile, StudentProfile):
+            changed = []
+            total = 0
+            fields = ["availability_compiled", "availability_rules"]
+            for profile in model.objects.only("id", "availability", *fields).iterator(chunk_size=batch_size):
+                compiled, rules = split_availability(profile.availability)
+                if compiled != profile.availability_compiled or rules != profile.availability_rules:
+                    profile.availability_compiled, profile.availability_rules = compiled, rules
+                    changed.append(profile)
+                if len(changed) >= batch_size:
+                    model.objects.bulk_update(changed, fields)
+                    total += len(changed)
+                    changed = []
+            if changed:
+                model.objects.bulk_update(changed, fields)
+                total += len(changed)
+            self.stdout.write(f"{model.__name__}: {total} profiles recompiled")
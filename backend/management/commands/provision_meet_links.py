@@ -0,0 +1,34 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from backend.meet_links import claimable_meetings, provision_meet_link
+
+
+class Command(BaseCommand):
+    help = "Create calendar events for meetings whose meet link is still pending."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=50)
+        parser.add_argument("--grace", type=float, default=60.0,
+                            help="Skip meetings younger than this many seconds; the request's own job is handling them.")
+        parser.add_argument("--loop", action="store_true", help="Keep polling instead of exiting when done.")
+        parser.add_argument("--interval", type=float, default=5.0, help="Seconds to sleep between empty polls.")
+
+    def handle(self, *args, **options):
+        done = failed = 0
+        while True:
+            cutoff = timezone.now() - timedelta(seconds=options["grace"])
+            ids = list(claimable_meetings().filter(created_at__lte=cutoff)
+                       .order_by("created_at").values_list("id", flat=True)[:options["batch_size"]])
+            provisioned = sum(1 for meeting_id in ids if provision_meet_link(meeting_id))
+            done += provisioned
+            failed += len(ids) - provisioned
+            # failures stay pending, so only go straight back for a full batch that made progress
+            if len(ids) < options["batch_size"] or not provisioned:
+                if not options["loop"]:
+                    break
+                time.sleep(options["interval"])
+        self.stdout.write(f"Provisioned {done} meet links, {failed} still pending or failed")
@@ -0,0 +1,26 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from backend.blacklist import prune_expired_tokens
+
+
+class Command(BaseCommand):
+    help = ("Delete expired outstanding JWTs and their blacklist entries in small chunks, each in its own "
+            "transaction, so the token tables are never locked for long. Use instead of flushexpiredtokens.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=1000)
+        parser.add_argument("--grace", type=int, default=0,
+                            help="Keep tokens that expired less than this many seconds ago.")
+        parser.add_argument("--pause", type=float, default=0.0, help="Seconds to sleep between chunks.")
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        total = chunks = 0
+        for deleted in prune_expired_tokens(options["chunk_size"], options["grace"]):
+            total += deleted
+            chunks += 1
+            if options["pause"]:
+                time.sleep(options["pause"])
+        self.stdout.write(f"Pruned {total} expired tokens in {chunks} chunks ({time.perf_counter() - started:.1f}s)")
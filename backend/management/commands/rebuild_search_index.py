@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from backend.search import get_search_backend
+
+
+class Command(BaseCommand):
+    help = "Drop and rebuild the mentor full-text search index."
+
+    def handle(self, *args, **options):
+        backend = get_search_backend()
+        backend.rebuild()
+        self.stdout.write(f"Mentor search index rebuilt with {type(backend).__name__}")
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from backend.models import MentorProfile
+
+
+class Command(BaseCommand):
+    help = "Populate the Skill tags of every mentor from their comma-separated skills field."
+
+    def handle(self, *args, **options):
+        total = 0
+        for mentor in MentorProfile.objects.only("id", "skills").iterator(chunk_size=500):
+            mentor.sync_skill_tags()
+            total += 1
+        self.stdout.write(f"{total} mentors synced")
@@ -0,0 +1,105 @@
+import logging
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .calendar_backends import get_calendar_backend
+from .models import Meeting, Request
+from .notifications import notify_users
+from .outbox import queue_mail
+from .utils import to_iso_z
+
+logger = logging.getLogger(__name__)
+
+MAX_LINK_ATTEMPTS = 5
+
+
+def schedule_meet_link(meeting):
+    # runs after the surrounding transaction commits so the job always sees the meeting row
+    mode = getattr(settings, "MEET_LINK_PROVISIONING", "worker")
+    if mode == "worker":
+        return
+    if mode == "inline":
+        transaction.on_commit(lambda: provision_meet_link(meeting.pk))
+    else:
+        transaction.on_commit(lambda: threading.Thread(
+            target=_provision_in_thread, args=(meeting.pk,), daemon=True).start())
+
+
+def _provision_in_thread(meeting_id):
+    try:
+        provision_meet_link(meeting_id)
+    except Exception:
+        logger.exception("Meet link provisioning crashed for meeting %s", meeting_id)
+    finally:
+        connections.close_all()
+
+
+def lease_expired_before():
+    return timezone.now() - timedelta(seconds=getattr(settings, "MEET_LINK_LEASE_SECONDS", 300))
+
+
+def claimable_meetings():
+    # pending rows, plus rows whose provisioning job died without releasing its claim
+    return Meeting.objects.filter(Q(link_status="pending") |
+                                  Q(link_status="provisioning", link_claimed_at__lt=lease_expired_before()))
+
+
+def claim_meet_link(meeting_id):
+    """
+    Take the meeting's provisioning lease with a single conditional UPDATE, so the after-commit job and the
+    provision_meet_links worker never both create a calendar event (and send invites) for it. Returns the
+    claim time, or None if the meeting is not pending or another job holds a live claim.
+    """
+    claimed_at = timezone.now()
+    if not claimable_meetings().filter(pk=meeting_id).update(link_status="provisioning", link_claimed_at=claimed_at):
+        return None
+    return claimed_at
+
+
+def provision_meet_link(meeting_id):
+    """Create the calendar event for a pending meeting, store its link and tell both participants."""
+    claimed_at = claim_meet_link(meeting_id)
+    if claimed_at is None:
+        return None
+    claim = Meeting.objects.filter(pk=meeting_id, link_status="provisioning", link_claimed_at=claimed_at)
+    meeting = Meeting.objects.select_related("mentor", "student").get(pk=meeting_id)
+    student, mentor = meeting.student, meeting.mentor
+    message = Request.objects.filter(student=student, mentor=mentor).values_list("message", flat=True).first()
+    try:
+        link = get_calendar_backend().create_meet_link(
+            meeting.start,
+            meeting.end,
+            summary=f"Meeting: {student.username} & {mentor.username}",
+            description=message or "",
+            attendees=[e for e in (student.email, mentor.email) if e],
+            organizer_email=mentor.email or None,
+        )
+        if not link:
+            raise RuntimeError("calendar backend returned no link")
+    except Exception as e:
+        attempts = meeting.link_attempts + 1
+        claim.update(link_attempts=attempts, link_claimed_at=None,
+                     link_status="failed" if attempts >= MAX_LINK_ATTEMPTS else "pending")
+        logger.warning("Meet link provisioning failed for meeting %s (attempt %d): %s", meeting.pk, attempts, e)
+        return None
+
+    with transaction.atomic():
+        # a job whose lease ran out and was taken over must not overwrite the other job's result
+        if not claim.update(meet_link=link, link_status="ready", link_claimed_at=None):
+            return None
+        queue_mail(
+            subject="Meeting scheduled",
+            message=(
+                f"Meeting between {student.username} and {mentor.username} scheduled for "
+                f"{to_iso_z(meeting.start)} — {to_iso_z(meeting.end)}.\n\n"
+                f"Meet link: {link}"
+            ),
+            recipient_list=[student.email, mentor.email],
+        )
+    notify_users([student.id, mentor.id], "meeting_link_ready", meeting_id=meeting.pk, meet_link=link)
+    return link
@@ -0,0 +1,69 @@
+import threading
+import time
+from contextlib import contextmanager
+
+_lock = threading.Lock()
+_counters = {}
+_timings = {}
+_gauges = {}
+
+
+def _key(name, labels):
+    return (name, tuple(sorted(labels.items())))
+
+
+def incr(name, value=1, **labels):
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+
+def observe(name, seconds, **labels):
+    key = _key(name, labels)
+    with _lock:
+        stat = _timings.setdefault(key, {"count": 0, "total": 0.0, "max": 0.0})
+        stat["count"] += 1
+        stat["total"] += seconds
+        stat["max"] = max(stat["max"], seconds)
+
+
+def gauge(name, value, **labels):
+    """Record a level such as a queue depth: the last value reported and the highest seen."""
+    key = _key(name, labels)
+    with _lock:
+        stat = _gauges.setdefault(key, {"value": value, "max": value})
+        stat["value"] = value
+        stat["max"] = max(stat["max"], value)
+
+
+@contextmanager
+def timer(name, **labels):
+    # the block may add labels (e.g. an outcome) through the yielded dict
+    start = time.perf_counter()
+    try:
+        yield labels
+    finally:
+        observe(name, time.perf_counter() - start, **labels)
+
+
+def snapshot():
+    with _lock:
+        return {
+            "counters": {_format(k): v for k, v in _counters.items()},
+            "timings": {_format(k): dict(v) for k, v in _timings.items()},
+            "gauges": {_format(k): dict(v) for k, v in _gauges.items()},
+        }
+
+
+def reset():
+    with _lock:
+        _counters.clear()
+        _timings.clear()
+        _gauges.clear()
+
+
+def _format(key):
+    name, labels = key
+    if not labels:
+        return name
+    return name + "{" + ",".join(f"{k}={v}" for k, v in labels) + "}"
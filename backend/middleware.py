@@ -0,0 +1,75 @@
+import logging
+import re
+import time
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger("backend.queries")
+
+_LITERAL_RE = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_IN_LIST_RE = re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)")
+# transaction control is timed but not counted against query budgets
+_TRANSACTION_SQL = ("SAVEPOINT", "RELEASE SAVEPOINT", "ROLLBACK TO SAVEPOINT", "BEGIN", "COMMIT", "ROLLBACK")
+
+
+def fingerprint(sql):
+    # the same statement with different parameters or IN-list sizes maps to one fingerprint
+    sql = _LITERAL_RE.sub("?", sql.replace("%s", "?"))
+    return " ".join(_IN_LIST_RE.sub("(...)", sql).split())
+
+
+class QueryRecorder:
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.fingerprints = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - start
+            if not sql.lstrip().upper().startswith(_TRANSACTION_SQL):
+                self.count += 1
+                self.fingerprints[fingerprint(sql)] += 1
+
+    @property
+    def duplicates(self):
+        return {sql: n for sql, n in self.fingerprints.items() if n > 1}
+
+    def server_timing(self):
+        return (f'db;dur={self.duration * 1000:.1f};'
+                f'desc="{self.count} queries, {len(self.duplicates)} duplicated"')
+
+
+@contextmanager
+def record_queries(using=None):
+    recorder = QueryRecorder()
+    with ExitStack() as stack:
+        for alias in [using] if using else connections:
+            stack.enter_context(connections[alias].execute_wrapper(recorder))
+        yield recorder
+
+
+class QueryStatsMiddleware:
+    """Records query count, DB time and repeated statements per request when QUERY_STATS is on."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not getattr(settings, "QUERY_STATS", False):
+            return self.get_response(request)
+        with record_queries() as recorder:
+            response = self.get_response(request)
+        response.query_stats = recorder
+        response["Server-Timing"] = recorder.server_timing()
+        logger.info("%s %s %s: %d queries, %.1fms", request.method, request.path, response.status_code,
+                    recorder.count, recorder.duration * 1000)
+        for sql, n in recorder.duplicates.items():
+            logger.warning("%s %s repeated %d times: %s", request.method, request.path, n, sql)
+        return response
@@ -1,5 +1,16 @@
 from django.contrib.auth.models import AbstractUser
 from django.db import models
+from django.utils import timezone
+
+from .utils import split_availability, parse_skill_tags
+
+
+def _compile_availability_on_save(instance, kwargs):
+    update_fields = kwargs.get('update_fields')
+    if update_fields is None or 'availability' in update_fields:
+        instance.availability_compiled, instance.availability_rules = split_availability(instance.availability)
+        if update_fields is not None:
+            kwargs['update_fields'] = set(update_fields) | {'availability_compiled', 'availability_rules'}
 
 class User(AbstractUser):
     ROLE_MENTOR = "mentor"
@@ -25,8 +36,14 @@ class StudentProfile(models.Model):
     contact = models.CharField(max_length=100, blank=True, verbose_name="Контакт (Telegram/Email)")
     location = models.CharField(max_length=100, blank=True, verbose_name="Місто/Країна")
     availability = models.JSONField(blank=True, null=True, default=list, verbose_name="Availability (UTC intervals)")
+    availability_compiled = models.JSONField(blank=True, default=list, editable=False)
+    availability_rules = models.JSONField(blank=True, default=list, editable=False)
     whatsapp_username = models.CharField(max_length=150, blank=True)
 
+    def save(self, *args, **kwargs):
+        _compile_availability_on_save(self, kwargs)
+        super().save(*args, **kwargs)
+
     def __str__(self):
         return f"Student: {self.user.username}"
 
@@ -46,27 +63,77 @@ class Request(models.Model):
     class Meta:
         unique_together = ('student', 'mentor')
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['mentor', 'status', '-created_at'], name='request_mentor_status_idx'),
+            models.Index(fields=['-created_at', '-id'], name='request_keyset_idx'),
+        ]
 
     def __str__(self):
         return f"From {self.student.username} to {self.mentor.username} ({self.status})"
 
+class Skill(models.Model):
+    name = models.CharField(max_length=100, unique=True)
+
+    class Meta:
+        ordering = ['name']
+
+    def __str__(self):
+        return self.name
+
 class MentorProfile(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='mentor_profile')
     title = models.CharField(max_length=200, blank=True)
     bio = models.TextField(blank=True)
     skills = models.CharField(max_length=500, blank=True)
+    skill_tags = models.ManyToManyField(Skill, through='MentorSkill', related_name='mentors', blank=True)
     location = models.CharField(max_length=200, blank=True)
     contact = models.CharField(max_length=200, blank=True)
     availability = models.JSONField(blank=True, null=True, default=list)
+    availability_compiled = models.JSONField(blank=True, default=list, editable=False)
+    availability_rules = models.JSONField(blank=True, default=list, editable=False)
     whatsapp_username = models.CharField(max_length=150, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # keyset pagination order, see KeysetPagination
+            models.Index(fields=['-created_at', '-id'], name='mentor_keyset_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        _compile_availability_on_save(self, kwargs)
+        adding = self._state.adding
+        super().save(*args, **kwargs)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or 'skills' in update_fields:
+            self.sync_skill_tags(adding=adding)
+
+    def sync_skill_tags(self, adding=False):
+        names = parse_skill_tags(self.skills)
+        if not names:
+            if not adding:
+                self.skill_tags.clear()
+            return
+        Skill.objects.bulk_create([Skill(name=n) for n in names], ignore_conflicts=True)
+        self.skill_tags.set(Skill.objects.filter(name__in=names))
 
     def __str__(self):
         return f"Mentor: {self.user.username} - {self.title or 'Mentor'}"
 
+class MentorSkill(models.Model):
+    mentor = models.ForeignKey(MentorProfile, on_delete=models.CASCADE, related_name='skill_links')
+    skill = models.ForeignKey(Skill, on_delete=models.CASCADE, related_name='mentor_links')
+
+    class Meta:
+        unique_together = ('mentor', 'skill')
+        indexes = [
+            models.Index(fields=['skill', 'mentor'], name='mentorskill_skill_mentor_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.mentor_id}: {self.skill_id}"
+
 class Proposal(models.Model):
     STATUS_CHOICES = [
         ('awaiting_mentor', 'Awaiting mentor slots'),
@@ -84,6 +151,13 @@ class Proposal(models.Model):
     chosen_slot = models.JSONField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['mentor', 'status'], name='proposal_mentor_status_idx'),
+            models.Index(fields=['student', 'status'], name='proposal_student_status_idx'),
+            models.Index(fields=['-created_at', '-id'], name='proposal_keyset_idx'),
+        ]
+
     def __str__(self):
         return f"Proposal {self.id} {self.student.username} <-> {self.mentor.username} ({self.status})"
 
@@ -113,5 +187,92 @@ class Meeting(models.Model):
 
     whatsapp_shared = models.BooleanField(default=False)
 
+    LINK_STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('provisioning', 'Provisioning'),
+        ('ready', 'Ready'),
+        ('failed', 'Failed'),
+    ]
+    link_status = models.CharField(max_length=12, choices=LINK_STATUS_CHOICES, default='ready')
+    link_attempts = models.PositiveIntegerField(default=0)
+    # when a provisioning job claimed the row; a claim older than MEET_LINK_LEASE_SECONDS may be taken over
+    link_claimed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['mentor', 'start'], name='meeting_mentor_start_idx'),
+            models.Index(fields=['student', 'start'], name='meeting_student_start_idx'),
+            # latest meeting per (student, mentor) pair, see ProposalViewSet
+            models.Index(fields=['student', 'mentor', '-created_at', '-id'], name='meeting_pair_latest_idx'),
+            models.Index(fields=['link_status', 'created_at'], name='meeting_link_status_idx'),
+            models.Index(fields=['-created_at', '-id'], name='meeting_keyset_idx'),
+        ]
+
+    def __str__(self):
+        return f"Meeting {self.id} {self.student.username} <-> {self.mentor.username} at {self.start.isoformat()}"
+
+class EmailOutbox(models.Model):
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('sent', 'Sent'),
+        ('failed', 'Failed'),
+    ]
+
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    from_email = models.CharField(max_length=254)
+    recipients = models.JSONField(default=list)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'], name='outbox_status_due_idx'),
+        ]
+
+    def __str__(self):
+        return f"Email {self.id} to {', '.join(self.recipients)} ({self.status})"
+
+class ChannelMessage(models.Model):
+    channel = models.CharField(max_length=100)
+    payload = models.JSONField()
+    expires_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['channel', 'id'], name='channelmessage_channel_idx'),
+            models.Index(fields=['expires_at'], name='channelmessage_expiry_idx'),
+        ]
+
+class ChannelGroupMembership(models.Model):
+    group = models.CharField(max_length=100)
+    channel = models.CharField(max_length=100)
+    expires_at = models.DateTimeField()
+
+    class Meta:
+        unique_together = ('group', 'channel')
+        indexes = [
+            models.Index(fields=['expires_at'], name='channelgroup_expiry_idx'),
+        ]
+
+class Notification(models.Model):
+    recipient = models.ForeignKey(User, on_delete=models.CASCADE, related_name='notifications')
+    event = models.CharField(max_length=64)
+    data = models.JSONField(default=dict)
+    read_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        # ids are the replay cursor, so a user's inbox is always read in id order
+        indexes = [
+            models.Index(fields=['recipient', 'id'], name='notification_recipient_idx'),
+            models.Index(fields=['recipient', 'read_at'], name='notification_unread_idx'),
+            models.Index(fields=['recipient', '-created_at', '-id'], name='notification_keyset_idx'),
+        ]
+
     def __str__(self):
-        return f"Meeting {self.id} {self.student.username} <-> {self.mentor.username} at {self.start.isoformat()}"
\ No newline at end of file
+        return f"Notification {self.id} {self.event} -> {self.recipient_id}"
@@ -0,0 +1,79 @@
+import asyncio
+import logging
+import time
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.db import transaction
+
+from . import metrics
+from .models import Notification
+
+logger = logging.getLogger(__name__)
+
+# most events a reconnecting socket gets in its replay frame; older ones stay available over REST
+REPLAY_LIMIT = 200
+
+
+def user_group(user_id):
+    return f"user_{user_id}"
+
+
+def build_event(event, recipient_id, sender_id=None, **data):
+    data["recipient_id"] = recipient_id
+    if sender_id is not None:
+        data["sender_id"] = sender_id
+    return {"type": "notify", "event": event, "data": data}
+
+
+def notify_users(recipient_ids, event, sender_id=None, **data):
+    """
+    Store `event` in each recipient's inbox and queue it; the whole batch goes out in one send once the
+    transaction commits. The inbox row id travels with the message so clients can resume from it.
+    """
+    queued = time.monotonic()
+    events = [build_event(event, uid, sender_id, **data) for uid in dict.fromkeys(recipient_ids)]
+    rows = Notification.objects.bulk_create(
+        [Notification(recipient_id=message["data"]["recipient_id"], event=event, data=message["data"])
+         for message in events])
+    messages = []
+    for row, message in zip(rows, events):
+        message["id"] = row.pk
+        messages.append((user_group(row.recipient_id), message))
+    transaction.on_commit(lambda: send_batch(messages, queued))
+
+
+def inbox_since(user_id, since, limit=REPLAY_LIMIT):
+    """
+    The user's notifications after id `since` in id order, and whether more than `limit` were waiting.
+    Best effort: ids are assigned at insert, so a row committed after a higher id was read can sit below the
+    cursor. The live socket still delivers it; REST pollers should allow for it (e.g. re-read a few ids back).
+    """
+    rows = list(Notification.objects.filter(recipient_id=user_id, id__gt=since).order_by("id")[:limit + 1])
+    return rows[:limit], len(rows) > limit
+
+
+async def _send_all(layer, messages):
+    return await asyncio.gather(*(layer.group_send(group, message) for group, message in messages),
+                                return_exceptions=True)
+
+
+def send_batch(messages, queued=None):
+    queued = time.monotonic() if queued is None else queued
+    layer = get_channel_layer()
+    try:
+        if layer is None:
+            raise RuntimeError("no channel layer configured")
+        results = async_to_sync(_send_all)(layer, messages)
+    except Exception as e:
+        results = [e] * len(messages)
+    latency = time.monotonic() - queued
+    sent = 0
+    for (group, message), result in zip(messages, results):
+        if isinstance(result, Exception):
+            metrics.incr("notifications.failed", event=message["event"])
+            logger.warning("Notification %s to %s failed: %s", message["event"], group, result)
+        else:
+            sent += 1
+            metrics.observe("notifications.delivery", latency, event=message["event"])
+    return sent
@@ -0,0 +1,95 @@
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.utils import timezone
+
+from .models import EmailOutbox
+
+logger = logging.getLogger(__name__)
+
+MAX_ATTEMPTS = 8
+RETRY_BASE_SECONDS = 30
+RETRY_MAX_SECONDS = 6 * 60 * 60
+# how long a drainer owns the batch it claimed; longer than any batch takes to send
+SEND_LEASE_SECONDS = 10 * 60
+
+
+def queue_mail(subject, message, from_email=None, recipient_list=()):
+    # written through the caller's transaction, so a rolled-back state change never sends mail
+    recipients = [r for r in recipient_list if r]
+    if not recipients:
+        return None
+    return EmailOutbox.objects.create(
+        subject=subject, body=message, from_email=from_email or settings.DEFAULT_FROM_EMAIL, recipients=recipients)
+
+
+def retry_delay(attempts):
+    return timedelta(seconds=min(RETRY_BASE_SECONDS * 2 ** (attempts - 1), RETRY_MAX_SECONDS))
+
+
+def _mark_failed(item, error, now, max_attempts):
+    item.attempts += 1
+    item.last_error = str(error)
+    if item.attempts >= max_attempts:
+        item.status = 'failed'
+    else:
+        item.next_attempt_at = now + retry_delay(item.attempts)
+
+
+def claim_batch(batch_size, now):
+    """
+    Lease up to `batch_size` due emails in one short transaction by moving their next attempt past the lease;
+    other drainers skip them, and if this one dies they come due again when the lease runs out.
+    """
+    lease_until = now + timedelta(seconds=SEND_LEASE_SECONDS)
+    with transaction.atomic():
+        ids = list(EmailOutbox.objects.select_for_update(skip_locked=True)
+                   .filter(status='pending', next_attempt_at__lte=now)
+                   .order_by('next_attempt_at', 'id').values_list('id', flat=True)[:batch_size])
+        if not ids:
+            return []
+        EmailOutbox.objects.filter(id__in=ids, status='pending', next_attempt_at__lte=now).update(
+            next_attempt_at=lease_until)
+    # the lease time doubles as the claim token where the database has no row locks (SQLite)
+    return list(EmailOutbox.objects.filter(id__in=ids, next_attempt_at=lease_until).order_by('id'))
+
+
+def drain_outbox(batch_size=100, max_attempts=MAX_ATTEMPTS):
+    """
+    Send one batch of due emails over a single connection; returns (sent, failed). The batch is claimed
+    first, so no transaction or row lock is held while talking to the mail server.
+    """
+    now = timezone.now()
+    batch = claim_batch(batch_size, now)
+    if not batch:
+        return 0, 0
+    sent = failed = 0
+    connection = get_connection()
+    try:
+        connection.open()
+    except Exception as e:
+        logger.warning("Email connection failed, retrying %d messages later: %s", len(batch), e)
+        for item in batch:
+            _mark_failed(item, e, now, max_attempts)
+        failed = len(batch)
+    else:
+        try:
+            for item in batch:
+                message = EmailMessage(item.subject, item.body, item.from_email, item.recipients,
+                                       connection=connection)
+                try:
+                    message.send()
+                except Exception as e:
+                    logger.warning("Email %s failed (attempt %d): %s", item.id, item.attempts + 1, e)
+                    _mark_failed(item, e, now, max_attempts)
+                    failed += 1
+                else:
+                    item.status, item.sent_at, item.last_error = 'sent', timezone.now(), ''
+                    sent += 1
+        finally:
+            connection.close()
+    EmailOutbox.objects.bulk_update(batch, ['status', 'attempts', 'next_attempt_at', 'last_error', 'sent_at'])
+    return sent, failed
@@ -0,0 +1,56 @@
+import numpy as np
+
+
+def _as_arrays(pairs):
+    arr = np.asarray(pairs, dtype=np.int64).reshape(-1, 2)
+    return arr[:, 0], arr[:, 1]
+
+
+def rank_mentors_by_overlap(student_pairs, mentors, min_minutes=0, since=None):
+    # all pairs are merged, sorted [start, end] epoch minutes; mentors yields (mentor_id, pairs)
+    ss, se = _as_arrays(student_pairs)
+    if since is not None:
+        keep = se > since
+        ss, se = np.maximum(ss[keep], since), se[keep]
+    if not len(ss):
+        return []
+
+    ids, owners, starts, ends = [], [], [], []
+    for mentor_id, pairs in mentors:
+        if not pairs:
+            continue
+        idx = len(ids)
+        ids.append(mentor_id)
+        for s, e in pairs:
+            owners.append(idx)
+            starts.append(s)
+            ends.append(e)
+    if not ids:
+        return []
+    owner = np.asarray(owners, dtype=np.int64)
+    ms = np.asarray(starts, dtype=np.int64)
+    me = np.asarray(ends, dtype=np.int64)
+
+    # student intervals are disjoint and sorted, so both ends are monotonic and
+    # the ones touching [ms, me) form the contiguous index range [lo, hi)
+    lo = np.searchsorted(se, ms, side='right')
+    hi = np.searchsorted(ss, me, side='left')
+    counts = np.clip(hi - lo, 0, None)
+    total = int(counts.sum())
+    if not total:
+        return []
+    rep = np.repeat(np.arange(len(ms)), counts)
+    offsets = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+    sidx = np.repeat(lo, counts) + offsets
+    piece = np.minimum(me[rep], se[sidx]) - np.maximum(ms[rep], ss[sidx])
+
+    keep = piece >= max(int(min_minutes), 1)
+    piece = piece[keep]
+    piece_owner = owner[rep][keep]
+    overlap = np.bincount(piece_owner, weights=piece, minlength=len(ids)).astype(np.int64)
+    longest = np.zeros(len(ids), dtype=np.int64)
+    np.maximum.at(longest, piece_owner, piece)
+
+    matched = np.nonzero(longest)[0]
+    order = matched[np.lexsort((-longest[matched], -overlap[matched]))]
+    return [(ids[i], int(overlap[i]), int(longest[i])) for i in order]
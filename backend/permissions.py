@@ -5,5 +5,5 @@ class IsOwnerOrReadOnly(permissions.BasePermission):
         if request.method in permissions.SAFE_METHODS:
             return True
         if hasattr(obj, 'user'):
-            return obj.user == request.user
+            return obj.user_id == request.user.id
         return False
\ No newline at end of file
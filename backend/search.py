@@ -0,0 +1,162 @@
+import re
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Q
+from django.utils.module_loading import import_string
+
+MAX_QUERY_TERMS = 8
+_TERM_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def query_terms(query):
+    return _TERM_RE.findall((query or "").lower())[:MAX_QUERY_TERMS]
+
+
+def _documents(mentor_ids=None):
+    from .models import MentorProfile
+    qs = MentorProfile.objects.order_by()
+    if mentor_ids is not None:
+        qs = qs.filter(id__in=mentor_ids)
+    return qs.values_list("id", "title", "bio", "skills", "user__first_name", "user__last_name")
+
+
+class SearchBackend:
+    def ensure_index(self):
+        pass
+
+    def index_mentors(self, mentor_ids):
+        pass
+
+    def remove_mentors(self, mentor_ids):
+        pass
+
+    def rebuild(self):
+        pass
+
+    def search(self, query, limit, offset=0):
+        """Ids of the mentors matching `query`, best match first, `limit` of them starting at `offset`."""
+        raise NotImplementedError
+
+
+class SQLiteFTSBackend(SearchBackend):
+    table = "backend_mentor_fts"
+    # bm25 weights for title, bio, skills, name
+    weights = (4.0, 1.0, 3.0, 5.0)
+
+    def ensure_index(self):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {self.table} USING fts5("
+                "title, bio, skills, name, tokenize='unicode61 remove_diacritics 2')"
+            )
+
+    def index_mentors(self, mentor_ids):
+        mentor_ids = list(mentor_ids)
+        self.remove_mentors(mentor_ids)
+        rows = [(pk, title, bio, skills.replace(",", " "), f"{first} {last}")
+                for pk, title, bio, skills, first, last in _documents(mentor_ids)]
+        if rows:
+            with connection.cursor() as cursor:
+                cursor.executemany(
+                    f"INSERT INTO {self.table}(rowid, title, bio, skills, name) VALUES (%s, %s, %s, %s, %s)", rows)
+
+    def remove_mentors(self, mentor_ids):
+        with connection.cursor() as cursor:
+            cursor.executemany(f"DELETE FROM {self.table} WHERE rowid = %s", [(pk,) for pk in mentor_ids])
+
+    def rebuild(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f"DROP TABLE IF EXISTS {self.table}")
+        self.ensure_index()
+        self.index_mentors(pk for pk, *_ in _documents())
+
+    def search(self, query, limit, offset=0):
+        terms = query_terms(query)
+        if not terms:
+            return []
+        match = " ".join(f'"{t}"*' for t in terms)
+        weights = ", ".join(str(w) for w in self.weights)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT rowid FROM {self.table} WHERE {self.table} MATCH %s "
+                f"ORDER BY bm25({self.table}, {weights}), rowid LIMIT %s OFFSET %s",
+                [match, limit, offset],
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+
+class PostgresSearchBackend(SearchBackend):
+    table = "backend_mentor_search"
+    document_sql = (
+        "setweight(to_tsvector('simple', %s), 'A') || setweight(to_tsvector('simple', %s), 'A') || "
+        "setweight(to_tsvector('simple', %s), 'B') || setweight(to_tsvector('simple', %s), 'C')"
+    )
+
+    def ensure_index(self):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"CREATE TABLE IF NOT EXISTS {self.table} (mentor_id bigint PRIMARY KEY, document tsvector NOT NULL)")
+            cursor.execute(
+                f"CREATE INDEX IF NOT EXISTS {self.table}_document_gin ON {self.table} USING GIN (document)")
+
+    def index_mentors(self, mentor_ids):
+        rows = [(pk, f"{first} {last}", title, skills.replace(",", " "), bio)
+                for pk, title, bio, skills, first, last in _documents(list(mentor_ids))]
+        if rows:
+            with connection.cursor() as cursor:
+                cursor.executemany(
+                    f"INSERT INTO {self.table} (mentor_id, document) VALUES (%s, {self.document_sql}) "
+                    "ON CONFLICT (mentor_id) DO UPDATE SET document = EXCLUDED.document",
+                    rows,
+                )
+
+    def remove_mentors(self, mentor_ids):
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {self.table} WHERE mentor_id = ANY(%s)", [list(mentor_ids)])
+
+    def rebuild(self):
+        self.ensure_index()
+        with connection.cursor() as cursor:
+            cursor.execute(f"TRUNCATE {self.table}")
+        self.index_mentors(pk for pk, *_ in _documents())
+
+    def search(self, query, limit, offset=0):
+        terms = query_terms(query)
+        if not terms:
+            return []
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT mentor_id FROM {self.table}, to_tsquery('simple', %s) q "
+                "WHERE document @@ q ORDER BY ts_rank(document, q) DESC, mentor_id LIMIT %s OFFSET %s",
+                [" & ".join(f"{t}:*" for t in terms), limit, offset],
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+
+class LikeSearchBackend(SearchBackend):
+    def search(self, query, limit, offset=0):
+        from .models import MentorProfile
+        qs = MentorProfile.objects.order_by("-created_at", "-id")
+        for term in query_terms(query):
+            qs = qs.filter(
+                Q(title__icontains=term) | Q(bio__icontains=term) | Q(skills__icontains=term)
+                | Q(user__first_name__icontains=term) | Q(user__last_name__icontains=term)
+            )
+        return list(qs.values_list("id", flat=True)[offset:offset + limit])
+
+
+_VENDOR_BACKENDS = {
+    "sqlite": SQLiteFTSBackend,
+    "postgresql": PostgresSearchBackend,
+}
+_backends = {}
+
+
+def get_search_backend():
+    path = getattr(settings, "MENTOR_SEARCH_BACKEND", None)
+    key = path or connection.vendor
+    if key not in _backends:
+        cls = import_string(path) if path else _VENDOR_BACKENDS.get(connection.vendor, LikeSearchBackend)
+        _backends[key] = cls()
+    return _backends[key]
@@ -1,13 +1,24 @@
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
-from rest_framework_simplejwt.tokens import RefreshToken
-from .models import StudentProfile, MentorProfile, Request, Proposal, Meeting
+from rest_framework_simplejwt.settings import api_settings
+from .models import StudentProfile, MentorProfile, Request, Proposal, Meeting, Notification
 from django.contrib.auth.tokens import default_token_generator
 from django.utils.http import urlsafe_base64_decode
 from django.utils.encoding import force_str
+from .authentication import user_cache
+from .freebusy import exceeds_max_meeting
+from .tokens import FamilyRefreshToken, revoked_families
+from .utils import compile_availability, minutes_to_availability, rules_to_availability
 
 User = get_user_model()
 
+def normalize_availability(value):
+    try:
+        pairs, rules = compile_availability(value)
+    except ValueError as e:
+        raise serializers.ValidationError(str(e))
+    return minutes_to_availability(pairs) + rules_to_availability(rules)
+
 class RegisterSerializer(serializers.ModelSerializer):
     password = serializers.CharField(write_only=True)
     email = serializers.EmailField(required=True)
@@ -80,7 +91,10 @@ class LogoutSerializer(serializers.Serializer):
         return attrs
     def save(self, **kwargs):
         try:
-            RefreshToken(self.token).blacklist()
+            token = FamilyRefreshToken(self.token)
+            token.blacklist()
+            revoked_families.revoke(token)
+            user_cache.invalidate(token[api_settings.USER_ID_CLAIM])
         except Exception:
             pass
 
@@ -90,6 +104,8 @@ class StudentProfileSerializer(serializers.ModelSerializer):
         model = StudentProfile
         fields = ('id', 'username', 'bio', 'interests', 'contact', 'location', 'availability', 'whatsapp_username')
         read_only_fields = ('id', 'username')
+    def validate_availability(self, value):
+        return normalize_availability(value)
 
 class UserInfoSerializer(serializers.ModelSerializer):
     class Meta:
@@ -111,6 +127,8 @@ class MentorUpdateSerializer(serializers.ModelSerializer):
     class Meta:
         model = MentorProfile
         fields = ('title', 'bio', 'skills', 'location', 'contact', 'availability', 'whatsapp_username')
+    def validate_availability(self, value):
+        return normalize_availability(value)
 
 class RequestSerializer(serializers.ModelSerializer):
     student_name = serializers.CharField(source='student.username', read_only=True)
@@ -128,6 +146,25 @@ class RequestSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError("Цільовий користувач не є ментором.")
         return value
 
+def latest_meetings_queryset():
+    return Meeting.objects.select_related('mentor__mentor_profile', 'student__student_profile')
+
+def attach_latest_meetings(proposals):
+    # proposals carry a latest_meeting_id annotation (see ProposalViewSet.get_queryset);
+    # resolve all of them with one query and cache the result on each instance
+    proposals = [p for p in proposals if not hasattr(p, '_latest_meeting')]
+    ids = {p.latest_meeting_id for p in proposals if getattr(p, 'latest_meeting_id', None)}
+    meetings = latest_meetings_queryset().in_bulk(ids) if ids else {}
+    for p in proposals:
+        if hasattr(p, 'latest_meeting_id'):
+            p._latest_meeting = meetings.get(p.latest_meeting_id)
+
+class ProposalListSerializer(serializers.ListSerializer):
+    def to_representation(self, data):
+        items = list(data.all() if hasattr(data, 'all') else data)
+        attach_latest_meetings(items)
+        return super().to_representation(items)
+
 class ProposalSerializer(serializers.ModelSerializer):
     student_username = serializers.CharField(source='student.username', read_only=True)
     mentor_username = serializers.CharField(source='mentor.username', read_only=True)
@@ -141,15 +178,16 @@ class ProposalSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Proposal
+        list_serializer_class = ProposalListSerializer
         fields = ('id', 'request', 'mentor', 'mentor_username', 'student', 'student_username', 'slots', 'status', 'chosen_slot', 'created_at',
                   'meeting_id', 'meet_link', 'whatsapp_shared', 'mentor_whatsapp', 'student_whatsapp', 'meeting_start', 'meeting_end')
         read_only_fields = ('id', 'created_at', 'mentor_username', 'student_username', 'meeting_id', 'meet_link', 'whatsapp_shared', 'mentor_whatsapp', 'student_whatsapp', 'meeting_start', 'meeting_end')
 
     def _get_latest_meeting(self, obj):
-        try:
-            return Meeting.objects.filter(student=obj.student, mentor=obj.mentor).order_by('-created_at').first()
-        except Exception:
-            return None
+        if not hasattr(obj, '_latest_meeting'):
+            obj._latest_meeting = latest_meetings_queryset().filter(
+                student_id=obj.student_id, mentor_id=obj.mentor_id).order_by('-created_at', '-id').first()
+        return obj._latest_meeting
 
     def get_meeting_id(self, obj):
         m = self._get_latest_meeting(obj)
@@ -202,7 +240,18 @@ class MeetingSerializer(serializers.ModelSerializer):
         fields = ('id', 'mentor', 'mentor_username', 'student', 'student_username', 'start', 'end', 'status', 'meet_link', 'created_at',
                   'student_attended', 'student_liked', 'student_continue',
                   'mentor_attended', 'mentor_liked', 'mentor_continue',
-                  'whatsapp_shared', 'mentor_whatsapp', 'student_whatsapp')
+                  'whatsapp_shared', 'mentor_whatsapp', 'student_whatsapp', 'link_status')
+        read_only_fields = ('link_status',)
+
+    def validate(self, attrs):
+        start = attrs.get('start', getattr(self.instance, 'start', None))
+        end = attrs.get('end', getattr(self.instance, 'end', None))
+        if start and end:
+            if start >= end:
+                raise serializers.ValidationError("Meeting must end after it starts.")
+            if exceeds_max_meeting(start, end):
+                raise serializers.ValidationError("Meetings cannot be longer than 24 hours.")
+        return attrs
 
     def get_mentor_whatsapp(self, obj):
         if obj.whatsapp_shared:
@@ -216,4 +265,11 @@ class MeetingSerializer(serializers.ModelSerializer):
             prof = getattr(obj.student, "student_profile", None)
             if prof and prof.whatsapp_username:
                 return f"https://wa.me/{prof.whatsapp_username}"
-        return ""
\ No newline at end of file
+        return ""
+
+
+class NotificationSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Notification
+        fields = ('id', 'event', 'data', 'read_at', 'created_at')
+        read_only_fields = fields
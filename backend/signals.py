@@ -0,0 +1,59 @@
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from .authentication import user_cache
+from .cache import schedule_directory_bump
+from .models import MentorProfile, User
+from .search import get_search_backend
+
+# fields of User shown in the mentor directory or indexed for search
+DIRECTORY_USER_FIELDS = {"username", "email", "first_name", "last_name"}
+
+
+@receiver(post_save, sender=MentorProfile)
+def index_mentor_profile(sender, instance, raw=False, **kwargs):
+    schedule_directory_bump()
+    if not raw:
+        get_search_backend().index_mentors([instance.id])
+
+
+@receiver(post_delete, sender=MentorProfile)
+def unindex_mentor_profile(sender, instance, **kwargs):
+    schedule_directory_bump()
+    get_search_backend().remove_mentors([instance.id])
+
+
+@receiver(m2m_changed, sender=MentorProfile.skill_tags.through)
+def mentor_skills_changed(sender, action, **kwargs):
+    if action in ("post_add", "post_remove", "post_clear"):
+        schedule_directory_bump()
+
+
+@receiver(post_save, sender=User)
+def mentor_user_changed(sender, instance, created=False, raw=False, update_fields=None, **kwargs):
+    if raw or created:
+        return
+    if update_fields is not None and not DIRECTORY_USER_FIELDS.intersection(update_fields):
+        return
+    mentor_ids = list(MentorProfile.objects.filter(user_id=instance.id).values_list("id", flat=True))
+    if mentor_ids:
+        schedule_directory_bump()
+        get_search_backend().index_mentors(mentor_ids)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def forget_cached_user(sender, instance, signal, **kwargs):
+    # role changes and deactivation must reach CachedJWTAuthentication; queryset.update() bypasses this.
+    # After commit, or a concurrent request could cache the old row again before the change lands
+    pk, inactive = instance.pk, signal is post_delete or not instance.is_active
+
+    def forget():
+        user_cache.invalidate(pk)
+        user_cache.set_inactive(pk, inactive)
+    transaction.on_commit(forget)
+
+
+def ensure_search_index(sender, **kwargs):
+    get_search_backend().ensure_index()
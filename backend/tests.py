@@ -1,11 +1,75 @@
+import asyncio
+from contextlib import suppress
+from datetime import timedelta
+from io import StringIO
+from itertools import islice
+import json
+import threading
+from unittest import mock
 from django.urls import reverse
 from rest_framework.test import APITestCase
 from rest_framework import status
+from asgiref.sync import async_to_sync
+from asgiref.testing import ApplicationCommunicator
+from channels.exceptions import ChannelFull
+from channels.layers import get_channel_layer
 from django.contrib.auth import get_user_model
-from .models import MentorProfile
+from django.contrib.auth.tokens import default_token_generator
+from django.db import connection
+from django.db.models import Q
+from django.test import override_settings
+from django.urls import URLResolver
+from django.utils.encoding import force_bytes
+from django.utils import timezone
+from django.utils.http import urlsafe_base64_encode
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+from django.core import mail
+from django.core.exceptions import ImproperlyConfigured
+from django.core.mail import EmailMessage
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.core.cache import cache
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from .models import MentorProfile, StudentProfile, Proposal, Meeting, Request, EmailOutbox, ChannelMessage, Notification
+from . import checks, metrics, utils
+from . import urls as backend_urls
+from .middleware import record_queries
+from .outbox import drain_outbox
+from .calendar_backends import get_calendar_backend
+from .channel_layer import DatabaseChannelLayer
+from .authentication import CachedJWTAuthentication, user_cache
+from .cache import bump_directory_version
+from .blacklist import BloomFilter, blacklist_filter, is_blacklisted
+from .consumers import NotificationConsumer
+from .google_auth import CertCache, FakeGoogleIdTokenVerifier, cache_max_age, get_google_verifier
+from .tokens import FAMILY_CLAIM, FamilyRefreshToken, revoked_families
+from .ws_auth import JWTAuthMiddleware
+from .meet_links import claim_meet_link, provision_meet_link
+from .notifications import build_event, notify_users, send_batch, user_group
+from .freebusy import busy_intervals, lock_participants
+from .overlap import rank_mentors_by_overlap
+from .utils import (
+    availability_to_minutes,
+    compute_common_slots,
+    iter_availability,
+    iter_coverage,
+    iter_intersect_many,
+    minutes_to_availability,
+    parse_iso_to_utc,
+    profile_availability,
+    subtract_intervals,
+    to_epoch_minutes,
+)
 
 User = get_user_model()
 
+# test cases run inside a transaction other threads can't see, so the channel layer polls on the test's thread
+TEST_CHANNEL_LAYERS = {"default": {"BACKEND": "backend.channel_layer.DatabaseChannelLayer",
+                                   "CONFIG": {"poll_thread_sensitive": True}}}
+FAKE_GOOGLE_LOGIN = {"DEBUG": True, "GOOGLE_ID_TOKEN_VERIFIER": "backend.google_auth.FakeGoogleIdTokenVerifier",
+                     "GOOGLE_FAKE_ID_TOKEN_KEYS": {"fake-key": "fake-google-signing-secret"}}
+
 class MentorTests(APITestCase):
     def setUp(self):
         self.user1 = User.objects.create_user(username="u1", password="pass12345", role=User.ROLE_MENTOR)
@@ -34,3 +98,1445 @@ class MentorTests(APITestCase):
         url = reverse("mentor-detail", args=[self.mentor2.id])
         resp = self.client.patch(url, {"bio": "hacked"}, format="json")
         self.assertIn(resp.status_code, (status.HTTP_403_FORBIDDEN, status.HTTP_404_NOT_FOUND))
+
+class MentorOverlapSearchTests(APITestCase):
+    def setUp(self):
+        self.student = User.objects.create_user(username="s1", password="pass12345", role=User.ROLE_STUDENT)
+        StudentProfile.objects.create(user=self.student, availability=[
+            {"start": "2099-01-05T09:00:00Z", "end": "2099-01-05T12:00:00Z"},
+            {"start": "2099-01-06T09:00:00Z", "end": "2099-01-06T10:00:00Z"},
+        ])
+        self.mentors = {}
+        for name, availability in [
+            ("short", [{"start": "2099-01-05T11:30:00Z", "end": "2099-01-05T13:00:00Z"}]),
+            ("wide", [{"start": "2099-01-05T08:00:00Z", "end": "2099-01-06T23:00:00Z"}]),
+            ("one_hour", [{"start": "2099-01-06T09:00:00Z", "end": "2099-01-06T10:00:00Z"}]),
+            ("none", [{"start": "2099-01-07T09:00:00Z", "end": "2099-01-07T12:00:00Z"}]),
+        ]:
+            user = User.objects.create_user(username=name, password="pass12345", role=User.ROLE_MENTOR)
+            self.mentors[name] = MentorProfile.objects.create(user=user, availability=availability)
+
+    def test_rank_mentors_by_overlap(self):
+        student = availability_to_minutes(StudentProfile.objects.get(user=self.student).availability)
+        mentors = [(m.id, availability_to_minutes(m.availability)) for m in self.mentors.values()]
+        ranked = rank_mentors_by_overlap(student, mentors, min_minutes=30)
+        self.assertEqual([r[0] for r in ranked],
+                         [self.mentors["wide"].id, self.mentors["one_hour"].id, self.mentors["short"].id])
+        self.assertEqual(ranked[0][1:], (240, 180))
+
+    def test_overlaps_with_me_endpoint(self):
+        self.client.force_authenticate(self.student)
+        resp = self.client.get(reverse("mentor-list"), {"overlaps_with_me": 1, "min_minutes": 60})
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        usernames = [row["username"] for row in resp.data["results"]]
+        self.assertEqual(usernames, ["wide", "one_hour"])
+        self.assertEqual(resp.data["results"][0]["overlap_minutes"], 240)
+
+    @override_settings(OVERLAP_RANKING_DAYS=1)
+    def test_overlap_is_ranked_over_the_ranking_window(self):
+        self.client.force_authenticate(self.student)
+        resp = self.client.get(reverse("mentor-list"), {"overlaps_with_me": 1, "min_minutes": 60})
+        self.assertEqual([(row["username"], row["overlap_minutes"]) for row in resp.data["results"]],
+                         [("wide", 180)])
+
+    def test_overlaps_with_me_requires_auth(self):
+        resp = self.client.get(reverse("mentor-list"), {"overlaps_with_me": 1})
+        self.assertEqual(resp.status_code, status.HTTP_401_UNAUTHORIZED)
+
+class CompiledAvailabilityTests(APITestCase):
+    def setUp(self):
+        self.student = User.objects.create_user(username="s1", password="pass12345", role=User.ROLE_STUDENT)
+        self.profile = StudentProfile.objects.create(user=self.student)
+        self.client.force_authenticate(self.student)
+
+    def test_availability_is_merged_and_compiled_on_save(self):
+        resp = self.client.patch(reverse("student-me"), {"availability": [
+            {"start": "2099-01-05T10:00:00Z", "end": "2099-01-05T11:00:00Z"},
+            {"start": "2099-01-05T09:00:00+00:00", "end": "2099-01-05T10:00:00+00:00"},
+            {"start": "2099-01-05T10:30:00Z", "end": "2099-01-05T12:00:00Z"},
+        ]}, format="json")
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertEqual(resp.data["availability"], [{"start": "2099-01-05T09:00:00Z", "end": "2099-01-05T12:00:00Z"}])
+        self.profile.refresh_from_db()
+        start = to_epoch_minutes(parse_iso_to_utc("2099-01-05T09:00:00Z"))
+        self.assertEqual(self.profile.availability_compiled, [[start, start + 180]])
+
+    def test_junk_intervals_are_rejected(self):
+        for junk in ([{"start": "tomorrow", "end": "2099-01-05T11:00:00Z"}],
+                     [{"start": "2099-01-05T11:00:00Z", "end": "2099-01-05T10:00:00Z"}],
+                     [{"start": "2099-01-05T11:00:00Z"}],
+                     [{"start": "2099-01-05T10:00:30Z", "end": "2099-01-05T11:00:00Z"}],
+                     [{"rrule": "FREQ=DAILY", "start": "2099-01-05T10:00:00Z", "end": "2099-01-05T11:00:00Z",
+                       "exdates": ["2099-01-06T10:00:00.5Z"]}],
+                     {"start": "2099-01-05T11:00:00Z"}):
+            resp = self.client.patch(reverse("student-me"), {"availability": junk}, format="json")
+            self.assertEqual(resp.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_compute_common_slots_reads_compiled_pairs(self):
+        start = to_epoch_minutes(parse_iso_to_utc("2099-01-05T09:00:00Z"))
+        slots = compute_common_slots([[start, start + 120]], [[start + 30, start + 240]], limit=2)
+        self.assertEqual(slots, [
+            {"start": "2099-01-05T09:30:00Z", "end": "2099-01-05T10:30:00Z"},
+            {"start": "2099-01-05T10:00:00Z", "end": "2099-01-05T11:00:00Z"},
+        ])
+
+class SuggestedSlotsTests(APITestCase):
+    def setUp(self):
+        self.mentor = User.objects.create_user(username="m1", password="pass12345", role=User.ROLE_MENTOR)
+        self.student = User.objects.create_user(username="s1", password="pass12345", role=User.ROLE_STUDENT)
+        MentorProfile.objects.create(user=self.mentor, availability=[
+            {"start": "2099-01-05T09:00:00Z", "end": "2099-01-05T12:00:00Z"},
+            {"start": "2099-01-06T09:00:00Z", "end": "2099-01-06T11:00:00Z"},
+        ])
+        StudentProfile.objects.create(user=self.student, availability=[
+            {"start": "2099-01-05T10:00:00Z", "end": "2099-01-06T10:30:00Z"},
+        ])
+        self.proposal = Proposal.objects.create(mentor=self.mentor, student=self.student)
+        self.url = reverse("proposal-suggested-slots", args=[self.proposal.id])
+        self.client.force_authenticate(self.student)
+
+    def test_pages_follow_cursor(self):
+        starts = []
+        params = {"limit": 2}
+        while True:
+            resp = self.client.get(self.url, params)
+            self.assertEqual(resp.status_code, status.HTTP_200_OK)
+            starts += [slot["start"] for slot in resp.data["results"]]
+            if not resp.data["next"]:
+                break
+            params["after"] = resp.data["next"]
+        self.assertEqual(starts, ["2099-01-05T10:00:00Z", "2099-01-05T10:30:00Z", "2099-01-05T11:00:00Z",
+                                  "2099-01-06T09:00:00Z", "2099-01-06T09:30:00Z"])
+
+    def test_invalid_cursor(self):
+        resp = self.client.get(self.url, {"after": "not-a-cursor"})
+        self.assertEqual(resp.status_code, status.HTTP_400_BAD_REQUEST)
+
+class RecurringAvailabilityTests(APITestCase):
+    def setUp(self):
+        self.student = User.objects.create_user(username="s1", password="pass12345", role=User.ROLE_STUDENT)
+        self.profile = StudentProfile.objects.create(user=self.student)
+        self.client.force_authenticate(self.student)
+
+    def test_weekly_rule_is_stored_as_rule_and_expanded_lazily(self):
+        resp = self.client.patch(reverse("student-me"), {"availability": [
+            {"rrule": "FREQ=WEEKLY;BYDAY=MO", "start": "2099-01-05T09:00:00Z", "end": "2099-01-05T11:00:00Z",
+             "exdates": ["2099-01-12T09:00:00Z"]},
+        ]}, format="json")
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.profile.refresh_from_db()
+        self.assertEqual(self.profile.availability_compiled, [])
+        self.assertEqual(len(self.profile.availability_rules), 1)
+        mondays = list(islice(iter_availability(profile_availability(self.profile)), 3))
+        self.assertEqual(minutes_to_availability(mondays), [
+            {"start": "2099-01-05T09:00:00Z", "end": "2099-01-05T11:00:00Z"},
+            {"start": "2099-01-19T09:00:00Z", "end": "2099-01-19T11:00:00Z"},
+            {"start": "2099-01-26T09:00:00Z", "end": "2099-01-26T11:00:00Z"},
+        ])
+
+    def test_common_slots_between_rule_and_intervals(self):
+        mentor = [{"rrule": "FREQ=DAILY", "start": "2099-01-05T10:00:00Z", "end": "2099-01-05T12:00:00Z"}]
+        student = [{"start": "2099-03-01T11:00:00Z", "end": "2099-03-01T15:00:00Z"}]
+        self.assertEqual(compute_common_slots(mentor, student, limit=5),
+                         [{"start": "2099-03-01T11:00:00Z", "end": "2099-03-01T12:00:00Z"}])
+
+    def test_old_rules_expand_from_an_anchor_near_the_window(self):
+        after = to_epoch_minutes(parse_iso_to_utc("2099-06-03T00:00:00Z"))
+        for rrule in ("FREQ=DAILY;INTERVAL=3", "FREQ=WEEKLY;INTERVAL=2;BYDAY=MO,TH", "FREQ=MONTHLY;BYDAY=-1FR",
+                      "FREQ=YEARLY;INTERVAL=2", "FREQ=WEEKLY;COUNT=600"):
+            _, [rule] = utils.compile_availability([
+                {"rrule": rrule, "start": "2090-01-05T09:00:00Z", "end": "2090-01-05T11:00:00Z"}])
+            from_start = utils._parse_rule(rrule, rule["dtstart"]).xafter(
+                utils.from_epoch_minutes(after - 120), inc=False)
+            expected = [[to_epoch_minutes(o), to_epoch_minutes(o) + 120] for o in islice(from_start, 5)]
+            self.assertEqual(list(islice(utils.iter_rule_intervals(rule, after), 5)), expected)
+            if "COUNT" not in rrule:
+                self.assertGreater(utils._rule_anchor(rule, after), after - 2 * 366 * 24 * 60)
+
+    def test_sub_daily_rules_are_rejected(self):
+        resp = self.client.patch(reverse("student-me"), {"availability": [
+            {"rrule": "FREQ=MINUTELY", "start": "2099-01-05T09:00:00Z", "end": "2099-01-05T09:01:00Z"},
+        ]}, format="json")
+        self.assertEqual(resp.status_code, status.HTTP_400_BAD_REQUEST)
+
+class FreeBusyTests(APITestCase):
+    def setUp(self):
+        self.mentor = User.objects.create_user(username="m1", password="pass12345", role=User.ROLE_MENTOR)
+        self.student = User.objects.create_user(username="s1", password="pass12345", role=User.ROLE_STUDENT)
+        MentorProfile.objects.create(user=self.mentor, availability=[
+            {"start": "2099-01-05T09:00:00Z", "end": "2099-01-05T13:00:00Z"},
+        ])
+        StudentProfile.objects.create(user=self.student, availability=[
+            {"start": "2099-01-05T09:00:00Z", "end": "2099-01-05T13:00:00Z"},
+        ])
+        other = User.objects.create_user(username="s2", password="pass12345", role=User.ROLE_STUDENT)
+        Meeting.objects.create(mentor=self.mentor, student=other, start=parse_iso_to_utc("2099-01-05T10:00:00Z"),
+                               end=parse_iso_to_utc("2099-01-05T11:00:00Z"))
+        Meeting.objects.create(mentor=self.mentor, student=other, start=parse_iso_to_utc("2099-01-05T11:00:00Z"),
+                               end=parse_iso_to_utc("2099-01-05T12:00:00Z"), status="cancelled")
+        self.proposal = Proposal.objects.create(mentor=self.mentor, student=self.student)
+
+    def test_subtract_intervals(self):
+        self.assertEqual(subtract_intervals([[0, 10], [20, 30]], [[2, 4], [8, 22], [25, 26]]),
+                         [[0, 2], [4, 8], [22, 25], [26, 30]])
+
+    def test_freebusy_endpoint(self):
+        self.client.force_authenticate(self.student)
+        resp = self.client.get(reverse("user-freebusy", args=[self.mentor.id]),
+                               {"from": "2099-01-05T00:00:00Z", "to": "2099-01-06T00:00:00Z"})
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertEqual(resp.data["busy"], [{"start": "2099-01-05T10:00:00Z", "end": "2099-01-05T11:00:00Z"}])
+        self.assertEqual(resp.data["free"], [{"start": "2099-01-05T09:00:00Z", "end": "2099-01-05T10:00:00Z"},
+                                             {"start": "2099-01-05T11:00:00Z", "end": "2099-01-05T13:00:00Z"}])
+
+    def test_meetings_longer_than_a_day_are_not_written(self):
+        meeting = Meeting.objects.filter(mentor=self.mentor, status="scheduled").get()
+        self.client.force_authenticate(self.mentor)
+        resp = self.client.patch(reverse("meeting-detail", args=[meeting.id]),
+                                 {"start": "2099-01-03T00:00:00Z"}, format="json")
+        self.assertEqual(resp.status_code, status.HTTP_400_BAD_REQUEST)
+        slot = {"start": "2099-01-03T00:00:00Z", "end": "2099-01-05T09:30:00Z"}
+        proposal = Proposal.objects.create(mentor=self.mentor, student=self.student, status="student_chosen",
+                                           chosen_slot=slot)
+        resp = self.client.post(reverse("proposal-confirm", args=[proposal.id]))
+        self.assertEqual(resp.data["detail"], "Meetings cannot be longer than 24 hours.")
+
+    def test_freebusy_is_limited_to_self_and_counterparties(self):
+        stranger = User.objects.create_user(username="s3", password="pass12345", role=User.ROLE_STUDENT)
+        url = reverse("user-freebusy", args=[self.mentor.id])
+        self.client.force_authenticate(stranger)
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_403_FORBIDDEN)
+        self.client.force_authenticate(self.mentor)
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_200_OK)
+        self.assertEqual(self.client.get(reverse("user-freebusy", args=[self.student.id])).status_code,
+                         status.HTTP_200_OK)
+
+    def test_suggested_slots_skip_busy_time(self):
+        self.client.force_authenticate(self.student)
+        resp = self.client.get(reverse("proposal-suggested-slots", args=[self.proposal.id]), {"step": 60})
+        self.assertEqual([s["start"] for s in resp.data["results"]],
+                         ["2099-01-05T09:00:00Z", "2099-01-05T11:00:00Z", "2099-01-05T12:00:00Z"])
+
+    def test_propose_slots_rejects_double_booking(self):
+        self.client.force_authenticate(self.mentor)
+        url = reverse("proposal-propose-slots", args=[self.proposal.id])
+        resp = self.client.post(url, {"slots": [{"start": "2099-01-05T10:30:00Z", "end": "2099-01-05T11:30:00Z"}]},
+                                format="json")
+        self.assertEqual(resp.status_code, status.HTTP_400_BAD_REQUEST)
+        resp = self.client.post(url, {"slots": [{"start": "2099-01-05T11:00:00Z", "end": "2099-01-05T12:00:00Z"}]},
+                                format="json")
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+
+    def test_second_of_two_overlapping_proposals_conflicts(self):
+        slot = {"start": "2099-01-05T11:00:00Z", "end": "2099-01-05T12:00:00Z"}
+        first = Proposal.objects.create(mentor=self.mentor, student=self.student, status="pending", slots=[slot])
+        other = User.objects.create_user(username="s9", password="pass12345", role=User.ROLE_STUDENT)
+        second = Proposal.objects.create(mentor=self.mentor, student=other, status="student_chosen", chosen_slot=slot)
+        self.client.force_authenticate(self.student)
+        with mock.patch("backend.views.lock_participants", wraps=lock_participants) as lock:
+            resp = self.client.post(reverse("proposal-select", args=[first.id]), {"chosen_slot": slot}, format="json")
+        self.assertEqual(resp.status_code, status.HTTP_201_CREATED)
+        lock.assert_called_once_with([self.mentor.id, self.student.id])
+        self.client.force_authenticate(self.mentor)
+        resp = self.client.post(reverse("proposal-confirm", args=[second.id]))
+        self.assertEqual((resp.status_code, resp.data["detail"]),
+                         (status.HTTP_400_BAD_REQUEST, "Slot overlaps an existing meeting."))
+        self.assertEqual(Meeting.objects.filter(mentor=self.mentor, status="scheduled",
+                                                start=parse_iso_to_utc(slot["start"])).count(), 1)
+
+class GroupSlotsTests(APITestCase):
+    def setUp(self):
+        self.mentor_user = User.objects.create_user(username="m1", password="pass12345", role=User.ROLE_MENTOR)
+        self.mentor = MentorProfile.objects.create(user=self.mentor_user, availability=[
+            {"start": "2099-01-05T08:00:00Z", "end": "2099-01-05T14:00:00Z"},
+        ])
+        self.students = []
+        for name, start, end in [("a", "09:00", "12:00"), ("b", "10:00", "13:00"), ("c", "11:00", "14:00")]:
+            user = User.objects.create_user(username=name, password="pass12345", role=User.ROLE_STUDENT)
+            StudentProfile.objects.create(user=user, availability=[
+                {"start": f"2099-01-05T{start}:00Z", "end": f"2099-01-05T{end}:00Z"},
+            ])
+            self.students.append(user.id)
+        self.url = reverse("mentor-group-slots", args=[self.mentor.id])
+        self.client.force_authenticate(self.mentor_user)
+
+    def test_intersect_many_and_coverage(self):
+        streams = [[[0, 10], [20, 30]], [[5, 25]], [[8, 22]]]
+        self.assertEqual(list(iter_intersect_many(streams)), [[8, 10], [20, 22]])
+        self.assertEqual(list(iter_coverage(streams, 3)), [[8, 10], [20, 22]])
+        self.assertEqual(list(iter_coverage(streams, 2)), [[5, 25]])
+
+    def test_all_students(self):
+        resp = self.client.get(self.url, {"students": ",".join(map(str, self.students))})
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertEqual(resp.data["results"], [{"start": "2099-01-05T11:00:00Z", "end": "2099-01-05T12:00:00Z",
+                                                 "available_students": self.students}])
+
+    def test_at_least_two_students(self):
+        resp = self.client.get(self.url, {"students": ",".join(map(str, self.students)), "min_students": 2, "step": 60})
+        self.assertEqual([s["start"] for s in resp.data["results"]],
+                         ["2099-01-05T10:00:00Z", "2099-01-05T11:00:00Z", "2099-01-05T12:00:00Z"])
+        self.assertEqual(resp.data["results"][0]["available_students"], self.students[:2])
+
+    def test_only_the_mentor_can_plan(self):
+        self.client.force_authenticate(User.objects.get(id=self.students[0]))
+        resp = self.client.get(self.url, {"students": str(self.students[0])})
+        self.assertEqual(resp.status_code, status.HTTP_403_FORBIDDEN)
+
+class SkillSearchTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        for name, skills in [("py", "Python, Django"), ("js", "javascript,react"), ("java", "Java, python"),
+                             ("dj", "django ,  rest framework")]:
+            user = User.objects.create_user(username=name, password="pass12345", role=User.ROLE_MENTOR)
+            MentorProfile.objects.create(user=user, skills=skills)
+
+    def usernames(self, params):
+        resp = self.client.get(reverse("mentor-list"), params)
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        return sorted(row["username"] for row in resp.data["results"])
+
+    def test_exact_tags_do_not_match_substrings(self):
+        self.assertEqual(self.usernames({"skill": "java"}), ["java"])
+
+    def test_and_or_semantics(self):
+        self.assertEqual(self.usernames({"skill": ["python", "django"]}), ["py"])
+        self.assertEqual(self.usernames({"skill": ["python", "django"], "skill_match": "any"}), ["dj", "java", "py"])
+
+    def test_prefix_and_facets(self):
+        self.assertEqual(self.usernames({"skill_prefix": "jav"}), ["java", "js"])
+        resp = self.client.get(reverse("mentor-list"), {"skill": "python", "facets": 1})
+        self.assertEqual(resp.data["facets"], [{"name": "python", "count": 2}, {"name": "django", "count": 1},
+                                               {"name": "java", "count": 1}])
+
+    def test_tags_follow_skills_updates(self):
+        mentor = MentorProfile.objects.get(user__username="js")
+        mentor.skills = "react, typescript"
+        mentor.save()
+        self.assertEqual(sorted(mentor.skill_tags.values_list("name", flat=True)), ["react", "typescript"])
+        resp = self.client.get(reverse("mentor-skills"), {"prefix": "ty"})
+        self.assertEqual(resp.data, [{"name": "typescript", "count": 1}])
+
+class MentorFullTextSearchTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        for name, first, title, skills, bio in [
+            ("m1", "Olena", "Backend engineer", "python, django", "I like databases"),
+            ("m2", "Taras", "Frontend lead", "react", "Python scripting on weekends"),
+            ("m3", "Iryna", "Data scientist", "pandas", "Statistics"),
+        ]:
+            user = User.objects.create_user(username=name, first_name=first, password="pass12345", role=User.ROLE_MENTOR)
+            MentorProfile.objects.create(user=user, title=title, skills=skills, bio=bio)
+
+    def search(self, q, **params):
+        resp = self.client.get(reverse("mentor-list"), {"q": q, **params})
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        return [row["username"] for row in resp.data["results"]]
+
+    def test_ranks_skills_above_bio(self):
+        self.assertEqual(self.search("python"), ["m1", "m2"])
+
+    def test_prefix_and_name_match(self):
+        self.assertEqual(self.search("olen"), ["m1"])
+        self.assertEqual(self.search("data sci"), ["m3"])
+
+    def test_index_follows_saves_and_deletes(self):
+        user = User.objects.get(username="m3")
+        user.last_name = "Pythonova"
+        user.save()
+        self.assertEqual(self.search("pythonova"), ["m3"])
+        MentorProfile.objects.get(user__username="m1").delete()
+        self.assertEqual(self.search("python"), ["m3", "m2"])
+
+    def test_combines_with_filters(self):
+        self.assertEqual(self.search("python", skill="react"), ["m2"])
+
+    def test_filters_page_past_the_first_batch_of_matches(self):
+        with mock.patch("backend.views.MAX_SEARCH_RESULTS", 1):
+            self.assertEqual(self.search("python", skill="react"), ["m2"])
+
+    def test_filtered_search_stops_after_max_batches(self):
+        with mock.patch("backend.views.MAX_SEARCH_RESULTS", 1), mock.patch("backend.views.MAX_SEARCH_BATCHES", 1):
+            self.assertEqual(self.search("python", skill="react"), [])
+
+class BenchmarkIndexesTests(APITestCase):
+    def test_refuses_a_database_that_is_not_a_scratch_one(self):
+        with mock.patch.dict(connection.settings_dict, NAME="db.sqlite3"), \
+                mock.patch.object(connection, "is_in_memory_db", return_value=False):
+            with self.assertRaisesMessage(CommandError, "--force"):
+                call_command("benchmark_indexes", stdout=StringIO())
+
+    def test_runs_and_rolls_back_on_the_test_database(self):
+        out = StringIO()
+        call_command("benchmark_indexes", meetings=200, users=20, repeat=2, stdout=out)
+        self.assertIn("without indexes", out.getvalue())
+        self.assertFalse(User.objects.filter(username__startswith="bench-").exists())
+
+
+class MentorDirectoryCacheTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user = User.objects.create_user(username="m1", password="pass12345", role=User.ROLE_MENTOR)
+            self.mentor = MentorProfile.objects.create(user=self.user, title="Old title", skills="python")
+
+    def test_directory_is_served_from_cache_until_a_mentor_changes(self):
+        url = reverse("mentor-list")
+        self.client.get(url, {"skill": "python", "page": 1})
+        with self.assertNumQueries(0):
+            resp = self.client.get(url, {"page": 1, "skill": "python", "ignored": "x"})
+        self.assertEqual(resp.data["results"][0]["title"], "Old title")
+        self.mentor.title = "New title"
+        with mock.patch("backend.cache.bump_directory_version", wraps=bump_directory_version) as bump:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.mentor.save()
+                self.mentor.skills = "python, sql"
+                self.mentor.save()  # saves and tag changes in one transaction share a single bump
+                resp = self.client.get(url, {"skill": "python", "page": 1})
+                self.assertEqual(resp.data["results"][0]["title"], "Old title")
+        self.assertEqual(bump.call_count, 1)
+        resp = self.client.get(url, {"skill": "python", "page": 1})
+        self.assertEqual(resp.data["results"][0]["title"], "New title")
+
+    def test_detail_is_invalidated_by_user_changes(self):
+        url = reverse("mentor-detail", args=[self.mentor.id])
+        self.client.get(url)
+        with self.assertNumQueries(0):
+            self.client.get(url)
+        self.user.first_name = "Olena"
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.save()
+        self.assertEqual(self.client.get(url).data["user"]["first_name"], "Olena")
+
+class KeysetPaginationTests(APITestCase):
+    def setUp(self):
+        self.student = User.objects.create_user(username="s1", password="pass12345", role=User.ROLE_STUDENT)
+        for i in range(5):
+            mentor = User.objects.create_user(username=f"m{i}", password="pass12345", role=User.ROLE_MENTOR)
+            MentorProfile.objects.create(user=mentor)
+            Request.objects.create(student=self.student, mentor=mentor, message=f"hi {i}")
+        self.client.force_authenticate(self.student)
+
+    def walk(self, url, params):
+        seen = []
+        resp = self.client.get(url, params)
+        while True:
+            self.assertEqual(resp.status_code, status.HTTP_200_OK)
+            self.assertNotIn("count", resp.data)
+            seen += [row["id"] for row in resp.data["results"]]
+            if not resp.data["next"]:
+                return seen
+            resp = self.client.get(resp.data["next"])
+
+    def test_requests_cursor_walk(self):
+        ids = self.walk(reverse("request-list"), {"cursor": "", "page_size": 2})
+        expected = list(Request.objects.order_by("-created_at", "-id").values_list("id", flat=True))
+        self.assertEqual(ids, expected)
+
+    def test_keyset_order_is_served_by_an_index(self):
+        for model, index in [(MentorProfile, "mentor_keyset_idx"), (Request, "request_keyset_idx"),
+                             (Proposal, "proposal_keyset_idx"), (Meeting, "meeting_keyset_idx")]:
+            self.assertIn(index, model.objects.order_by("-created_at", "-id")[:11].explain())
+
+    def test_requests_stay_unpaginated_by_default(self):
+        resp = self.client.get(reverse("request-list"))
+        self.assertIsInstance(resp.data, list)
+        self.assertEqual(len(resp.data), 5)
+
+    def test_mentors_cursor_and_page_modes(self):
+        ids = self.walk(reverse("mentor-list"), {"cursor": "", "page_size": 2})
+        self.assertEqual(ids, list(MentorProfile.objects.order_by("-created_at", "-id").values_list("id", flat=True)))
+        resp = self.client.get(reverse("mentor-list"), {"page": 2, "page_size": 2})
+        self.assertEqual(resp.data["count"], 5)
+
+    def test_invalid_cursor(self):
+        resp = self.client.get(reverse("request-list"), {"cursor": "garbage"})
+        self.assertEqual(resp.status_code, status.HTTP_404_NOT_FOUND)
+
+class ProposalQueryCountTests(APITestCase):
+    def setUp(self):
+        self.student = User.objects.create_user(username="s1", password="pass12345", role=User.ROLE_STUDENT)
+        StudentProfile.objects.create(user=self.student, whatsapp_username="111")
+        self.client.force_authenticate(self.student)
+
+    def add_mentor(self, i):
+        mentor = User.objects.create_user(username=f"m{i}", password="pass12345", role=User.ROLE_MENTOR)
+        MentorProfile.objects.create(user=mentor, whatsapp_username=f"22{i}")
+        Proposal.objects.create(mentor=mentor, student=self.student)
+        for hour in ("09", "10"):
+            Meeting.objects.create(mentor=mentor, student=self.student, whatsapp_shared=True,
+                                   start=parse_iso_to_utc(f"2099-01-05T{hour}:00:00Z"),
+                                   end=parse_iso_to_utc(f"2099-01-05T{hour}:30:00Z"))
+
+    def test_list_uses_constant_queries(self):
+        for i in range(5):
+            self.add_mentor(i)
+        with self.assertNumQueries(2):
+            resp = self.client.get(reverse("proposal-list"))
+        self.assertEqual(len(resp.data), 5)
+        row = resp.data[0]
+        latest = Meeting.objects.filter(mentor_id=row["mentor"]).order_by("-created_at", "-id").first()
+        self.assertEqual(row["meeting_id"], latest.id)
+        self.assertEqual(row["meeting_start"], latest.start.isoformat())
+        self.assertEqual(row["student_whatsapp"], "https://wa.me/111")
+        self.assertTrue(row["mentor_whatsapp"].startswith("https://wa.me/22"))
+
+    def test_detail_uses_constant_queries(self):
+        self.add_mentor(0)
+        proposal = Proposal.objects.get()
+        with self.assertNumQueries(2):
+            resp = self.client.get(reverse("proposal-detail", args=[proposal.id]))
+        self.assertEqual(resp.data["meet_link"], "")
+        self.assertIsNotNone(resp.data["meeting_id"])
+
+class MeetingRequestQueryCountTests(APITestCase):
+    def setUp(self):
+        self.student = User.objects.create_user(username="s1", password="pass12345", role=User.ROLE_STUDENT)
+        StudentProfile.objects.create(user=self.student, whatsapp_username="111")
+        self.client.force_authenticate(self.student)
+
+    def add_mentors(self, count):
+        start = User.objects.filter(role=User.ROLE_MENTOR).count()
+        for i in range(start, start + count):
+            mentor = User.objects.create_user(username=f"m{i}", password="pass12345", role=User.ROLE_MENTOR)
+            MentorProfile.objects.create(user=mentor, whatsapp_username=f"22{i}")
+            Request.objects.create(student=self.student, mentor=mentor)
+            Meeting.objects.create(mentor=mentor, student=self.student, whatsapp_shared=True,
+                                   start=parse_iso_to_utc("2099-01-05T09:00:00Z"),
+                                   end=parse_iso_to_utc("2099-01-05T10:00:00Z"))
+
+    def test_meeting_list_is_constant(self):
+        self.add_mentors(1)
+        with self.assertNumQueries(1):
+            self.client.get(reverse("meeting-list"))
+        self.add_mentors(4)
+        with self.assertNumQueries(1):
+            resp = self.client.get(reverse("meeting-list"))
+        self.assertEqual(len(resp.data), 5)
+        self.assertEqual(resp.data[0]["student_whatsapp"], "https://wa.me/111")
+
+    def test_request_list_is_constant(self):
+        self.add_mentors(5)
+        with self.assertNumQueries(1):
+            resp = self.client.get(reverse("request-list"))
+        self.assertEqual({row["student_name"] for row in resp.data}, {"s1"})
+
+# Query budgets for every named route in backend/urls.py. A route without an entry fails
+# test_every_route_has_a_budget; None exempts routes that call out to Google inline.
+QUERY_BUDGETS = {
+    "api-root": 0,
+    "register": 5,
+    "activate": 3,
+    "password_reset": 2,
+    "password_reset_confirm": 3,
+    "me": 0,
+    "token_obtain_pair": 2,
+    "token_refresh": 0,
+    "logout": 6,
+    "google_login": 2,
+    "google_register": 5,
+    "student-list": 1,
+    "student-detail": 1,
+    "student-me": 0,
+    "mentor-list": 3,
+    "mentor-detail": 1,
+    "mentor-me": 0,
+    "mentor-skills": 1,
+    "mentor-group-slots": 3,
+    "request-list": 1,
+    "request-detail": 1,
+    "request-accept": 6,
+    "request-reject": 3,
+    "proposal-list": 2,
+    "proposal-detail": 2,
+    "proposal-suggested-slots": 4,
+    "proposal-propose-slots": 7,
+    "proposal-clear-chosen": 5,
+    "proposal-select": 8,
+    "proposal-confirm": 8,
+    "meeting-list": 1,
+    "meeting-detail": 1,
+    "meeting-feedback": 2,
+    "meeting-add-to-calendar": 2,
+    "user-freebusy": 4,
+    "notification-list": 1,
+    "notification-detail": 1,
+    "notification-unread-count": 1,
+    "notification-mark-read": 1,
+    "metrics": 0,
+}
+
+
+def route_names(patterns):
+    for p in patterns:
+        if isinstance(p, URLResolver):
+            yield from route_names(p.url_patterns)
+        elif p.name:
+            yield p.name
+
+
+@override_settings(QUERY_STATS=True, JWT_BLACKLIST_SYNC_INTERVAL=3600, **FAKE_GOOGLE_LOGIN)
+class QueryBudgetTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        blacklist_filter.reset()
+        blacklist_filter.might_contain("")
+        self.mentor = User.objects.create_user(username="m1", password="pass12345", email="m1@example.com",
+                                               role=User.ROLE_MENTOR)
+        self.student = User.objects.create_user(username="s1", password="pass12345", email="s1@example.com",
+                                                role=User.ROLE_STUDENT)
+        self.mentor_profile = MentorProfile.objects.create(user=self.mentor, skills="python, django", availability=[
+            {"start": "2099-01-05T09:00:00Z", "end": "2099-01-05T12:00:00Z"}])
+        self.student_profile = StudentProfile.objects.create(user=self.student, availability=[
+            {"start": "2099-01-05T10:00:00Z", "end": "2099-01-05T11:00:00Z"}])
+        for i in range(3):
+            other = User.objects.create_user(username=f"m{i + 2}", password="pass12345", role=User.ROLE_MENTOR)
+            MentorProfile.objects.create(user=other, skills="python")
+            Request.objects.create(student=self.student, mentor=other)
+            Proposal.objects.create(mentor=other, student=self.student)
+            Meeting.objects.create(mentor=other, student=self.student, start=parse_iso_to_utc("2099-02-01T09:00:00Z"),
+                                   end=parse_iso_to_utc("2099-02-01T10:00:00Z"))
+        self.request_accept = Request.objects.create(student=self.student, mentor=self.mentor)
+        other_student = User.objects.create_user(username="s2", password="pass12345", role=User.ROLE_STUDENT)
+        self.request_reject = Request.objects.create(student=other_student, mentor=self.mentor)
+        self.proposal = Proposal.objects.create(mentor=self.mentor, student=self.student)
+        self.chosen = Proposal.objects.create(mentor=self.mentor, student=self.student, status="student_chosen",
+                                              chosen_slot={"start": "2099-01-05T10:00:00Z", "end": "2099-01-05T11:00:00Z"})
+        self.to_select = Proposal.objects.create(mentor=self.mentor, student=self.student, status="pending",
+                                                 slots=[{"start": "2099-04-01T09:00:00Z", "end": "2099-04-01T10:00:00Z"}])
+        self.to_confirm = Proposal.objects.create(mentor=self.mentor, student=self.student, status="student_chosen",
+                                                  chosen_slot={"start": "2099-04-02T09:00:00Z", "end": "2099-04-02T10:00:00Z"})
+        self.meeting = Meeting.objects.create(mentor=self.mentor, student=self.student,
+                                              start=parse_iso_to_utc("2099-03-01T09:00:00Z"),
+                                              end=parse_iso_to_utc("2099-03-01T10:00:00Z"))
+        self.notification = Notification.objects.create(recipient=self.student, event="request_accepted_need_slots")
+
+    def route_calls(self):
+        uid = urlsafe_base64_encode(force_bytes(self.student.pk))
+        token = default_token_generator.make_token(self.student)
+        refresh = str(RefreshToken.for_user(self.student))
+        s, m = self.student, self.mentor
+        google = get_google_verifier()
+        return {
+            "google_login": (None, "post", reverse("google_login"), {"token": google.issue(None, m.email)}),
+            "google_register": (None, "post", reverse("google_register"), {
+                "token": google.issue(None, "g@example.com"), "username": "g1", "role": User.ROLE_STUDENT}),
+            "api-root": (None, "get", reverse("api-root"), None),
+            "register": (None, "post", reverse("register"), {
+                "username": "new", "password": "pass12345", "email": "new@example.com",
+                "role": User.ROLE_STUDENT, "whatsapp_username": "333"}),
+            "activate": (None, "post", reverse("activate"), {"uid": uid, "token": token}),
+            "password_reset": (None, "post", reverse("password_reset"), {"email": s.email}),
+            "password_reset_confirm": (None, "post", reverse("password_reset_confirm"),
+                                       {"uid": uid, "token": token, "new_password": "pass54321"}),
+            "me": (s, "get", reverse("me"), None),
+            "token_obtain_pair": (None, "post", reverse("token_obtain_pair"), {"username": "m1", "password": "pass12345"}),
+            "token_refresh": (None, "post", reverse("token_refresh"), {"refresh": refresh}),
+            "logout": (s, "post", reverse("logout"), {"refresh": refresh}),
+            "student-list": (s, "get", reverse("student-list"), None),
+            "student-detail": (s, "get", reverse("student-detail", args=[self.student_profile.id]), None),
+            "student-me": (s, "get", reverse("student-me"), None),
+            "mentor-list": (s, "get", reverse("mentor-list") + "?skill=python&facets=1", None),
+            "mentor-detail": (s, "get", reverse("mentor-detail", args=[self.mentor_profile.id]), None),
+            "mentor-me": (m, "get", reverse("mentor-me"), None),
+            "mentor-skills": (s, "get", reverse("mentor-skills"), None),
+            "mentor-group-slots": (m, "get", reverse("mentor-group-slots", args=[self.mentor_profile.id])
+                                   + f"?students={s.id}&duration=30", None),
+            "request-list": (s, "get", reverse("request-list"), None),
+            "request-detail": (s, "get", reverse("request-detail", args=[self.request_accept.id]), None),
+            "request-accept": (m, "post", reverse("request-accept", args=[self.request_accept.id]), None),
+            "request-reject": (m, "post", reverse("request-reject", args=[self.request_reject.id]), None),
+            "proposal-list": (s, "get", reverse("proposal-list"), None),
+            "proposal-detail": (s, "get", reverse("proposal-detail", args=[self.proposal.id]), None),
+            "proposal-suggested-slots": (s, "get", reverse("proposal-suggested-slots", args=[self.proposal.id]), None),
+            "proposal-propose-slots": (m, "post", reverse("proposal-propose-slots", args=[self.proposal.id]), {
+                "slots": [{"start": "2099-01-05T10:00:00Z", "end": "2099-01-05T11:00:00Z"}]}),
+            "proposal-clear-chosen": (m, "post", reverse("proposal-clear-chosen", args=[self.chosen.id]), None),
+            "proposal-select": (s, "post", reverse("proposal-select", args=[self.to_select.id]),
+                                {"chosen_slot": self.to_select.slots[0]}),
+            "proposal-confirm": (m, "post", reverse("proposal-confirm", args=[self.to_confirm.id]), None),
+            "meeting-list": (s, "get", reverse("meeting-list"), None),
+            "meeting-detail": (s, "get", reverse("meeting-detail", args=[self.meeting.id]), None),
+            "meeting-feedback": (s, "post", reverse("meeting-feedback", args=[self.meeting.id]), {"attended": True}),
+            "meeting-add-to-calendar": (s, "post", reverse("meeting-add-to-calendar", args=[self.meeting.id]), None),
+            "user-freebusy": (s, "get", reverse("user-freebusy", args=[m.id])
+                              + "?from=2099-01-05T00:00:00Z&to=2099-01-06T00:00:00Z", None),
+            "notification-list": (s, "get", reverse("notification-list") + "?since=0", None),
+            "notification-detail": (s, "get", reverse("notification-detail", args=[self.notification.id]), None),
+            "notification-unread-count": (s, "get", reverse("notification-unread-count"), None),
+            "notification-mark-read": (s, "post", reverse("notification-mark-read"), {"up_to": self.notification.id}),
+            "metrics": (User(username="ops", is_staff=True), "get", reverse("metrics"), None),
+        }
+
+    def test_every_route_has_a_budget(self):
+        missing = set(route_names(backend_urls.urlpatterns)) - set(QUERY_BUDGETS)
+        self.assertFalse(missing, f"declare a query budget for {sorted(missing)}")
+        calls = self.route_calls()
+        self.assertEqual({name for name, budget in QUERY_BUDGETS.items() if budget is not None}, set(calls))
+
+    def test_routes_stay_within_budget(self):
+        for name, (user, method, url, data) in self.route_calls().items():
+            with self.subTest(route=name):
+                self.client.force_authenticate(user)
+                with self.assertLogs("backend.queries", "INFO"):
+                    resp = getattr(self.client, method)(url, data, format="json")
+                self.assertLess(resp.status_code, 400, getattr(resp, "data", resp))
+                stats = resp.query_stats
+                self.assertLessEqual(stats.count, QUERY_BUDGETS[name],
+                                     f"{name} ran {stats.count} queries; repeated: {stats.duplicates}")
+                self.assertIn("db;dur=", resp["Server-Timing"])
+
+    def test_repeated_statements_share_a_fingerprint(self):
+        with record_queries() as stats:
+            for user in (self.student, self.mentor):
+                User.objects.filter(pk=user.pk).exists()
+            User.objects.filter(pk__in=[self.student.pk, self.mentor.pk]).count()
+        self.assertEqual(stats.count, 3)
+        self.assertEqual(list(stats.duplicates.values()), [2])
+
+class EmailOutboxTests(APITestCase):
+    def register(self):
+        return self.client.post(reverse("register"), {
+            "username": "new", "password": "pass12345", "email": "new@example.com",
+            "role": User.ROLE_STUDENT, "whatsapp_username": "333"}, format="json")
+
+    def test_endpoint_queues_instead_of_sending(self):
+        resp = self.register()
+        self.assertEqual(resp.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(mail.outbox, [])
+        item = EmailOutbox.objects.get()
+        self.assertEqual(item.recipients, ["new@example.com"])
+
+        self.assertEqual(drain_outbox(), (1, 0))
+        self.assertEqual(mail.outbox[0].to, ["new@example.com"])
+        item.refresh_from_db()
+        self.assertEqual(item.status, "sent")
+        self.assertEqual(drain_outbox(), (0, 0))
+
+    def test_failed_connection_is_retried_with_backoff(self):
+        self.register()
+        with mock.patch("backend.outbox.get_connection") as get_connection:
+            get_connection.return_value.open.side_effect = OSError("relay down")
+            self.assertEqual(drain_outbox(), (0, 1))
+        item = EmailOutbox.objects.get()
+        self.assertEqual((item.status, item.attempts, item.last_error), ("pending", 1, "relay down"))
+        self.assertGreater(item.next_attempt_at, timezone.now())
+        self.assertEqual(drain_outbox(), (0, 0))
+
+        EmailOutbox.objects.update(next_attempt_at=timezone.now())
+        self.assertEqual(drain_outbox(), (1, 0))
+        self.assertEqual(len(mail.outbox), 1)
+
+    def test_gives_up_after_max_attempts(self):
+        self.register()
+        with mock.patch("backend.outbox.get_connection") as get_connection:
+            get_connection.return_value.open.side_effect = OSError("relay down")
+            drain_outbox(max_attempts=1)
+        self.assertEqual(EmailOutbox.objects.get().status, "failed")
+
+    def test_claimed_emails_are_skipped_by_a_concurrent_drain(self):
+        self.register()
+        nested = []
+        send = EmailMessage.send
+
+        def send_and_drain(message, *args, **kwargs):
+            nested.append(drain_outbox())
+            return send(message, *args, **kwargs)
+
+        with mock.patch("backend.outbox.EmailMessage.send", send_and_drain):
+            self.assertEqual(drain_outbox(), (1, 0))
+        self.assertEqual(nested, [(0, 0)])
+        self.assertEqual(EmailOutbox.objects.get().status, "sent")
+
+
+@override_settings(CALENDAR_BACKEND="backend.calendar_backends.FakeCalendarBackend", MEET_LINK_PROVISIONING="inline",
+                   CHANNEL_LAYERS=TEST_CHANNEL_LAYERS)
+class MeetLinkProvisioningTests(APITestCase):
+    def setUp(self):
+        self.mentor = User.objects.create_user(username="m1", password="pass12345", email="m1@example.com",
+                                               role=User.ROLE_MENTOR)
+        self.student = User.objects.create_user(username="s1", password="pass12345", email="s1@example.com",
+                                                role=User.ROLE_STUDENT)
+        self.slot = {"start": "2099-01-05T09:00:00Z", "end": "2099-01-05T10:00:00Z"}
+        self.proposal = Proposal.objects.create(mentor=self.mentor, student=self.student, status="pending",
+                                                slots=[self.slot])
+        self.calendar = get_calendar_backend()
+        self.calendar.events.clear()
+        self.client.force_authenticate(self.student)
+
+    def test_select_returns_pending_meeting_and_provisions_after_commit(self):
+        layer = get_channel_layer()
+        channel = async_to_sync(layer.new_channel)()
+        async_to_sync(layer.group_add)(f"user_{self.mentor.id}", channel)
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            resp = self.client.post(reverse("proposal-select", args=[self.proposal.id]),
+                                    {"chosen_slot": self.slot}, format="json")
+        self.assertEqual(resp.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(resp.data["meeting"]["link_status"], "pending")
+        self.assertEqual(resp.data["meeting"]["meet_link"], "")
+        self.assertEqual(self.calendar.events, [])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            for callback in callbacks:
+                callback()
+        meeting = Meeting.objects.get()
+        self.assertEqual(meeting.link_status, "ready")
+        self.assertEqual(meeting.meet_link, self.calendar.events[0]["link"])
+        self.assertEqual(self.calendar.events[0]["organizer_email"], "m1@example.com")
+        self.assertEqual(EmailOutbox.objects.get().recipients, ["s1@example.com", "m1@example.com"])
+
+        messages = []
+        while len(messages) < 2:
+            messages.append(async_to_sync(layer.receive)(channel))
+        ready = [m for m in messages if m["event"] == "meeting_link_ready"]
+        self.assertEqual(ready[0]["data"]["meet_link"], meeting.meet_link)
+
+    def test_add_to_calendar_goes_through_provisioning(self):
+        meeting = Meeting.objects.create(mentor=self.mentor, student=self.student,
+                                         start=parse_iso_to_utc(self.slot["start"]),
+                                         end=parse_iso_to_utc(self.slot["end"]))
+        url = reverse("meeting-add-to-calendar", args=[meeting.id])
+        with self.captureOnCommitCallbacks(execute=True):
+            resp = self.client.post(url)
+        self.assertEqual((resp.status_code, resp.data["link_status"]), (status.HTTP_202_ACCEPTED, "pending"))
+        meeting.refresh_from_db()
+        self.assertEqual((meeting.link_status, meeting.meet_link), ("ready", self.calendar.events[0]["link"]))
+        self.assertEqual(self.client.post(url).data, {"status": "ok", "link": meeting.meet_link})
+        self.assertEqual(len(self.calendar.events), 1)
+
+    def test_failures_retry_then_give_up(self):
+        meeting = Meeting.objects.create(mentor=self.mentor, student=self.student, link_status="pending",
+                                         start=parse_iso_to_utc(self.slot["start"]),
+                                         end=parse_iso_to_utc(self.slot["end"]))
+        with mock.patch.object(self.calendar, "create_meet_link", side_effect=RuntimeError("quota")):
+            for _ in range(5):
+                self.assertIsNone(provision_meet_link(meeting.id))
+        meeting.refresh_from_db()
+        self.assertEqual((meeting.link_status, meeting.link_attempts), ("failed", 5))
+        self.assertIsNone(provision_meet_link(meeting.id))
+
+    def test_only_one_job_claims_a_meeting(self):
+        meeting = Meeting.objects.create(mentor=self.mentor, student=self.student, link_status="pending",
+                                         start=parse_iso_to_utc(self.slot["start"]),
+                                         end=parse_iso_to_utc(self.slot["end"]))
+        self.assertIsNotNone(claim_meet_link(meeting.id))
+        self.assertIsNone(claim_meet_link(meeting.id))
+        self.assertIsNone(provision_meet_link(meeting.id))
+        self.assertEqual(self.calendar.events, [])
+
+        # a claim outlives its lease only when its job died; the worker then takes the meeting over
+        Meeting.objects.filter(pk=meeting.pk).update(link_claimed_at=timezone.now() - timedelta(seconds=301))
+        call_command("provision_meet_links", "--grace=0", stdout=StringIO())
+        meeting.refresh_from_db()
+        self.assertEqual((meeting.link_status, len(self.calendar.events)), ("ready", 1))
+        self.assertIsNone(meeting.link_claimed_at)
+
+class FakeCalendarError(Exception):
+    def __init__(self, reason):
+        super().__init__(reason)
+        self.content = json.dumps({"error": {"errors": [{"reason": reason}]}}).encode()
+
+
+class FakeCalendarService:
+    def __init__(self, result):
+        self.result = result
+        self.inserted = []
+
+    def events(self):
+        return self
+
+    def insert(self, **kwargs):
+        self.inserted.append(kwargs)
+        return self
+
+    def execute(self):
+        result = self.result(self.inserted[-1]) if callable(self.result) else self.result
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+
+class GoogleMeetStrategyTests(APITestCase):
+    def setUp(self):
+        utils.meet_strategies.clear()
+        metrics.reset()
+        self.services = {}
+        patches = [
+            mock.patch("backend.utils._resolve_service_account_file", return_value="/tmp/sa.json"),
+            mock.patch("backend.utils._google_libraries_available", return_value=True),
+            mock.patch.object(utils.calendar_clients, "get", side_effect=self.client_for),
+        ]
+        for p in patches:
+            p.start()
+            self.addCleanup(p.stop)
+
+    def client_for(self, sa_file, subject=None):
+        return utils.CalendarClient(mock.Mock(service_account_email="sa@example.iam"), self.services[subject])
+
+    def create(self):
+        start = parse_iso_to_utc("2099-01-05T09:00:00Z")
+        return utils.create_google_meet_event(start, start, "s", "d", ["s@x.com"], organizer_email="m@corp.com")
+
+    def test_failing_impersonation_is_skipped_for_the_domain(self):
+        self.services["m@corp.com"] = FakeCalendarService(FakeCalendarError("forbidden"))
+        self.services[None] = FakeCalendarService({"hangoutLink": "https://meet.google.com/abc"})
+        self.assertEqual(self.create(), "https://meet.google.com/abc")
+        self.assertEqual(self.create(), "https://meet.google.com/abc")
+        self.assertEqual(len(self.services["m@corp.com"].inserted), 1)
+        self.assertEqual(len(self.services[None].inserted), 2)
+        timings = metrics.snapshot()["timings"]
+        self.assertEqual(timings["google_calendar.attempt{outcome=ok,strategy=service_account}"]["count"], 2)
+
+    def test_transient_errors_are_not_remembered(self):
+        self.services["m@corp.com"] = FakeCalendarService(FakeCalendarError("forbidden"))
+        self.services[None] = FakeCalendarService(FakeCalendarError("backendError"))
+        self.assertTrue(self.create().startswith("https://meet.jit.si/"))
+        self.assertTrue(self.create().startswith("https://meet.jit.si/"))
+        self.assertEqual(len(self.services["m@corp.com"].inserted), 1)
+        self.assertEqual(len(self.services[None].inserted), 2)
+        self.assertFalse(utils.meet_strategies.is_failing("corp.com", "service_account"))
+
+        self.services[None].result = {"hangoutLink": "https://meet.google.com/abc"}
+        self.assertEqual(self.create(), "https://meet.google.com/abc")
+
+    def test_the_last_strategy_left_is_never_skipped(self):
+        self.services[None] = FakeCalendarService(FakeCalendarError("forbidden"))
+        start = parse_iso_to_utc("2099-01-05T09:00:00Z")
+        for _ in range(2):
+            link = utils.create_google_meet_event(start, start, "s", "d", ["s@x.com"])
+            self.assertTrue(link.startswith("https://meet.jit.si/"))
+        self.assertEqual(len(self.services[None].inserted), 2)
+        self.assertTrue(utils.meet_strategies.is_failing("", "service_account"))
+
+    def test_refresh_errors_count_as_permanent(self):
+        RefreshError = type("RefreshError", (Exception,), {})
+        self.services["m@corp.com"] = FakeCalendarService(RefreshError("unauthorized_client"))
+        self.services[None] = FakeCalendarService({"hangoutLink": "https://meet.google.com/abc"})
+        self.create()
+        self.assertTrue(utils.meet_strategies.is_failing("corp.com", "impersonate"))
+
+    def test_client_pool_keeps_the_most_recently_used(self):
+        pool = utils.CalendarClientPool(max_size=2)
+        with mock.patch.object(pool, "_build", side_effect=lambda sa_file, subject: object()) as build:
+            a = pool.get("sa.json", "a@x.com")
+            pool.get("sa.json", "b@x.com")
+            self.assertIs(pool.get("sa.json", "a@x.com"), a)
+            pool.get("sa.json", "c@x.com")
+            self.assertIs(pool.get("sa.json", "a@x.com"), a)
+            pool.get("sa.json", "b@x.com")
+        self.assertEqual(build.call_count, 4)
+
+    def test_client_pool_builds_outside_the_pool_lock(self):
+        pool = utils.CalendarClientPool()
+        started, release, results = threading.Event(), threading.Event(), {}
+
+        def build(sa_file, subject):
+            if subject == "slow@x.com":
+                started.set()
+                release.wait(5)
+            return subject
+
+        def fetch(subject):
+            results.setdefault(subject, []).append(pool.get("sa.json", subject))
+
+        with mock.patch.object(pool, "_build", side_effect=build) as built:
+            slow = [threading.Thread(target=fetch, args=("slow@x.com",)) for _ in range(2)]
+            for thread in slow:
+                thread.start()
+            started.wait(5)
+            # another organizer's client is not held up by the slow build
+            fast = threading.Thread(target=fetch, args=("fast@x.com",))
+            fast.start()
+            fast.join(1)
+            self.assertFalse(fast.is_alive())
+            release.set()
+            for thread in slow:
+                thread.join()
+        self.assertEqual(results, {"slow@x.com": ["slow@x.com"] * 2, "fast@x.com": ["fast@x.com"]})
+        self.assertEqual(built.call_count, 2)
+
+    def test_forbidden_for_service_accounts_remembers_the_no_attendee_retry(self):
+        service = FakeCalendarService(lambda call: FakeCalendarError("forbiddenForServiceAccounts")
+                                      if "attendees" in call["body"] else {"hangoutLink": "https://meet.google.com/xyz"})
+        self.services["m@corp.com"] = FakeCalendarService(FakeCalendarError("forbidden"))
+        self.services[None] = service
+        self.assertEqual(self.create(), "https://meet.google.com/xyz")
+        self.assertEqual([call["sendUpdates"] for call in service.inserted], ["all", "none"])
+
+        service.inserted.clear()
+        self.assertEqual(self.create(), "https://meet.google.com/xyz")
+        self.assertEqual([call["sendUpdates"] for call in service.inserted], ["none"])
+
+
+@override_settings(CHANNEL_LAYERS=TEST_CHANNEL_LAYERS)
+class NotificationDispatchTests(APITestCase):
+    def setUp(self):
+        metrics.reset()
+
+    def test_batch_is_sent_once_after_commit(self):
+        layer = get_channel_layer()
+        a = User.objects.create_user(username="a", password="pass12345")
+        b = User.objects.create_user(username="b", password="pass12345")
+        channels = {uid: async_to_sync(layer.new_channel)() for uid in (a.id, b.id)}
+        for uid, channel in channels.items():
+            async_to_sync(layer.group_add)(user_group(uid), channel)
+        with self.captureOnCommitCallbacks() as callbacks:
+            notify_users([a.id, b.id, a.id], "proposal_confirmed", sender_id=b.id, proposal_id=7)
+        self.assertEqual(len(callbacks), 1)
+        callbacks[0]()
+        for uid, channel in channels.items():
+            message = async_to_sync(layer.receive)(channel)
+            self.assertEqual(message["data"], {"proposal_id": 7, "recipient_id": uid, "sender_id": b.id})
+            self.assertEqual(Notification.objects.get(pk=message["id"]).recipient_id, uid)
+        timings = metrics.snapshot()["timings"]
+        self.assertEqual(timings["notifications.delivery{event=proposal_confirmed}"]["count"], 2)
+
+    def test_failures_are_counted(self):
+        broken = mock.Mock()
+        broken.group_send = mock.AsyncMock(side_effect=RuntimeError("layer down"))
+        with mock.patch("backend.notifications.get_channel_layer", return_value=broken):
+            with self.assertLogs("backend.notifications", "WARNING"):
+                self.assertEqual(send_batch([(user_group(1), build_event("x", 1))]), 0)
+        self.assertEqual(metrics.snapshot()["counters"]["notifications.failed{event=x}"], 1)
+
+
+class DatabaseChannelLayerTests(APITestCase):
+    def setUp(self):
+        self.layer = DatabaseChannelLayer(capacity=2, poll_thread_sensitive=True)
+
+    def test_group_fan_out_and_discard(self):
+        a, b = async_to_sync(self.layer.new_channel)(), async_to_sync(self.layer.new_channel)()
+        for channel in (a, b):
+            async_to_sync(self.layer.group_add)("user_1", channel)
+        async_to_sync(self.layer.group_send)("user_1", {"type": "notify", "n": 1})
+        async_to_sync(self.layer.group_discard)("user_1", b)
+        async_to_sync(self.layer.group_send)("user_1", {"type": "notify", "n": 2})
+        self.assertEqual([async_to_sync(self.layer.receive)(a)["n"] for _ in range(2)], [1, 2])
+        self.assertEqual(async_to_sync(self.layer.receive)(b)["n"], 1)
+        self.assertFalse(ChannelMessage.objects.exists())
+
+    def test_capacity_and_expiry(self):
+        async_to_sync(self.layer.send)("chan.a", {"type": "x"})
+        async_to_sync(self.layer.send)("chan.a", {"type": "x"})
+        with self.assertRaises(ChannelFull):
+            async_to_sync(self.layer.send)("chan.a", {"type": "x"})
+        ChannelMessage.objects.update(expires_at=timezone.now())
+        # headroom is known again after the recount, so the next send skips the COUNT
+        async_to_sync(self.layer.send)("chan.a", {"type": "x"})
+        with self.assertNumQueries(1):
+            async_to_sync(self.layer.send)("chan.a", {"type": "x"})
+        ChannelMessage.objects.update(expires_at=timezone.now())
+        self.assertEqual(self.layer._claim("chan.a"), [])
+        self.layer._next_cleanup = 0
+        self.layer._maybe_cleanup(timezone.now())
+        self.assertFalse(ChannelMessage.objects.exists())
+
+
+@override_settings(CHANNEL_LAYERS=TEST_CHANNEL_LAYERS)
+class NotificationInboxTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="s1", password="pass12345")
+        self.other = User.objects.create_user(username="s2", password="pass12345")
+        for n in range(3):
+            notify_users([self.user.id], "mentor_proposed_slots", proposal_id=n)
+        notify_users([self.other.id], "request_rejected", request_id=1)
+        self.ids = list(Notification.objects.filter(recipient=self.user).order_by("id").values_list("id", flat=True))
+
+    def test_unread_count_since_and_mark_read(self):
+        self.client.force_authenticate(self.user)
+        resp = self.client.get(reverse("notification-unread-count"))
+        self.assertEqual(resp.data, {"unread": 3, "latest_id": self.ids[-1]})
+        resp = self.client.get(reverse("notification-list") + f"?since={self.ids[0]}")
+        self.assertEqual([n["id"] for n in resp.data], self.ids[:0:-1])
+        resp = self.client.post(reverse("notification-mark-read"), {"up_to": self.ids[1]}, format="json")
+        self.assertEqual(resp.data, {"updated": 2})
+        self.assertEqual(self.client.get(reverse("notification-unread-count")).data["unread"], 1)
+        resp = self.client.get(reverse("notification-list") + "?unread=1")
+        self.assertEqual([n["id"] for n in resp.data], self.ids[2:])
+        self.assertEqual(self.client.get(reverse("notification-list") + "?since=x").status_code, 400)
+
+    def test_reconnect_replays_missed_events_once(self):
+        access = FamilyRefreshToken.for_user(self.user).access_token
+
+        async def session():
+            scope = {"type": "websocket", "path": "/ws/notifications/",
+                     "query_string": f"token={access}&since={self.ids[0]}".encode()}
+            communicator = ApplicationCommunicator(JWTAuthMiddleware(NotificationConsumer.as_asgi()), scope)
+            await communicator.send_input({"type": "websocket.connect"})
+            self.assertEqual((await communicator.receive_output())["type"], "websocket.accept")
+            replay = json.loads((await communicator.receive_output())["text"])
+            # a live copy of an already replayed event is dropped, anything not replayed comes through, even
+            # below the newest replayed id (committed late)
+            layer, group = get_channel_layer(), user_group(self.user.id)
+            await layer.group_send(group, build_event("x", self.user.id) | {"id": self.ids[2]})
+            await layer.group_send(group, build_event("late", self.user.id) | {"id": self.ids[0]})
+            late = json.loads((await communicator.receive_output())["text"])
+            await layer.group_send(group, build_event("y", self.user.id) | {"id": self.ids[2] + 1})
+            live = json.loads((await communicator.receive_output())["text"])
+            await communicator.send_input({"type": "websocket.disconnect", "code": 1000})
+            await communicator.wait()
+            return replay, late, live
+
+        replay, late, live = async_to_sync(session)()
+        self.assertEqual((late["id"], late["event"]), (self.ids[0], "late"))
+        self.assertEqual(replay["event"], "replay")
+        self.assertEqual([n["id"] for n in replay["data"]["notifications"]], self.ids[1:])
+        self.assertEqual(replay["data"]["latest_id"], self.ids[2])
+        self.assertFalse(replay["data"]["has_more"])
+        self.assertEqual((live["id"], live["event"]), (self.ids[2] + 1, "y"))
+
+
+class NotificationBackpressureTests(APITestCase):
+    def setUp(self):
+        metrics.reset()
+        self.consumer = NotificationConsumer()
+        self.consumer.last_id, self.consumer.pending, self.consumer.dropped = 0, {}, 0
+        self.consumer.replayed, self.consumer.flusher = set(), None
+        self.consumer.last_sent = 0
+        self.frames = []
+
+        async def send(text_data=None, bytes_data=None, close=False):
+            self.frames.append(json.loads(text_data))
+        self.consumer.send = send
+
+    def notify(self, pk, event, **data):
+        async_to_sync(self.consumer.notify)(build_event(event, 1, **data) | {"id": pk})
+
+    def test_superseded_events_coalesce_into_one_batch(self):
+        self.notify(1, "mentor_proposed_slots", proposal_id=7)
+        self.notify(2, "new_request", request_id=3)
+        self.notify(3, "chosen_cleared", proposal_id=7)
+        self.notify(4, "mentor_proposed_slots", proposal_id=7)
+        async_to_sync(self.consumer.flush)()
+        self.assertEqual(len(self.frames), 1)
+        self.assertEqual(self.frames[0]["event"], "batch")
+        self.assertEqual([(f["id"], f["event"]) for f in self.frames[0]["data"]["events"]],
+                         [(2, "new_request"), (3, "chosen_cleared"), (4, "mentor_proposed_slots")])
+        snapshot = metrics.snapshot()
+        self.assertEqual(snapshot["counters"]["notifications.coalesced{event=mentor_proposed_slots}"], 1)
+        self.assertEqual(snapshot["gauges"]["notifications.queue_depth"], {"value": 3, "max": 3})
+
+    def test_metrics_are_served_to_staff_only(self):
+        self.notify(1, "new_request", request_id=3)
+        async_to_sync(self.consumer.flush)()
+        self.client.force_authenticate(User.objects.create_user(username="s1", password="pass12345"))
+        self.assertEqual(self.client.get(reverse("metrics")).status_code, status.HTTP_403_FORBIDDEN)
+        self.client.force_authenticate(User.objects.create_user(username="ops", password="pass12345", is_staff=True))
+        resp = self.client.get(reverse("metrics"))
+        self.assertEqual(resp.data["gauges"]["notifications.queue_depth"], {"value": 1, "max": 1})
+
+    def test_flush_is_scheduled_only_when_events_arrive(self):
+        self.consumer.flush_interval = 0.01
+
+        async def session():
+            self.assertIsNone(self.consumer.flusher)
+            await self.consumer.notify(build_event("new_request", 1, request_id=1) | {"id": 1})
+            await self.consumer.notify(build_event("new_request", 1, request_id=2) | {"id": 2})
+            await self.consumer.flusher
+
+        async_to_sync(session)()
+        self.assertEqual([f["event"] for f in self.frames], ["batch"])
+        self.assertEqual(self.consumer.pending, {})
+
+    def test_overflow_drops_oldest_and_asks_for_resync(self):
+        self.consumer.max_queue = 2
+        for pk in (1, 2, 3):
+            self.notify(pk, "new_request", request_id=pk)
+        async_to_sync(self.consumer.flush)()
+        events = self.frames[0]["data"]["events"]
+        self.assertEqual(events[0], {"event": "overflow", "data": {"dropped": 1, "resume_from": 0}})
+        self.assertEqual([f["id"] for f in events[1:]], [2, 3])
+        # ids commit out of order, so one below the last sent is still a new event
+        self.notify(1, "new_request", request_id=1)
+        self.assertEqual(list(self.consumer.pending), [("new_request", "request_id", 1)])
+
+    def test_idle_connection_gets_heartbeats(self):
+        self.consumer.heartbeat_interval = 0.01
+
+        async def idle():
+            with suppress(asyncio.TimeoutError):
+                await asyncio.wait_for(self.consumer.heartbeat_loop(), 0.05)
+
+        async_to_sync(idle)()
+        self.assertTrue(self.frames)
+        self.assertEqual(self.frames[0], {"event": "heartbeat", "data": {"latest_id": 0}})
+
+
+class WebSocketAuthTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        revoked_families.clear()
+        self.user = User.objects.create_user(username="s1", password="pass12345")
+        self.refresh = FamilyRefreshToken.for_user(self.user)
+        self.access = str(self.refresh.access_token)
+
+    def handshake(self, query_string=b"", subprotocols=()):
+        async def session():
+            scope = {"type": "websocket", "path": "/ws/notifications/", "query_string": query_string,
+                     "subprotocols": list(subprotocols)}
+            communicator = ApplicationCommunicator(JWTAuthMiddleware(NotificationConsumer.as_asgi()), scope)
+            await communicator.send_input({"type": "websocket.connect"})
+            reply = await communicator.receive_output()
+            if reply["type"] == "websocket.accept":
+                await communicator.send_input({"type": "websocket.disconnect", "code": 1000})
+            await communicator.wait()
+            return reply
+
+        return async_to_sync(session)()
+
+    def test_token_is_verified_without_database_queries(self):
+        seen = {}
+
+        async def app(scope, receive, send):
+            seen.update(scope)
+
+        with self.assertNumQueries(0):
+            async_to_sync(JWTAuthMiddleware(app))(
+                {"type": "websocket", "query_string": f"token={self.access}".encode()}, None, None)
+        self.assertTrue(seen["user"].is_authenticated)
+        self.assertEqual(seen["user"].id, self.user.id)
+
+    def test_query_string_and_subprotocol_tokens(self):
+        self.assertEqual(self.handshake(f"token={self.access}".encode()),
+                         {"type": "websocket.accept", "subprotocol": None})
+        self.assertEqual(self.handshake(subprotocols=["jwt", self.access])["subprotocol"], "jwt")
+
+    def test_missing_forged_or_revoked_tokens_are_refused(self):
+        self.assertEqual(self.handshake()["type"], "websocket.close")
+        self.assertEqual(self.handshake(f"user_id={self.user.id}".encode())["type"], "websocket.close")
+        self.assertEqual(self.handshake(b"token=not-a-jwt")["type"], "websocket.close")
+        self.client.force_authenticate(self.user)
+        self.client.post(reverse("logout"), {"refresh": str(self.refresh)}, format="json")
+        # another process only sees the logout through the shared cache
+        revoked_families.clear()
+        self.assertEqual(self.handshake(f"token={self.access}".encode())["type"], "websocket.close")
+
+    def test_deploy_checks_flag_process_local_token_caches(self):
+        ids = {m.id for m in checks.check_jwt_revocation_cache(None) + checks.check_jwt_user_cache(None)}
+        self.assertEqual(ids, {"backend.W002", "backend.W001"})
+        shared = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+                  "shared": {"BACKEND": "django.core.cache.backends.db.DatabaseCache", "LOCATION": "cache"}}
+        with override_settings(CACHES=shared, JWT_REVOCATION_CACHE="shared", JWT_USER_CACHE="shared"):
+            self.assertEqual(checks.check_jwt_revocation_cache(None) + checks.check_jwt_user_cache(None), [])
+        # a stock checkout warns but still passes
+        call_command("check", deploy=True, stdout=StringIO(), stderr=StringIO())
+
+    def test_login_tokens_carry_a_family(self):
+        resp = self.client.post(reverse("token_obtain_pair"), {"username": "s1", "password": "pass12345"})
+        refresh, access = RefreshToken(resp.data["refresh"]), AccessToken(resp.data["access"])
+        self.assertEqual(access[FAMILY_CLAIM], refresh["jti"])
+
+
+class CachedJWTAuthenticationTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        user_cache.clear()
+        revoked_families.clear()
+        self.user = User.objects.create_user(username="s1", password="pass12345", role=User.ROLE_STUDENT)
+        self.refresh = FamilyRefreshToken.for_user(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {self.refresh.access_token}")
+
+    def test_user_is_resolved_from_cache_until_saved(self):
+        url = reverse("notification-unread-count")
+        with self.assertNumQueries(2):
+            self.client.get(url)
+        user_cache.clear()  # the shared cache still has the user
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.get(url).status_code, 200)
+        self.user.is_active = False
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.save()
+            self.assertEqual(user_cache.get(self.user.pk).is_active, True)
+        self.assertEqual(self.client.get(url).status_code, 401)
+
+    def test_process_local_cache_entries_expire_with_the_local_ttl(self):
+        with mock.patch.object(user_cache.cache, "set") as set_:
+            user_cache.set(self.user)
+        self.assertEqual(set_.call_args.args[2], 5)
+
+    def test_cached_user_saves_without_touching_password(self):
+        self.client.get(reverse("me"))
+        user = CachedJWTAuthentication().get_user(self.refresh.access_token)
+        user.bio = "hi"
+        user.save()
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.bio, "hi")
+        self.assertTrue(self.user.check_password("pass12345"))
+
+    def test_logout_revokes_the_access_token(self):
+        resp = self.client.post(reverse("logout"), {"refresh": str(self.refresh)}, format="json")
+        self.assertEqual(resp.status_code, 204)
+        self.assertEqual(self.client.get(reverse("me")).status_code, 401)
+
+    @override_settings(JWT_ROLE_CLAIM=True)
+    def test_role_claim_answers_permission_checks_without_a_query(self):
+        access = FamilyRefreshToken.for_user(self.user).access_token
+        user_cache.clear()
+        cache.clear()
+        user = CachedJWTAuthentication().get_user(access)
+        with self.assertNumQueries(0):
+            self.assertTrue(user and user.is_authenticated)
+            self.assertEqual((user.pk, user.role), (self.user.pk, User.ROLE_STUDENT))
+            str(Meeting.objects.filter(Q(mentor=user) | Q(student=user)).query)
+        self.assertIs(type(user), User)
+        with self.assertNumQueries(1):
+            self.assertEqual(user.username, "s1")
+        self.user.is_active = False
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.save()
+        with self.assertRaises(AuthenticationFailed):
+            CachedJWTAuthentication().get_user(access)
+
+
+class GoogleCertCacheTests(APITestCase):
+    def setUp(self):
+        self.now = 0.0
+        self.fetched = []
+
+    def fetch(self):
+        self.fetched.append(self.now)
+        if isinstance(self.response, Exception):
+            raise self.response
+        return self.response
+
+    def test_certs_live_for_max_age_and_refresh_in_background(self):
+        certs = CertCache(self.fetch, refresh_margin=0.2, clock=lambda: self.now)
+        self.response = ({"k1": "pem1"}, 100)
+        self.assertEqual(certs.get(), {"k1": "pem1"})
+        self.now = 50
+        certs.get()
+        self.assertEqual(self.fetched, [0])
+        self.now, self.response = 85, ({"k2": "pem2"}, 100)
+        self.assertEqual(certs.get(), {"k1": "pem1"})  # served at once, the new set arrives behind it
+        certs._thread.join()
+        self.assertEqual(certs.get(), {"k2": "pem2"})
+        self.assertEqual(self.fetched, [0, 85])
+
+    def test_failed_refresh_keeps_the_old_certs(self):
+        certs = CertCache(self.fetch, retry_interval=30, clock=lambda: self.now)
+        self.response = ({"k1": "pem1"}, 100)
+        certs.get()
+        self.now, self.response = 120, RuntimeError("google down")
+        with self.assertLogs("backend.google_auth", "WARNING"):
+            self.assertEqual(certs.get(), {"k1": "pem1"})
+        self.now = 140
+        self.assertEqual(certs.get(), {"k1": "pem1"})
+        self.assertEqual(self.fetched, [0, 120])
+
+    def test_stale_certs_are_dropped_after_max_stale(self):
+        certs = CertCache(self.fetch, retry_interval=30, max_stale=60, clock=lambda: self.now)
+        self.response = ({"k1": "pem1"}, 100)
+        certs.get()
+        self.response = RuntimeError("google down")
+        with self.assertLogs("backend.google_auth", "WARNING"):
+            for self.now in range(100, 160, 30):
+                self.assertEqual(certs.get(), {"k1": "pem1"})
+        self.now = 160
+        with self.assertRaises(RuntimeError):
+            certs.get()
+
+    def test_cache_control_max_age(self):
+        self.assertEqual(cache_max_age("public, max-age=19702, must-revalidate, no-transform"), 19702)
+        self.assertEqual(cache_max_age(None, default=60), 60)
+
+
+@override_settings(**FAKE_GOOGLE_LOGIN)
+class GoogleLoginTests(APITestCase):
+    def test_register_then_login_with_fake_key_set(self):
+        google = get_google_verifier()
+        token = google.issue(None, "new@example.com", given_name="New")
+        resp = self.client.post(reverse("google_login"), {"token": token})
+        self.assertEqual((resp.data["status"], resp.data["first_name"]), ("need_registration", "New"))
+        resp = self.client.post(reverse("google_register"), {"token": token, "username": "new", "role": "mentor"})
+        self.assertEqual(resp.status_code, 201)
+        resp = self.client.post(reverse("google_login"), {"token": token})
+        self.assertEqual(resp.data["status"], "login_success")
+
+    def test_tokens_from_other_keys_or_issuers_are_rejected(self):
+        forged = FakeGoogleIdTokenVerifier({"fake-key": "someone-else"}).issue(None, "new@example.com")
+        wrong_issuer = get_google_verifier().issue(None, "new@example.com", iss="https://evil.example.com")
+        for token in (forged, wrong_issuer, "not-a-token"):
+            resp = self.client.post(reverse("google_login"), {"token": token})
+            self.assertEqual(resp.data, {"error": "Invalid Google token"})
+
+    def test_fake_verifier_refuses_to_load_outside_debug(self):
+        with self.settings(DEBUG=False), self.assertRaises(ImproperlyConfigured):
+            FakeGoogleIdTokenVerifier()
+        with self.settings(GOOGLE_FAKE_ID_TOKEN_KEYS=None), self.assertRaises(ImproperlyConfigured):
+            FakeGoogleIdTokenVerifier()
+
+
+class TokenBlacklistTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        blacklist_filter.reset()
+        self.user = User.objects.create_user(username="s1", password="pass12345")
+
+    def refresh(self, token):
+        return self.client.post(reverse("token_refresh"), {"refresh": str(token)}, format="json")
+
+    def test_bloom_filter_has_no_false_negatives(self):
+        bloom = BloomFilter(1000, error_rate=0.01)
+        for i in range(1000):
+            bloom.add(f"jti-{i}")
+        self.assertTrue(all(f"jti-{i}" in bloom for i in range(1000)))
+        false_positives = sum(f"other-{i}" in bloom for i in range(10000))
+        self.assertLess(false_positives, 300)
+
+    @override_settings(JWT_BLACKLIST_SYNC_INTERVAL=3600)
+    def test_refresh_needs_no_blacklist_query_until_the_token_is_listed(self):
+        token = FamilyRefreshToken.for_user(self.user)
+        self.assertEqual(self.refresh(token).status_code, 200)  # builds the filter
+        with self.assertNumQueries(0):
+            self.assertEqual(self.refresh(token).status_code, 200)
+        self.client.force_authenticate(self.user)
+        self.client.post(reverse("logout"), {"refresh": str(token)}, format="json")
+        self.assertEqual(self.refresh(token).status_code, 401)
+
+    @override_settings(JWT_BLACKLIST_SYNC_INTERVAL=0)
+    def test_tokens_blacklisted_by_other_processes_are_synced(self):
+        token = RefreshToken.for_user(self.user)
+        self.assertFalse(is_blacklisted(token["jti"]))
+        token.blacklist()  # the stock class never touches this process's filter
+        self.assertTrue(is_blacklisted(token["jti"]))
+
+    @override_settings(JWT_BLACKLIST_SYNC_INTERVAL=0)
+    def test_rows_committing_out_of_id_order_are_synced(self):
+        late, early = RefreshToken.for_user(self.user), RefreshToken.for_user(self.user)
+        self.assertFalse(is_blacklisted(early["jti"]))
+        BlacklistedToken.objects.create(id=100, token=OutstandingToken.objects.get(jti=early["jti"]))
+        self.assertTrue(is_blacklisted(early["jti"]))
+        # a lower id that only becomes visible after id 100 was synced
+        BlacklistedToken.objects.create(id=50, token=OutstandingToken.objects.get(jti=late["jti"]))
+        self.assertTrue(is_blacklisted(late["jti"]))
+
+    def test_lookups_use_the_old_filter_while_another_thread_rebuilds(self):
+        self.assertFalse(is_blacklisted("x"))
+        blacklist_filter._rebuilt_at = float("-inf")
+        with blacklist_filter._rebuild_lock, self.assertNumQueries(0):
+            self.assertFalse(blacklist_filter.might_contain("x"))
+            blacklist_filter._thread.join()  # gives up at once: the lock is taken
+
+    def test_stale_filter_is_rebuilt_off_the_request_thread(self):
+        self.assertFalse(is_blacklisted("x"))
+        blacklist_filter._rebuilt_at = float("-inf")
+        threads = []
+        with mock.patch.object(blacklist_filter, "_rebuild", lambda *args: threads.append(threading.get_ident())):
+            with self.assertNumQueries(0):
+                self.assertFalse(blacklist_filter.might_contain("x"))
+            blacklist_filter._thread.join()
+        self.assertEqual(len(threads), 1)
+        self.assertNotEqual(threads[0], threading.get_ident())
+
+    def test_prune_removes_only_expired_tokens(self):
+        tokens = [RefreshToken.for_user(self.user) for _ in range(5)]
+        tokens[0].blacklist()
+        expired = [t["jti"] for t in tokens[:3]]
+        OutstandingToken.objects.filter(jti__in=expired).update(expires_at=timezone.now() - timedelta(days=1))
+        out = StringIO()
+        call_command("prune_tokens", chunk_size=2, stdout=out)
+        self.assertIn("Pruned 3 expired tokens in 2 chunks", out.getvalue())
+        self.assertEqual(set(OutstandingToken.objects.values_list("jti", flat=True)),
+                         {t["jti"] for t in tokens[3:]})
+        self.assertFalse(BlacklistedToken.objects.exists())
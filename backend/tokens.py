@@ -0,0 +1,93 @@
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from .blacklist import blacklist_filter, is_blacklisted
+from .cache import LocalTTLCache
+
+# every refresh token issued at login carries its own jti as the family; access tokens minted from it (and
+# rotated refresh tokens) copy the claim, so revoking the family at logout covers all of them
+FAMILY_CLAIM = "fam"
+# with settings.JWT_ROLE_CLAIM the user's role rides along too, see CachedJWTAuthentication
+ROLE_CLAIM = "role"
+
+
+class FamilyRefreshToken(RefreshToken):
+    @classmethod
+    def for_user(cls, user):
+        token = super().for_user(user)
+        token[FAMILY_CLAIM] = token[api_settings.JTI_CLAIM]
+        if getattr(settings, "JWT_ROLE_CLAIM", False):
+            token[ROLE_CLAIM] = user.role
+        return token
+
+    def check_blacklist(self):
+        # the stock check joins the blacklist tables on every refresh; the Bloom filter clears almost every
+        # token without touching them
+        if is_blacklisted(self.payload[api_settings.JTI_CLAIM]):
+            raise TokenError(_("Token is blacklisted"))
+
+    def blacklist(self):
+        result = super().blacklist()
+        blacklist_filter.add(self.payload[api_settings.JTI_CLAIM])
+        return result
+
+
+class FamilyTokenObtainPairSerializer(TokenObtainPairSerializer):
+    token_class = FamilyRefreshToken
+
+
+class FamilyTokenRefreshSerializer(TokenRefreshSerializer):
+    token_class = FamilyRefreshToken
+
+
+def token_family(token):
+    return token.get(FAMILY_CLAIM)
+
+
+class RevokedFamilies:
+    """
+    Revoked refresh families, kept in the shared cache until the refresh token would have expired anyway.
+    Lookups are memoised in-process for JWT_REVOCATION_LOCAL_TTL seconds, so a reconnect storm costs no
+    cache or database round trips; a logout on another process is seen within that window. JWT_REVOCATION_CACHE
+    must be a backend every worker shares: with LocMem a logout only reaches its own process, which
+    `check --deploy` reports as backend.W002.
+    """
+
+    key_prefix = "jwt:revoked:"
+
+    def __init__(self):
+        self._local = LocalTTLCache(lambda: getattr(settings, "JWT_REVOCATION_LOCAL_TTL", 10))
+
+    @property
+    def cache(self):
+        return caches[getattr(settings, "JWT_REVOCATION_CACHE", "default")]
+
+    def revoke(self, token):
+        family = token_family(token)
+        if not family:
+            return
+        timeout = max(1, int(token["exp"] - time.time()))
+        self.cache.set(self.key_prefix + family, True, timeout)
+        self._local.set(family, True)
+
+    def is_revoked(self, family):
+        if not family:
+            return False
+        revoked = self._local.get(family)
+        if revoked is None:
+            revoked = bool(self.cache.get(self.key_prefix + family))
+            self._local.set(family, revoked)
+        return revoked
+
+    def clear(self):
+        self._local.clear()
+
+
+revoked_families = RevokedFamilies()
@@ -8,12 +8,14 @@ from .views import (
     MentorViewSet,
     ProposalViewSet,
     MeetingViewSet,
+    NotificationViewSet,
     LogoutView,
+    MetricsView,
     ActivateAccountView,
     PasswordResetRequestView,
     PasswordResetConfirmView, GoogleLoginView, GoogleRegisterView
 )
-from .calendar_views import MeetingAddToCalendarView
+from .calendar_views import MeetingAddToCalendarView, UserFreeBusyView
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 router = DefaultRouter()
 router.register(r"students", StudentProfileViewSet, basename="student")
@@ -21,10 +23,12 @@ router.register(r"mentors", MentorViewSet, basename="mentor")
 router.register(r"requests", RequestViewSet, basename="request")
 router.register(r"proposals", ProposalViewSet, basename="proposal")
 router.register(r"meetings", MeetingViewSet, basename="meeting")
+router.register(r"notifications", NotificationViewSet, basename="notification")
 urlpatterns = [
     path("auth/google/register/", GoogleRegisterView.as_view(), name="google_register"),
     path("auth/google/", GoogleLoginView.as_view(), name="google_login"),
     path("meetings/<int:pk>/add_to_calendar/", MeetingAddToCalendarView.as_view(), name="meeting-add-to-calendar"),
+    path("users/<int:pk>/freebusy/", UserFreeBusyView.as_view(), name="user-freebusy"),
     path("", include(router.urls)),
     path("auth/register/", RegisterView.as_view(), name="register"),
     path("auth/activate/", ActivateAccountView.as_view(), name="activate"),
@@ -34,4 +38,5 @@ urlpatterns = [
     path("auth/token/", TokenObtainPairView.as_view(), name="token_obtain_pair"),
     path("auth/token/refresh/", TokenRefreshView.as_view(), name="token_refresh"),
     path("auth/logout/", LogoutView.as_view(), name="logout"),
+    path("metrics/", MetricsView.as_view(), name="metrics"),
 ]
\ No newline at end of file
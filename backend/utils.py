@@ -1,11 +1,41 @@
-from datetime import datetime, timedelta, timezone
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from bisect import bisect_right
+import binascii
+from collections import OrderedDict
+from datetime import datetime, timezone
+from functools import lru_cache
+import heapq
+from itertools import islice
+import re
+import threading
+import time
 from uuid import uuid4
 import os
 import json
 from pathlib import Path
 
+from dateutil.relativedelta import relativedelta
+from dateutil.rrule import rrulestr
 from django.conf import settings
 
+from . import metrics
+
+ALLOWED_RULE_FREQUENCIES = ("DAILY", "WEEKLY", "MONTHLY", "YEARLY")
+_RULE_FREQ_RE = re.compile(r"FREQ=([A-Z]+)")
+_RULE_INTERVAL_RE = re.compile(r"INTERVAL=(\d+)")
+_FIXED_PERIOD_MINUTES = {"DAILY": 24 * 60, "WEEKLY": 7 * 24 * 60}
+# daily and weekly rules are re-anchored in steps of about four weeks: expanding one costs at most a step's
+# occurrences instead of the rule's whole history, and the parsed rule is reused within a step
+RULE_ANCHOR_STEP_MINUTES = 28 * 24 * 60
+
+def parse_skill_tags(skills):
+    tags = []
+    for raw in (skills or "").split(","):
+        tag = " ".join(raw.split()).lower()[:100]
+        if tag and tag not in tags:
+            tags.append(tag)
+    return tags
+
 def parse_iso_to_utc(dt_str):
     if dt_str is None:
         return None
@@ -17,63 +47,355 @@ def parse_iso_to_utc(dt_str):
         dt = dt.replace(tzinfo=timezone.utc)
     return dt.astimezone(timezone.utc)
 
-def intersect_intervals(a, b):
-    res = []
-    i, j = 0, 0
-    a_sorted = sorted(a, key=lambda x: x['start'])
-    b_sorted = sorted(b, key=lambda x: x['start'])
-    while i < len(a_sorted) and j < len(b_sorted):
-        s = max(a_sorted[i]['start'], b_sorted[j]['start'])
-        e = min(a_sorted[i]['end'], b_sorted[j]['end'])
+def to_epoch_minutes(dt):
+    return int(dt.timestamp()) // 60
+
+def from_epoch_minutes(minutes):
+    return datetime.fromtimestamp(minutes * 60, tz=timezone.utc)
+
+def merge_intervals(pairs):
+    out = []
+    for s, e in sorted(pairs):
+        if out and s <= out[-1][1]:
+            if e > out[-1][1]:
+                out[-1][1] = e
+        else:
+            out.append([s, e])
+    return out
+
+def to_iso_z(dt):
+    return dt.astimezone(timezone.utc).replace(microsecond=0).isoformat().replace("+00:00", "Z")
+
+def _parse_interval(it):
+    try:
+        s = parse_iso_to_utc(it.get('start'))
+        e = parse_iso_to_utc(it.get('end'))
+    except (AttributeError, TypeError, ValueError):
+        raise ValueError(f"Invalid interval datetimes: {it.get('start')} - {it.get('end')}")
+    if not s or not e:
+        raise ValueError("Each interval needs both start and end.")
+    s, e = to_epoch_minutes(s), to_epoch_minutes(e)
+    if s >= e:
+        raise ValueError(f"Interval must end after it starts: {it.get('start')} - {it.get('end')}")
+    return s, e
+
+@lru_cache(maxsize=2048)
+def _parse_rule(rule, dtstart):
+    return rrulestr(rule, dtstart=from_epoch_minutes(dtstart))
+
+def _compile_rule(it):
+    rule = str(it.get('rrule')).strip()
+    if rule.upper().startswith("RRULE:"):
+        rule = rule[6:]
+    freq = _RULE_FREQ_RE.search(rule.upper())
+    if not freq or freq.group(1) not in ALLOWED_RULE_FREQUENCIES:
+        raise ValueError(f"Recurrence rule frequency must be one of {', '.join(ALLOWED_RULE_FREQUENCIES)}.")
+    if "DTSTART" in rule.upper():
+        raise ValueError("Recurrence rules take their start from the interval start, not DTSTART.")
+    s, e = _parse_interval(it)
+    try:
+        _parse_rule(rule, s)
+        exdates = sorted({to_epoch_minutes(parse_iso_to_utc(x)) for x in (it.get('exdates') or [])})
+    except (AttributeError, TypeError, ValueError):
+        raise ValueError(f"Invalid recurrence rule or exdates: {rule}")
+    return {'rrule': rule, 'dtstart': s, 'duration': e - s, 'exdates': exdates}
+
+def _reject_sub_minute(it):
+    # availability is kept in whole minutes; refuse seconds instead of silently truncating them
+    for value in [it.get('start'), it.get('end')] + list(it.get('exdates') or []):
+        try:
+            dt = parse_iso_to_utc(value)
+        except (AttributeError, TypeError, ValueError):
+            continue  # malformed values are reported by _compile_item
+        if dt and (dt.second or dt.microsecond):
+            raise ValueError(f"Availability times must be whole minutes: {value}")
+
+def _compile_item(it):
+    if it.get('rrule'):
+        return None, _compile_rule(it)
+    return _parse_interval(it), None
+
+def split_availability(av):
+    pairs, rules = [], []
+    for it in (av or []):
+        try:
+            pair, rule = _compile_item(it)
+        except (AttributeError, ValueError):
+            continue
+        if pair:
+            pairs.append(pair)
+        else:
+            rules.append(rule)
+    return merge_intervals(pairs), rules
+
+def availability_to_minutes(av):
+    return split_availability(av)[0]
+
+def compile_availability(av):
+    if av is None:
+        return [], []
+    if not isinstance(av, list):
+        raise ValueError("Availability must be a list of intervals.")
+    pairs, rules = [], []
+    for it in av:
+        if not isinstance(it, dict):
+            raise ValueError("Each interval must be an object with start and end.")
+        _reject_sub_minute(it)
+        pair, rule = _compile_item(it)
+        if pair:
+            pairs.append(pair)
+        else:
+            rules.append(rule)
+    return merge_intervals(pairs), rules
+
+def minutes_to_availability(pairs):
+    return [{'start': to_iso_z(from_epoch_minutes(s)), 'end': to_iso_z(from_epoch_minutes(e))} for s, e in pairs]
+
+def rules_to_availability(rules):
+    out = []
+    for r in rules:
+        out.append({
+            'rrule': r['rrule'],
+            'start': to_iso_z(from_epoch_minutes(r['dtstart'])),
+            'end': to_iso_z(from_epoch_minutes(r['dtstart'] + r['duration'])),
+            'exdates': [to_iso_z(from_epoch_minutes(x)) for x in r['exdates']],
+        })
+    return out
+
+def stored_availability(compiled, rules, raw):
+    # rows saved before availability_compiled existed still carry only the raw JSON
+    if compiled or rules or not raw:
+        return compiled or [], rules or []
+    return split_availability(raw)
+
+def profile_availability(profile):
+    if profile is None:
+        return [], []
+    return stored_availability(profile.availability_compiled, profile.availability_rules, profile.availability)
+
+def _as_compiled(av):
+    if isinstance(av, tuple):
+        return av
+    if av and isinstance(av[0], (list, tuple)):
+        return av, []
+    return split_availability(av)
+
+def horizon_until(start):
+    return start + getattr(settings, 'AVAILABILITY_HORIZON_DAYS', 365) * 24 * 60
+
+def availability_window_end(availabilities, start):
+    # rules stop at the horizon, concrete intervals run until their last end
+    end = horizon_until(start)
+    for av in availabilities:
+        pairs = _as_compiled(av)[0]
+        if pairs:
+            end = max(end, pairs[-1][1])
+    return end
+
+def _default_until(after, rules):
+    # the horizon counts from when the rules begin, so far-future availability is not cut off
+    base = after if after is not None else to_epoch_minutes(datetime.now(timezone.utc))
+    return horizon_until(max(base, min(r['dtstart'] for r in rules)))
+
+def _rule_anchor(rule, before):
+    """
+    A start at or before `before` that lies a whole number of the rule's periods past its dtstart, so the rule
+    re-anchored there yields exactly the same occurrences from that point on. COUNT rules count from their own
+    start, and month-end or leap-day starts do not survive a shift by months, so those keep their dtstart.
+    """
+    dtstart, text = rule['dtstart'], rule['rrule'].upper()
+    if before <= dtstart or "COUNT=" in text:
+        return dtstart
+    freq = _RULE_FREQ_RE.search(text).group(1)
+    interval = _RULE_INTERVAL_RE.search(text)
+    interval = int(interval.group(1)) if interval else 1
+    if freq in _FIXED_PERIOD_MINUTES:
+        step = interval * _FIXED_PERIOD_MINUTES[freq]
+        step *= max(1, RULE_ANCHOR_STEP_MINUTES // step)
+        return dtstart + (before - dtstart) // step * step
+    start, end = from_epoch_minutes(dtstart), from_epoch_minutes(before)
+    if freq == "MONTHLY" and start.day <= 28:
+        months = interval
+    elif freq == "YEARLY" and (start.month, start.day) != (2, 29):
+        months = 12 * interval
+    else:
+        return dtstart
+    # one month short of `before` so the anchor never lands past it
+    elapsed = (end.year - start.year) * 12 + end.month - start.month - 1
+    return to_epoch_minutes(start + relativedelta(months=max(0, elapsed) // months * months))
+
+def iter_rule_intervals(rule, after=None, until=None):
+    dtstart = _rule_anchor(rule, after - rule['duration']) if after is not None else rule['dtstart']
+    rr = _parse_rule(rule['rrule'], dtstart)
+    duration = rule['duration']
+    exdates = set(rule.get('exdates') or ())
+    if after is not None:
+        occurrences = rr.xafter(from_epoch_minutes(after - duration), inc=False)
+    else:
+        occurrences = iter(rr)
+    for occ in occurrences:
+        s = to_epoch_minutes(occ)
+        if until is not None and s >= until:
+            return
+        if s in exdates:
+            continue
+        yield [s, s + duration]
+
+def _coalesce(intervals):
+    cur = None
+    for s, e in intervals:
+        if cur and s <= cur[1]:
+            if e > cur[1]:
+                cur[1] = e
+        else:
+            if cur:
+                yield cur
+            cur = [s, e]
+    if cur:
+        yield cur
+
+def iter_availability(av, after=None, until=None):
+    if av is not None and not isinstance(av, (list, tuple)):
+        return iter(av)
+    pairs, rules = _as_compiled(av)
+    first = bisect_right(pairs, after, key=lambda p: p[1]) if after is not None else 0
+    concrete = (list(pairs[k]) for k in range(first, len(pairs)))
+    if not rules:
+        return concrete
+    if until is None:
+        until = _default_until(after, rules)
+    streams = [concrete] + [iter_rule_intervals(r, after, until) for r in rules]
+    return _coalesce(heapq.merge(*streams))
+
+# both inputs are merged, sorted [start, end] streams such as iter_availability yields
+def iter_intersect_intervals(a, b):
+    a, b = iter(a), iter(b)
+    x, y = next(a, None), next(b, None)
+    while x is not None and y is not None:
+        s = max(x[0], y[0])
+        e = min(x[1], y[1])
         if s < e:
-            res.append({'start': s, 'end': e})
-        if a_sorted[i]['end'] < b_sorted[j]['end']:
-            i += 1
+            yield [s, e]
+        if x[1] < y[1]:
+            x = next(a, None)
         else:
-            j += 1
-    return res
+            y = next(b, None)
+
+def intersect_intervals(a, b):
+    return list(iter_intersect_intervals(a, b))
+
+def iter_intersect_many(streams):
+    iters = [iter(st) for st in streams]
+    heads = [next(it, None) for it in iters]
+    if not iters or any(h is None for h in heads):
+        return
+    # heap keyed on interval end: the earliest-ending head is the only one that can advance
+    heap = [(h[1], k) for k, h in enumerate(heads)]
+    heapq.heapify(heap)
+    max_start = max(h[0] for h in heads)
+    while True:
+        min_end, k = heap[0]
+        if max_start < min_end:
+            yield [max_start, min_end]
+        nxt = next(iters[k], None)
+        if nxt is None:
+            return
+        heapq.heapreplace(heap, (nxt[1], k))
+        max_start = max(max_start, nxt[0])
+
+def _endpoints(stream):
+    for s, e in stream:
+        yield (s, 1)
+        yield (e, -1)
+
+def iter_coverage(streams, min_count):
+    # sweep line over every endpoint; ends sort before starts at the same minute (half-open intervals)
+    def covered():
+        count, start = 0, None
+        for t, delta in heapq.merge(*(_endpoints(st) for st in streams)):
+            before = count
+            count += delta
+            if before < min_count <= count:
+                start = t
+            elif count < min_count <= before and start < t:
+                yield [start, t]
+    return _coalesce(covered())
+
+def covers(intervals, start, end):
+    i = bisect_right(intervals, start, key=lambda p: p[0]) - 1
+    return i >= 0 and intervals[i][1] >= end
+
+def iter_subtract_intervals(a, b):
+    b = iter(b)
+    y = next(b, None)
+    for s, e in a:
+        cur = s
+        while y is not None and y[1] <= cur:
+            y = next(b, None)
+        while y is not None and y[0] < e:
+            if y[0] > cur:
+                yield [cur, y[0]]
+            cur = max(cur, y[1])
+            if y[1] >= e:
+                break
+            y = next(b, None)
+        if cur < e:
+            yield [cur, e]
+
+def subtract_intervals(a, b):
+    return list(iter_subtract_intervals(a, b))
+
+def overlaps_any(intervals, start, end):
+    i = bisect_right(intervals, start, key=lambda p: p[1])
+    return i < len(intervals) and intervals[i][0] < end
+
+def iter_slots(intervals, duration_minutes=60, step_minutes=30, after=None):
+    for s, e in intervals:
+        cursor = s
+        if after is not None and after >= s:
+            # jump straight to the first step-aligned slot starting after the cursor
+            cursor = s + ((after - s) // step_minutes + 1) * step_minutes
+        while cursor + duration_minutes <= e:
+            yield (cursor, cursor + duration_minutes)
+            cursor += step_minutes
 
 def slice_into_slots(intervals, duration_minutes=60, step_minutes=30):
-    slots = []
-    dur = timedelta(minutes=duration_minutes)
-    step = timedelta(minutes=step_minutes)
-    for iv in intervals:
-        cursor = iv['start']
-        while cursor + dur <= iv['end']:
-            slots.append({'start': cursor, 'end': cursor + dur})
-            cursor = cursor + step
-    return slots
+    return list(iter_slots(intervals, duration_minutes, step_minutes))
+
+def iter_common_slots(avail1, avail2, duration_minutes=60, step_minutes=30, after=None):
+    inter = iter_intersect_intervals(iter_availability(avail1, after=after), iter_availability(avail2, after=after))
+    return iter_slots(inter, duration_minutes, step_minutes, after=after)
+
+def encode_slot_cursor(minutes):
+    return urlsafe_b64encode(f"slot:{minutes}".encode()).decode().rstrip("=")
+
+def decode_slot_cursor(cursor):
+    try:
+        raw = urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        prefix, minutes = raw.split(":", 1)
+        if prefix != "slot":
+            raise ValueError()
+        return int(minutes)
+    except (ValueError, UnicodeDecodeError, binascii.Error):
+        raise ValueError("Invalid cursor")
 
 def compute_common_slots(avail1, avail2, duration_minutes=60, step_minutes=30, limit=20):
-    def to_dt_list(av):
-        out = []
-        for it in (av or []):
-            s = parse_iso_to_utc(it.get('start'))
-            e = parse_iso_to_utc(it.get('end'))
-            if s and e and s < e:
-                out.append({'start': s, 'end': e})
-        return sorted(out, key=lambda x: x['start'])
-    a = to_dt_list(avail1)
-    b = to_dt_list(avail2)
-    inter = intersect_intervals(a, b)
-    slots_dt = slice_into_slots(inter, duration_minutes, step_minutes)
-    def to_iso_z(dt):
-        return dt.astimezone(timezone.utc).replace(microsecond=0).isoformat().replace("+00:00", "Z")
-    out = []
-    for s in slots_dt[:limit]:
-        out.append({'start': to_iso_z(s['start']), 'end': to_iso_z(s['end'])})
-    return out
+    slots = iter_common_slots(avail1, avail2, duration_minutes, step_minutes)
+    return minutes_to_availability(islice(slots, limit))
 
 def generate_meet_link():
     return f"https://meet.jit.si/{uuid4()}"
 
-def _resolve_service_account_file():
-    sa_path = getattr(settings, "GOOGLE_SERVICE_ACCOUNT_FILE", None)
+GOOGLE_CALENDAR_SCOPES = [
+    'https://www.googleapis.com/auth/calendar',
+    'https://www.googleapis.com/auth/calendar.events',
+]
+MEET_STRATEGIES = ("impersonate", "service_account")
+
+@lru_cache(maxsize=None)
+def _find_service_account_file(sa_path):
     if sa_path:
-        if os.path.isabs(sa_path):
-            p = Path(sa_path)
-        else:
-            p = Path(settings.BASE_DIR) / sa_path
+        p = Path(sa_path) if os.path.isabs(sa_path) else Path(settings.BASE_DIR) / sa_path
         if p.exists():
             return str(p)
     default = Path(settings.BASE_DIR) / "service-account.json"
@@ -81,127 +403,234 @@ def _resolve_service_account_file():
         return str(default)
     return None
 
-def create_google_meet_event(start_dt, end_dt, summary, description, attendees_emails, organizer_email=None):
-    sa_file = _resolve_service_account_file()
-    if not sa_file:
-        print("create_google_meet_event: service account file not found, returning fallback Jitsi link")
-        return generate_meet_link()
-
-    scopes = [
-        'https://www.googleapis.com/auth/calendar',
-        'https://www.googleapis.com/auth/calendar.events',
-    ]
+def _resolve_service_account_file():
+    return _find_service_account_file(getattr(settings, "GOOGLE_SERVICE_ACCOUNT_FILE", None))
 
+@lru_cache(maxsize=None)
+def _google_libraries_available():
     try:
-        from google.oauth2 import service_account
-        from googleapiclient.discovery import build
-        from google.auth.exceptions import RefreshError
-        from googleapiclient.errors import HttpError
+        import google.oauth2.service_account  # noqa: F401
+        import googleapiclient.discovery  # noqa: F401
     except Exception as e:
         print("create_google_meet_event: google libraries not available:", e)
-        return generate_meet_link()
+        return False
+    return True
 
-    def _parse_http_error_reason(err):
-        try:
-            info = json.loads(err.content.decode())
-            errs = info.get('error', {})
-            if isinstance(errs, dict):
-                return errs.get('errors')
-            return None
-        except Exception:
-            return None
-
-    def _create_with_credentials(creds, calendar_id, include_attendees=True, include_conference=True, send_updates='none'):
-        try:
+class CalendarClient:
+    def __init__(self, credentials, service):
+        self.credentials = credentials
+        self.service = service
+        # the discovery client's http transport is not thread-safe
+        self.lock = threading.Lock()
+
+class CalendarClientPool:
+    """
+    Process-wide credentials and built calendar services, one per (service account file, subject); every
+    organizer is a subject, so only the `max_size` most recently used are kept.
+    """
+
+    def __init__(self, max_size=256):
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._clients = OrderedDict()
+        self._building = {}
+
+    def get(self, sa_file, subject=None):
+        key = (sa_file, subject)
+        with self._lock:
+            client = self._clients.get(key)
+            if client is not None:
+                self._clients.move_to_end(key)
+                return client
+            building = self._building.setdefault(key, threading.Lock())
+        # building reads the key file and may fetch a token: only callers wanting the same client wait for it
+        with building:
+            with self._lock:
+                client = self._clients.get(key)
+            if client is not None:
+                return client
+            try:
+                client = self._build(sa_file, subject)
+            finally:
+                with self._lock:
+                    self._building.pop(key, None)
+            with self._lock:
+                self._clients[key] = client
+                while len(self._clients) > self.max_size:
+                    self._clients.popitem(last=False)
+            return client
+
+    def _build(self, sa_file, subject):
+        from google.oauth2 import service_account
+        from googleapiclient.discovery import build
+        with metrics.timer("google_calendar.client_build"):
+            creds = service_account.Credentials.from_service_account_file(
+                sa_file, scopes=GOOGLE_CALENDAR_SCOPES, subject=subject)
             service = build('calendar', 'v3', credentials=creds, cache_discovery=False)
-        except Exception as e:
-            raise RuntimeError(f"Failed to build calendar service: {e}")
-
-        event = {
-            'summary': summary,
-            'description': description,
-            'start': {'dateTime': start_dt.isoformat(), 'timeZone': 'UTC'},
-            'end': {'dateTime': end_dt.isoformat(), 'timeZone': 'UTC'},
-        }
+        return CalendarClient(creds, service)
 
-        if include_conference and include_attendees:
-            event['conferenceData'] = {
-                'createRequest': {
-                    'requestId': str(uuid4()),
-                    'conferenceSolutionKey': {'type': 'hangoutsMeet'}
-                }
-            }
+    def clear(self):
+        with self._lock:
+            self._clients.clear()
+            self._building.clear()
 
-        if include_attendees and attendees_emails:
-            event['attendees'] = [{'email': e} for e in attendees_emails]
+class StrategyMemory:
+    """
+    TTL memory of which meet-link strategy worked, or failed for good, for an organizer domain. Only
+    permanent auth/permission errors count as failing; a timeout or 5xx says nothing about the next call.
+    """
 
-        try:
-            created = service.events().insert(
-                calendarId=calendar_id,
-                body=event,
-                conferenceDataVersion=1 if include_conference and include_attendees else 0,
-                sendUpdates=send_updates
-            ).execute()
-        except HttpError as he:
-            raise he
-        except Exception as ex:
-            raise ex
-
-        if isinstance(created, dict):
-            if created.get('hangoutLink'):
-                return created.get('hangoutLink')
-            cd = created.get('conferenceData', {}) or {}
-            for ep in cd.get('entryPoints', []):
-                uri = ep.get('uri')
-                if uri:
-                    return uri
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._working = {}
+        self._failing = {}
+
+    def _ttl(self):
+        return getattr(settings, "GOOGLE_MEET_STRATEGY_TTL", 3600)
+
+    def _live(self, table, key):
+        entry = table.get(key)
+        if entry and entry[1] > time.monotonic():
+            return entry[0]
+        table.pop(key, None)
         return None
 
-    if organizer_email:
-        try:
-            creds = service_account.Credentials.from_service_account_file(sa_file, scopes=scopes, subject=organizer_email)
-            try:
-                link = _create_with_credentials(creds, organizer_email, include_attendees=True, include_conference=True, send_updates='all')
-                if link:
-                    return link
-            except HttpError as he:
-                reasons = _parse_http_error_reason(he)
-                print(f"create_google_meet_event: impersonation attempt failed for {organizer_email}: {he}; reasons={reasons}")
-            except Exception as e:
-                print(f"create_google_meet_event: impersonation unexpected error for {organizer_email}: {e}")
-        except Exception as e:
-            print(f"create_google_meet_event: failed to load credentials for impersonation: {e}")
+    def working(self, domain):
+        with self._lock:
+            return self._live(self._working, domain)
+
+    def is_failing(self, domain, strategy):
+        with self._lock:
+            return bool(self._live(self._failing, (domain, strategy)))
+
+    def succeeded(self, domain, strategy):
+        with self._lock:
+            self._working[domain] = (strategy, time.monotonic() + self._ttl())
+            self._failing.pop((domain, strategy), None)
+
+    def failed(self, domain, strategy):
+        with self._lock:
+            self._failing[(domain, strategy)] = (True, time.monotonic() + self._ttl())
+            if self._live(self._working, domain) == strategy:
+                self._working.pop(domain, None)
 
+    def clear(self):
+        with self._lock:
+            self._working.clear()
+            self._failing.clear()
+
+calendar_clients = CalendarClientPool(getattr(settings, "GOOGLE_CALENDAR_CLIENT_POOL_SIZE", 256))
+meet_strategies = StrategyMemory()
+
+def _http_error_reasons(err):
     try:
-        creds2 = service_account.Credentials.from_service_account_file(sa_file, scopes=scopes)
-        calendar_id = getattr(settings, "GOOGLE_CALENDAR_ID", None) or getattr(creds2, "service_account_email", None)
-        if not calendar_id:
-            print("create_google_meet_event: no calendar_id available from settings or service account")
-        else:
+        errs = json.loads(err.content.decode()).get('error', {})
+        if isinstance(errs, dict):
+            return errs.get('errors') or []
+    except Exception:
+        pass
+    return []
+
+# API error reasons that will not go away on retry: the domain or service account lacks the permission
+PERMANENT_FAILURE_REASONS = {"forbidden", "forbiddenForServiceAccounts", "insufficientPermissions",
+                             "unauthorized_client"}
+
+def _is_permanent_failure(err, reasons):
+    # google.auth's RefreshError (e.g. unauthorized_client when domain-wide delegation is not granted),
+    # matched by name so this module keeps importing without the google libraries
+    if any(cls.__name__ == "RefreshError" for cls in type(err).__mro__):
+        return True
+    return any(r.get('reason') in PERMANENT_FAILURE_REASONS for r in reasons)
+
+def _insert_meet_event(client, calendar_id, start_dt, end_dt, summary, description, attendees_emails,
+                       include_attendees=True, send_updates='all'):
+    event = {
+        'summary': summary,
+        'description': description,
+        'start': {'dateTime': start_dt.isoformat(), 'timeZone': 'UTC'},
+        'end': {'dateTime': end_dt.isoformat(), 'timeZone': 'UTC'},
+    }
+    if include_attendees:
+        event['conferenceData'] = {
+            'createRequest': {
+                'requestId': str(uuid4()),
+                'conferenceSolutionKey': {'type': 'hangoutsMeet'}
+            }
+        }
+        if attendees_emails:
+            event['attendees'] = [{'email': e} for e in attendees_emails]
+    with client.lock:
+        created = client.service.events().insert(
+            calendarId=calendar_id,
+            body=event,
+            conferenceDataVersion=1 if include_attendees else 0,
+            sendUpdates=send_updates
+        ).execute()
+    if isinstance(created, dict):
+        if created.get('hangoutLink'):
+            return created.get('hangoutLink')
+        for ep in (created.get('conferenceData') or {}).get('entryPoints', []):
+            if ep.get('uri'):
+                return ep['uri']
+    return None
+
+def _run_meet_strategy(strategy, sa_file, start_dt, end_dt, summary, description, attendees_emails, organizer_email):
+    if strategy == "impersonate":
+        client = calendar_clients.get(sa_file, organizer_email)
+        return _insert_meet_event(client, organizer_email, start_dt, end_dt, summary, description, attendees_emails)
+    client = calendar_clients.get(sa_file)
+    calendar_id = getattr(settings, "GOOGLE_CALENDAR_ID", None) or getattr(client.credentials, "service_account_email", None)
+    if not calendar_id:
+        raise RuntimeError("no calendar_id available from settings or service account")
+    if strategy == "service_account":
+        return _insert_meet_event(client, calendar_id, start_dt, end_dt, summary, description, attendees_emails)
+    return _insert_meet_event(client, calendar_id, start_dt, end_dt, summary, description, attendees_emails,
+                              include_attendees=False, send_updates='none')
+
+def create_google_meet_event(start_dt, end_dt, summary, description, attendees_emails, organizer_email=None):
+    sa_file = _resolve_service_account_file()
+    if not sa_file:
+        print("create_google_meet_event: service account file not found, returning fallback Jitsi link")
+        metrics.incr("google_calendar.fallback", reason="no_service_account")
+        return generate_meet_link()
+    if not _google_libraries_available():
+        metrics.incr("google_calendar.fallback", reason="no_libraries")
+        return generate_meet_link()
+
+    domain = organizer_email.rsplit('@', 1)[-1].lower() if organizer_email else ""
+    queue = [s for s in MEET_STRATEGIES if organizer_email or s != "impersonate"]
+    working = meet_strategies.working(domain)
+    if working:
+        queue = [working] + [s for s in queue if s != working]
+    tried = set()
+    while queue:
+        strategy = queue.pop(0)
+        if strategy in tried:
+            continue
+        tried.add(strategy)
+        # a strategy known to fail is skipped, unless it is the last one left to try
+        remaining = any(s not in tried for s in queue)
+        if strategy != working and remaining and meet_strategies.is_failing(domain, strategy):
+            metrics.incr("google_calendar.skipped", strategy=strategy)
+            continue
+        with metrics.timer("google_calendar.attempt", strategy=strategy) as labels:
             try:
-                link = _create_with_credentials(creds2, calendar_id, include_attendees=True, include_conference=True, send_updates='all')
-                if link:
-                    return link
-            except HttpError as he:
-                reasons = _parse_http_error_reason(he)
-                print(f"create_google_meet_event: create event on service account calendar failed for {calendar_id}: {he}; reasons={reasons}")
-                try:
-                    if reasons:
-                        for r in reasons:
-                            if r.get('reason') == 'forbiddenForServiceAccounts':
-                                try:
-                                    link = _create_with_credentials(creds2, calendar_id, include_attendees=False, include_conference=False, send_updates='none')
-                                    if link:
-                                        return link
-                                except Exception as e2:
-                                    print(f"create_google_meet_event: retry without attendees failed: {e2}")
-                                break
-                except Exception:
-                    pass
+                link = _run_meet_strategy(strategy, sa_file, start_dt, end_dt, summary, description,
+                                          attendees_emails, organizer_email)
             except Exception as e:
-                print(f"create_google_meet_event: unexpected error creating event on {calendar_id}: {e}")
-    except Exception as e:
-        print("create_google_meet_event: failed to load service account credentials:", e)
+                labels["outcome"] = "error"
+                reasons = _http_error_reasons(e)
+                print(f"create_google_meet_event: {strategy} attempt failed for {organizer_email}: {e}; reasons={reasons}")
+                if _is_permanent_failure(e, reasons):
+                    meet_strategies.failed(domain, strategy)
+                if strategy == "service_account" and any(r.get('reason') == 'forbiddenForServiceAccounts' for r in reasons):
+                    queue.insert(0, "service_account_no_attendees")
+                continue
+            labels["outcome"] = "ok" if link else "no_link"
+        if link:
+            meet_strategies.succeeded(domain, strategy)
+            return link
 
     print("create_google_meet_event: all google attempts failed, returning fallback Jitsi link")
-    return generate_meet_link()
\ No newline at end of file
+    metrics.incr("google_calendar.fallback", reason="strategies_failed")
+    return generate_meet_link()
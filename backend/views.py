@@ -1,19 +1,20 @@
 from datetime import datetime
+from itertools import islice
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.contrib.auth.tokens import default_token_generator
-from django.core.mail import send_mail
+from django.db import transaction
+from django.db.models import Count, Max, OuterRef, Q, Subquery
+from django.utils import timezone
 from django.utils.encoding import force_bytes
 from django.utils.http import urlsafe_base64_encode
 
-from asgiref.sync import async_to_sync
-from channels.layers import get_channel_layer
 from rest_framework import generics, viewsets, permissions, exceptions, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
-from .models import StudentProfile, Request, MentorProfile, Proposal, Meeting
+from .models import StudentProfile, Request, MentorProfile, Proposal, Meeting, Skill, MentorSkill, Notification
 from .serializers import (
     StudentProfileSerializer,
     RequestSerializer,
@@ -23,18 +24,59 @@ from .serializers import (
     MentorUpdateSerializer,
     LogoutSerializer,
     ProposalSerializer,
+    attach_latest_meetings,
     MeetingSerializer,
+    NotificationSerializer,
     ActivateAccountSerializer,
     PasswordResetRequestSerializer,
     PasswordResetConfirmSerializer,
 )
+from . import metrics
 from .permissions import IsOwnerOrReadOnly
-from .pagination import StandardResultsSetPagination
-from .utils import compute_common_slots, generate_meet_link, parse_iso_to_utc, create_google_meet_event
-from rest_framework_simplejwt.tokens import RefreshToken
+from .meet_links import schedule_meet_link
+from .notifications import notify_users
+from .outbox import queue_mail
+from .pagination import KeysetOrPageNumberPagination, OptionalKeysetPagination
+from .utils import (
+    compute_common_slots,
+    parse_iso_to_utc,
+    stored_availability,
+    profile_availability,
+    availability_window_end,
+    iter_availability,
+    overlaps_any,
+    iter_intersect_intervals,
+    iter_intersect_many,
+    iter_coverage,
+    iter_slots,
+    covers,
+    to_epoch_minutes,
+    iter_common_slots,
+    minutes_to_availability,
+    encode_slot_cursor,
+    decode_slot_cursor,
+    parse_skill_tags,
+)
+from .overlap import rank_mentors_by_overlap
+from .search import get_search_backend
+from .cache import cached_directory_response
+from .google_auth import get_google_verifier
+from .freebusy import (
+    busy_intervals,
+    exceeds_max_meeting,
+    has_conflict,
+    iter_free,
+    lock_participants,
+)
+from .tokens import FamilyRefreshToken
 import os
 
 User = get_user_model()
+MAX_GROUP_STUDENTS = 200
+MAX_SKILL_FACETS = 50
+MAX_SEARCH_RESULTS = 1000
+# batches of search matches a filtered search pages through before returning what it has
+MAX_SEARCH_BATCHES = 10
 
 
 class RegisterView(generics.CreateAPIView):
@@ -42,22 +84,19 @@ class RegisterView(generics.CreateAPIView):
     permission_classes = [permissions.AllowAny]
     authentication_classes = []
 
+    @transaction.atomic
     def perform_create(self, serializer):
         user = serializer.save()
-        try:
-            token = default_token_generator.make_token(user)
-            uid = urlsafe_base64_encode(force_bytes(user.pk))
-            frontend_url = getattr(settings, 'FRONTEND_URL', 'http://localhost:5173')
-            activation_link = f"{frontend_url}/activate/{uid}/{token}"
-            send_mail(
-                subject="Confirm your MentorMatch registration",
-                message=f"Hello {user.username}, confirm your account: {activation_link}",
-                from_email=settings.DEFAULT_FROM_EMAIL,
-                recipient_list=[user.email],
-                fail_silently=True,
-            )
-        except Exception:
-            pass
+        token = default_token_generator.make_token(user)
+        uid = urlsafe_base64_encode(force_bytes(user.pk))
+        frontend_url = getattr(settings, 'FRONTEND_URL', 'http://localhost:5173')
+        activation_link = f"{frontend_url}/activate/{uid}/{token}"
+        queue_mail(
+            subject="Confirm your MentorMatch registration",
+            message=f"Hello {user.username}, confirm your account: {activation_link}",
+            from_email=settings.DEFAULT_FROM_EMAIL,
+            recipient_list=[user.email],
+        )
 
 
 class ActivateAccountView(APIView):
@@ -87,12 +126,11 @@ class PasswordResetRequestView(APIView):
             uid = urlsafe_base64_encode(force_bytes(user.pk))
             frontend_url = getattr(settings, 'FRONTEND_URL', 'http://localhost:5173')
             reset_link = f"{frontend_url}/reset-password/{uid}/{token}"
-            send_mail(
+            queue_mail(
                 subject="Password reset for MentorMatch",
                 message=f"If you requested a password reset, use this link: {reset_link}",
                 from_email=settings.DEFAULT_FROM_EMAIL,
                 recipient_list=[email],
-                fail_silently=True,
             )
         except User.DoesNotExist:
             pass
@@ -130,6 +168,14 @@ class LogoutView(APIView):
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
+class MetricsView(APIView):
+    """This worker's counters, timings and gauges; each process keeps its own, so scrape every worker."""
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        return Response({"pid": os.getpid(), **metrics.snapshot()})
+
+
 class StudentProfileViewSet(viewsets.ModelViewSet):
     queryset = StudentProfile.objects.select_related("user").all()
     serializer_class = StudentProfileSerializer
@@ -166,18 +212,20 @@ class StudentProfileViewSet(viewsets.ModelViewSet):
 class RequestViewSet(viewsets.ModelViewSet):
     serializer_class = RequestSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = OptionalKeysetPagination
 
     def get_queryset(self):
         user = self.request.user
-        return Request.objects.filter(student=user) | Request.objects.filter(mentor=user)
+        return Request.objects.filter(Q(student=user) | Q(mentor=user)).select_related("student", "mentor")
 
+    @transaction.atomic
     def perform_create(self, serializer):
         if self.request.user.role != User.ROLE_STUDENT:
             raise exceptions.ValidationError("Only students can send requests.")
         mentor = serializer.validated_data.get("mentor")
         if mentor is None:
             raise exceptions.ValidationError("mentor is required.")
-        if mentor == self.request.user:
+        if mentor.id == self.request.user.id:
             raise exceptions.ValidationError("You cannot send a request to yourself.")
         if getattr(mentor, "role", None) != User.ROLE_MENTOR:
             raise exceptions.ValidationError("Target user is not a mentor.")
@@ -189,46 +237,26 @@ class RequestViewSet(viewsets.ModelViewSet):
         frontend_url = getattr(settings, 'FRONTEND_URL', 'http://localhost:5173')
         dashboard_link = f"{frontend_url}/dashboard"
 
-        try:
-            send_mail(
-                subject=f"New request from {instance.student.username}",
-                message=(
-                    f"Student {instance.student.username} sent you a request:\n\n"
-                    f"\"{instance.message}\"\n\n"
-                    f"Please accept or reject it in your dashboard:\n"
-                    f"{dashboard_link}"
-                ),
-                from_email=settings.DEFAULT_FROM_EMAIL,
-                recipient_list=[mentor.email],
-                fail_silently=True,
-            )
-        except Exception:
-            pass
+        queue_mail(
+            subject=f"New request from {instance.student.username}",
+            message=(
+                f"Student {instance.student.username} sent you a request:\n\n"
+                f"\"{instance.message}\"\n\n"
+                f"Please accept or reject it in your dashboard:\n"
+                f"{dashboard_link}"
+            ),
+            from_email=settings.DEFAULT_FROM_EMAIL,
+            recipient_list=[mentor.email],
+        )
 
-        try:
-            channel_layer = get_channel_layer()
-            async_to_sync(channel_layer.group_send)(
-                f"user_{mentor.id}",
-                {
-                    "type": "notify",
-                    "event": "new_request",
-                    "data": {
-                        "request_id": instance.id,
-                        "student": instance.student.username,
-                        "message": instance.message,
-                        "status": instance.status,
-                        "recipient_id": mentor.id,
-                        "sender_id": instance.student.id
-                    },
-                },
-            )
-        except Exception:
-            pass
+        notify_users([mentor.id], "new_request", sender_id=instance.student.id, request_id=instance.id,
+                     student=instance.student.username, message=instance.message, status=instance.status)
 
     @action(detail=True, methods=["post"], permission_classes=[permissions.IsAuthenticated])
+    @transaction.atomic
     def accept(self, request, pk=None):
         req = self.get_object()
-        if request.user != req.mentor:
+        if request.user.id != req.mentor_id:
             return Response({"detail": "Only mentor can accept."}, status=status.HTTP_403_FORBIDDEN)
         if req.status != "pending":
             return Response({"detail": "Request already processed."}, status=status.HTTP_400_BAD_REQUEST)
@@ -237,71 +265,41 @@ class RequestViewSet(viewsets.ModelViewSet):
         proposal = Proposal.objects.create(
             request=req, mentor=req.mentor, student=req.student, slots=[], status="awaiting_mentor"
         )
-        try:
-            frontend_url = getattr(settings, 'FRONTEND_URL', 'http://localhost:5173')
-            send_mail(
-                subject="Please provide your available days/times",
-                message=(
-                    f"Please indicate your available days/times for the meeting: "
-                    f"{frontend_url}/mentor/proposals/{proposal.id}"
-                ),
-                from_email=settings.DEFAULT_FROM_EMAIL,
-                recipient_list=[req.mentor.email],
-                fail_silently=True,
-            )
-        except Exception:
-            pass
-        try:
-            channel_layer = get_channel_layer()
-            async_to_sync(channel_layer.group_send)(
-                f"user_{req.mentor.id}",
-                {
-                    "type": "notify",
-                    "event": "request_accepted_need_slots",
-                    "data": {"request_id": req.id, "proposal_id": proposal.id, "recipient_id": req.mentor.id,
-                             "sender_id": req.mentor.id},
-                },
-            )
-        except Exception:
-            pass
+        frontend_url = getattr(settings, 'FRONTEND_URL', 'http://localhost:5173')
+        queue_mail(
+            subject="Please provide your available days/times",
+            message=(
+                f"Please indicate your available days/times for the meeting: "
+                f"{frontend_url}/mentor/proposals/{proposal.id}"
+            ),
+            from_email=settings.DEFAULT_FROM_EMAIL,
+            recipient_list=[req.mentor.email],
+        )
+        notify_users([req.mentor.id], "request_accepted_need_slots", sender_id=req.mentor.id,
+                     request_id=req.id, proposal_id=proposal.id)
         return Response(ProposalSerializer(proposal).data, status=status.HTTP_201_CREATED)
 
     @action(detail=True, methods=["post"], permission_classes=[permissions.IsAuthenticated])
+    @transaction.atomic
     def reject(self, request, pk=None):
         req = self.get_object()
-        if request.user != req.mentor:
+        if request.user.id != req.mentor_id:
             return Response({"detail": "Only mentor can reject."}, status=status.HTTP_403_FORBIDDEN)
         req.status = "rejected"
         req.save()
-        try:
-            send_mail(
-                subject="Request update",
-                message=f"Unfortunately mentor {req.mentor.username} rejected your request.",
-                from_email=settings.DEFAULT_FROM_EMAIL,
-                recipient_list=[req.student.email],
-                fail_silently=True,
-            )
-        except Exception:
-            pass
-        try:
-            channel_layer = get_channel_layer()
-            async_to_sync(channel_layer.group_send)(
-                f"user_{req.student.id}",
-                {
-                    "type": "notify",
-                    "event": "request_rejected",
-                    "data": {"request_id": req.id, "status": req.status, "recipient_id": req.student.id,
-                             "sender_id": req.mentor.id},
-                },
-            )
-        except Exception:
-            pass
+        queue_mail(
+            subject="Request update",
+            message=f"Unfortunately mentor {req.mentor.username} rejected your request.",
+            from_email=settings.DEFAULT_FROM_EMAIL,
+            recipient_list=[req.student.email],
+        )
+        notify_users([req.student.id], "request_rejected", sender_id=req.mentor.id, request_id=req.id, status=req.status)
         return Response(RequestSerializer(req).data, status=status.HTTP_200_OK)
 
 
 class MentorViewSet(viewsets.ModelViewSet):
     queryset = MentorProfile.objects.select_related("user").all()
-    pagination_class = StandardResultsSetPagination
+    pagination_class = KeysetOrPageNumberPagination
 
     def get_permissions(self):
         if self.action in ["partial_update", "update", "create", "destroy", "me"]:
@@ -315,17 +313,186 @@ class MentorViewSet(viewsets.ModelViewSet):
 
     def get_queryset(self):
         qs = self.queryset
-        skill = self.request.query_params.get("skill")
-        location = self.request.query_params.get("location")
-        if skill:
-            qs = qs.filter(skills__icontains=skill)
+        params = self.request.query_params
+        skills = parse_skill_tags(",".join(params.getlist("skill")))
+        skill_prefix = " ".join(params.get("skill_prefix", "").split()).lower()
+        location = params.get("location")
+        if skills:
+            links = MentorSkill.objects.filter(skill__name__in=skills)
+            if params.get("skill_match", "all") == "any":
+                qs = qs.filter(id__in=links.values("mentor_id"))
+            else:
+                matching = links.values("mentor_id").annotate(n=Count("skill_id")).filter(n=len(skills))
+                qs = qs.filter(id__in=matching.values("mentor_id"))
+        if skill_prefix:
+            qs = qs.filter(id__in=MentorSkill.objects.filter(skill__name__startswith=skill_prefix).values("mentor_id"))
         if location:
             qs = qs.filter(location__icontains=location)
         return qs
 
+    def list(self, request, *args, **kwargs):
+        if request.query_params.get("overlaps_with_me"):
+            return self._list_by_overlap(request)
+        return cached_directory_response(request, "list", lambda: self._list_directory(request, *args, **kwargs))
+
+    def retrieve(self, request, *args, **kwargs):
+        return cached_directory_response(request, "retrieve", lambda: super(MentorViewSet, self).retrieve(
+            request, *args, **kwargs), pk=kwargs.get("pk"))
+
+    def _list_directory(self, request, *args, **kwargs):
+        if request.query_params.get("q"):
+            return self._list_by_search(request)
+        response = super().list(request, *args, **kwargs)
+        if request.query_params.get("facets") and isinstance(response.data, dict):
+            response.data["facets"] = self._skill_facets(self.filter_queryset(self.get_queryset()))
+        return response
+
+    def _skill_facets(self, qs):
+        counts = (
+            MentorSkill.objects.filter(mentor_id__in=qs.order_by().values("id"))
+            .values("skill__name")
+            .annotate(count=Count("mentor_id"))
+            .order_by("-count", "skill__name")[:MAX_SKILL_FACETS]
+        )
+        return [{"name": row["skill__name"], "count": row["count"]} for row in counts]
+
+    @action(detail=False, methods=["get"])
+    def skills(self, request):
+        prefix = " ".join(request.query_params.get("prefix", "").split()).lower()
+        qs = Skill.objects.all()
+        if prefix:
+            qs = qs.filter(name__startswith=prefix)
+        rows = qs.annotate(count=Count("mentor_links")).order_by("-count", "name")[:MAX_SKILL_FACETS]
+        return Response([{"name": skill.name, "count": skill.count} for skill in rows])
+
+    def _list_by_overlap(self, request):
+        if not request.user.is_authenticated:
+            raise exceptions.NotAuthenticated()
+        profile = getattr(request.user, "student_profile", None)
+        if not profile:
+            return Response({"detail": "Student profile not found."}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            min_minutes = int(request.query_params.get("min_minutes", 60))
+        except ValueError:
+            return Response({"detail": "min_minutes must be an integer."}, status=status.HTTP_400_BAD_REQUEST)
+        since = to_epoch_minutes(timezone.now())
+        student_av = profile_availability(profile)
+        rows = [
+            (mentor_id, user_id, stored_availability(compiled, rules, raw))
+            for mentor_id, user_id, compiled, rules, raw in self.get_queryset().values_list(
+                "id", "user_id", "availability_compiled", "availability_rules", "availability")
+        ]
+        # overlap is ranked over a window from the student's first free time, not the whole horizon
+        first = next(iter(iter_availability(student_av, since)), None)
+        start = max(since, first[0]) if first else since
+        until = min(availability_window_end([student_av], since),
+                    start + getattr(settings, 'OVERLAP_RANKING_DAYS', 90) * 24 * 60)
+        busy = busy_intervals([request.user.id] + [user_id for _, user_id, _ in rows], since, until)
+        mentors = (
+            (mentor_id, list(iter_free(av, busy.get(user_id, []), since, until)))
+            for mentor_id, user_id, av in rows
+        )
+        ranked = rank_mentors_by_overlap(
+            # concrete intervals run past `until`; clipping the student's side bounds every overlap
+            list(iter_intersect_intervals(iter_free(student_av, busy.get(request.user.id, []), since, until),
+                                          [[since, until]])),
+            mentors,
+            min_minutes=min_minutes,
+            since=since,
+        )
+        return self._ranked_response([
+            (mentor_id, {"overlap_minutes": overlap, "longest_overlap_minutes": longest})
+            for mentor_id, overlap, longest in ranked
+        ])
+
+    def _list_by_search(self, request):
+        backend, query = get_search_backend(), request.query_params.get("q")
+        ranked, offset = [], 0
+        # the skill/location filters are applied to each batch, so page on until enough mentors pass them
+        for _ in range(MAX_SEARCH_BATCHES):
+            if len(ranked) >= MAX_SEARCH_RESULTS:
+                break
+            batch = backend.search(query, MAX_SEARCH_RESULTS, offset)
+            allowed = set(self.get_queryset().filter(id__in=batch).values_list("id", flat=True))
+            ranked.extend(mentor_id for mentor_id in batch if mentor_id in allowed)
+            if len(batch) < MAX_SEARCH_RESULTS:
+                break
+            offset += len(batch)
+        return self._ranked_response([(mentor_id, {}) for mentor_id in ranked[:MAX_SEARCH_RESULTS]])
+
+    def _ranked_response(self, ranked):
+        page = self.paginate_queryset(ranked)
+        items = page if page is not None else ranked
+        mentors = self.get_queryset().in_bulk([mentor_id for mentor_id, _ in items])
+        data = []
+        for mentor_id, extra in items:
+            row = self.get_serializer(mentors[mentor_id]).data
+            row.update(extra)
+            data.append(row)
+        if page is not None:
+            return self.get_paginated_response(data)
+        return Response(data)
+
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
 
+    @action(detail=True, methods=["get"], permission_classes=[permissions.IsAuthenticated])
+    def group_slots(self, request, pk=None):
+        mentor = self.get_object()
+        if request.user.id != mentor.user_id:
+            return Response({"detail": "Only the mentor can plan group sessions."}, status=status.HTTP_403_FORBIDDEN)
+        params = request.query_params
+        try:
+            student_ids = sorted({int(x) for x in params.get("students", "").split(",") if x.strip()})
+            min_students = int(params.get("min_students", len(student_ids)))
+            duration = int(params.get("duration", 60))
+            step = int(params.get("step", 30))
+            limit = min(int(params.get("limit", 20)), 100)
+            if duration <= 0 or step <= 0 or limit <= 0:
+                raise ValueError()
+        except ValueError:
+            return Response({"detail": "students must be a comma-separated list of ids; duration, step, limit "
+                                       "and min_students must be positive integers."},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if not student_ids or len(student_ids) > MAX_GROUP_STUDENTS:
+            return Response({"detail": f"Provide between 1 and {MAX_GROUP_STUDENTS} students."},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if not 1 <= min_students <= len(student_ids):
+            return Response({"detail": "min_students must be between 1 and the number of students."},
+                            status=status.HTTP_400_BAD_REQUEST)
+        cursor = params.get("after")
+        if cursor:
+            try:
+                after = decode_slot_cursor(cursor)
+            except ValueError:
+                return Response({"detail": "Invalid cursor."}, status=status.HTTP_400_BAD_REQUEST)
+        else:
+            after = to_epoch_minutes(timezone.now()) - 1
+        profiles = {p.user_id: p for p in StudentProfile.objects.filter(user_id__in=student_ids)}
+        missing = [x for x in student_ids if x not in profiles]
+        if missing:
+            return Response({"detail": "Unknown students.", "students": missing}, status=status.HTTP_400_BAD_REQUEST)
+
+        mentor_av = profile_availability(mentor)
+        until = availability_window_end([mentor_av], after)
+        busy = busy_intervals([mentor.user_id] + student_ids, after, until)
+        mentor_free = iter_free(mentor_av, busy.get(mentor.user_id, []), after, until)
+        student_free = {
+            uid: list(iter_free(profile_availability(profiles[uid]), busy.get(uid, []), after, until))
+            for uid in student_ids
+        }
+        if min_students == len(student_ids):
+            common = iter_intersect_many([mentor_free] + list(student_free.values()))
+        else:
+            common = iter_intersect_intervals(mentor_free, iter_coverage(list(student_free.values()), min_students))
+        slots = list(islice(iter_slots(common, duration, step, after=after), limit + 1))
+        results = []
+        for slot, (s, e) in zip(minutes_to_availability(slots[:limit]), slots[:limit]):
+            slot["available_students"] = [uid for uid in student_ids if covers(student_free[uid], s, e)]
+            results.append(slot)
+        next_cursor = encode_slot_cursor(slots[limit - 1][0]) if len(slots) > limit else None
+        return Response({"results": results, "next": next_cursor}, status=status.HTTP_200_OK)
+
     @action(detail=False, methods=["get", "patch"], permission_classes=[permissions.IsAuthenticated])
     def me(self, request):
         user = request.user
@@ -347,20 +514,67 @@ class ProposalViewSet(viewsets.ModelViewSet):
     queryset = Proposal.objects.select_related("mentor", "student").all()
     serializer_class = ProposalSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = OptionalKeysetPagination
 
     def get_queryset(self):
         user = self.request.user
-        return Proposal.objects.filter(mentor=user) | Proposal.objects.filter(student=user)
+        latest_meeting = Meeting.objects.filter(
+            student=OuterRef("student"), mentor=OuterRef("mentor")).order_by("-created_at", "-id").values("id")[:1]
+        return (Proposal.objects.filter(Q(mentor=user) | Q(student=user))
+                .select_related("mentor", "student")
+                .annotate(latest_meeting_id=Subquery(latest_meeting)))
+
+    def retrieve(self, request, *args, **kwargs):
+        instance = self.get_object()
+        attach_latest_meetings([instance])
+        return Response(self.get_serializer(instance).data)
+
+    @action(detail=True, methods=["get"], permission_classes=[permissions.IsAuthenticated])
+    def suggested_slots(self, request, pk=None):
+        proposal = self.get_object()
+        params = request.query_params
+        try:
+            duration = int(params.get("duration", 60))
+            step = int(params.get("step", 30))
+            limit = min(int(params.get("limit", 20)), 100)
+            if duration <= 0 or step <= 0 or limit <= 0:
+                raise ValueError()
+        except ValueError:
+            return Response({"detail": "duration, step and limit must be positive integers."},
+                            status=status.HTTP_400_BAD_REQUEST)
+        cursor = params.get("after")
+        if cursor:
+            try:
+                after = decode_slot_cursor(cursor)
+            except ValueError:
+                return Response({"detail": "Invalid cursor."}, status=status.HTTP_400_BAD_REQUEST)
+        else:
+            after = to_epoch_minutes(timezone.now()) - 1
+        mentor_av = profile_availability(getattr(proposal.mentor, "mentor_profile", None))
+        student_av = profile_availability(getattr(proposal.student, "student_profile", None))
+        until = availability_window_end([mentor_av, student_av], after)
+        busy = busy_intervals([proposal.mentor_id, proposal.student_id], after, until)
+        slots = iter_common_slots(
+            iter_free(mentor_av, busy.get(proposal.mentor_id, []), after, until),
+            iter_free(student_av, busy.get(proposal.student_id, []), after, until),
+            duration, step, after=after,
+        )
+        slots = list(islice(slots, limit + 1))
+        next_cursor = encode_slot_cursor(slots[limit - 1][0]) if len(slots) > limit else None
+        return Response({"results": minutes_to_availability(slots[:limit]), "next": next_cursor},
+                        status=status.HTTP_200_OK)
 
     @action(detail=True, methods=["post"], permission_classes=[permissions.IsAuthenticated])
+    @transaction.atomic
     def propose_slots(self, request, pk=None):
         proposal = self.get_object()
-        if request.user != proposal.mentor:
+        if request.user.id != proposal.mentor_id:
             return Response({"detail": "Only mentor can propose slots."}, status=status.HTTP_403_FORBIDDEN)
         slots = request.data.get("slots")
         if not isinstance(slots, list) or not slots:
             return Response({"detail": "Provide a non-empty list of slots."}, status=status.HTTP_400_BAD_REQUEST)
         valid = []
+        parsed = []
         for it in slots:
             s = it.get("start")
             e = it.get("end")
@@ -372,44 +586,41 @@ class ProposalViewSet(viewsets.ModelViewSet):
             except Exception:
                 return Response({"detail": "Invalid slot format. Use ISO datetimes."},
                                 status=status.HTTP_400_BAD_REQUEST)
+            if exceeds_max_meeting(sd, ed):
+                return Response({"detail": "Slots cannot be longer than 24 hours."}, status=status.HTTP_400_BAD_REQUEST)
             valid.append({"start": s, "end": e})
+            parsed.append((to_epoch_minutes(sd), to_epoch_minutes(ed)))
+        lock_participants([proposal.mentor_id, proposal.student_id])
+        busy = busy_intervals([proposal.mentor_id, proposal.student_id],
+                              min(p[0] for p in parsed), max(p[1] for p in parsed))
+        for s, e in parsed:
+            if overlaps_any(busy.get(proposal.mentor_id, []), s, e) or overlaps_any(busy.get(proposal.student_id, []), s, e):
+                return Response({"detail": "Slot overlaps an existing meeting.",
+                                 "slot": minutes_to_availability([(s, e)])[0]},
+                                status=status.HTTP_400_BAD_REQUEST)
         proposal.slots = valid
         proposal.status = "pending"
         proposal.save()
-        try:
-            frontend_url = getattr(settings, 'FRONTEND_URL', 'http://localhost:5173')
-            send_mail(
-                subject="Time proposal from mentor",
-                message=(
-                        f"Mentor {proposal.mentor.username} proposed slots:\n\n"
-                        + "\n".join([f"{x['start']} - {x['end']}" for x in valid])
-                        + f"\n\nChoose a slot in your dashboard: {frontend_url}/proposals/{proposal.id}"
-                ),
-                from_email=settings.DEFAULT_FROM_EMAIL,
-                recipient_list=[proposal.student.email],
-                fail_silently=True,
-            )
-        except Exception:
-            pass
-        try:
-            channel_layer = get_channel_layer()
-            async_to_sync(channel_layer.group_send)(
-                f"user_{proposal.student.id}",
-                {
-                    "type": "notify",
-                    "event": "mentor_proposed_slots",
-                    "data": {"proposal_id": proposal.id, "slots": proposal.slots, "recipient_id": proposal.student.id,
-                             "sender_id": proposal.mentor.id},
-                },
-            )
-        except Exception:
-            pass
+        frontend_url = getattr(settings, 'FRONTEND_URL', 'http://localhost:5173')
+        queue_mail(
+            subject="Time proposal from mentor",
+            message=(
+                    f"Mentor {proposal.mentor.username} proposed slots:\n\n"
+                    + "\n".join([f"{x['start']} - {x['end']}" for x in valid])
+                    + f"\n\nChoose a slot in your dashboard: {frontend_url}/proposals/{proposal.id}"
+            ),
+            from_email=settings.DEFAULT_FROM_EMAIL,
+            recipient_list=[proposal.student.email],
+        )
+        notify_users([proposal.student.id], "mentor_proposed_slots", sender_id=proposal.mentor.id,
+                     proposal_id=proposal.id, slots=proposal.slots)
         return Response(ProposalSerializer(proposal).data, status=status.HTTP_200_OK)
 
     @action(detail=True, methods=["post"])
+    @transaction.atomic
     def select(self, request, pk=None):
         proposal = self.get_object()
-        if request.user != proposal.student:
+        if request.user.id != proposal.student_id:
             return Response({"detail": "Only student can choose a slot."}, status=status.HTTP_403_FORBIDDEN)
         if proposal.status != "pending":
             return Response({"detail": "Cannot select on non-pending proposal."}, status=status.HTTP_400_BAD_REQUEST)
@@ -426,67 +637,33 @@ class ProposalViewSet(viewsets.ModelViewSet):
                 raise ValueError("Invalid datetimes")
         except Exception:
             return Response({"detail": "Invalid chosen slot format."}, status=status.HTTP_400_BAD_REQUEST)
+        if exceeds_max_meeting(start_dt, end_dt):
+            return Response({"detail": "Meetings cannot be longer than 24 hours."}, status=status.HTTP_400_BAD_REQUEST)
+        lock_participants([proposal.mentor_id, proposal.student_id])
+        if has_conflict([proposal.mentor_id, proposal.student_id], start_dt, end_dt):
+            return Response({"detail": "Slot overlaps an existing meeting."}, status=status.HTTP_400_BAD_REQUEST)
         proposal.chosen_slot = chosen
         proposal.status = "confirmed"
         proposal.save()
-        meet_link = create_google_meet_event(
-            start_dt,
-            end_dt,
-            summary=f"Meeting: {proposal.student.username} & {proposal.mentor.username}",
-            description=proposal.request.message or '',
-            attendees_emails=[proposal.student.email, proposal.mentor.email],
-            organizer_email=proposal.mentor.email
-        )
         meeting = Meeting.objects.create(
             mentor=proposal.mentor,
             student=proposal.student,
             start=start_dt,
             end=end_dt,
             status="scheduled",
-            meet_link=meet_link,
+            link_status="pending",
         )
-        try:
-            send_mail(
-                subject="Meeting scheduled",
-                message=(
-                    f"Meeting between {proposal.student.username} and {proposal.mentor.username} scheduled for {chosen.get('start')} — {chosen.get('end')}.\n\n"
-                    f"Meet link: {meet_link}"
-                ),
-                from_email=settings.DEFAULT_FROM_EMAIL,
-                recipient_list=[proposal.student.email, proposal.mentor.email],
-                fail_silently=True,
-            )
-        except Exception:
-            pass
-        try:
-            channel_layer = get_channel_layer()
-            async_to_sync(channel_layer.group_send)(
-                f"user_{proposal.student.id}",
-                {
-                    "type": "notify",
-                    "event": "proposal_confirmed",
-                    "data": {"proposal_id": proposal.id, "meeting_id": meeting.id, "meet_link": meet_link,
-                             "recipient_id": proposal.student.id, "sender_id": proposal.student.id},
-                },
-            )
-            async_to_sync(channel_layer.group_send)(
-                f"user_{proposal.mentor.id}",
-                {
-                    "type": "notify",
-                    "event": "proposal_confirmed",
-                    "data": {"proposal_id": proposal.id, "meeting_id": meeting.id, "meet_link": meet_link,
-                             "recipient_id": proposal.mentor.id, "sender_id": proposal.student.id},
-                },
-            )
-        except Exception:
-            pass
+        schedule_meet_link(meeting)
+        notify_users([proposal.student.id, proposal.mentor.id], "proposal_confirmed", sender_id=proposal.student.id,
+                     proposal_id=proposal.id, meeting_id=meeting.id, link_status=meeting.link_status)
         return Response({"proposal": ProposalSerializer(proposal).data, "meeting": MeetingSerializer(meeting).data},
                         status=status.HTTP_201_CREATED)
 
     @action(detail=True, methods=["post"], permission_classes=[permissions.IsAuthenticated])
+    @transaction.atomic
     def confirm(self, request, pk=None):
         proposal = self.get_object()
-        if request.user != proposal.mentor:
+        if request.user.id != proposal.mentor_id:
             return Response({"detail": "Only mentor can confirm."}, status=status.HTTP_403_FORBIDDEN)
         if proposal.status != "student_chosen":
             return Response({"detail": "No slot chosen by student yet."}, status=status.HTTP_400_BAD_REQUEST)
@@ -498,66 +675,32 @@ class ProposalViewSet(viewsets.ModelViewSet):
                 raise ValueError("Invalid datetimes")
         except Exception:
             return Response({"detail": "Invalid chosen slot format."}, status=status.HTTP_400_BAD_REQUEST)
-        meet_link = create_google_meet_event(
-            start_dt,
-            end_dt,
-            summary=f"Meeting: {proposal.student.username} & {proposal.mentor.username}",
-            description=proposal.request.message or '',
-            attendees_emails=[proposal.student.email, proposal.mentor.email],
-            organizer_email=proposal.mentor.email
-        )
+        if exceeds_max_meeting(start_dt, end_dt):
+            return Response({"detail": "Meetings cannot be longer than 24 hours."}, status=status.HTTP_400_BAD_REQUEST)
+        lock_participants([proposal.mentor_id, proposal.student_id])
+        if has_conflict([proposal.mentor_id, proposal.student_id], start_dt, end_dt):
+            return Response({"detail": "Slot overlaps an existing meeting."}, status=status.HTTP_400_BAD_REQUEST)
         meeting = Meeting.objects.create(
             mentor=proposal.mentor,
             student=proposal.student,
             start=start_dt,
             end=end_dt,
             status="scheduled",
-            meet_link=meet_link,
+            link_status="pending",
         )
+        schedule_meet_link(meeting)
         proposal.status = "confirmed"
         proposal.save()
-        try:
-            send_mail(
-                subject="Meeting scheduled",
-                message=(
-                    f"Meeting between {proposal.student.username} and {proposal.mentor.username} scheduled for {chosen.get('start')} — {chosen.get('end')}.\n\n"
-                    f"Meet link: {meet_link}"
-                ),
-                from_email=settings.DEFAULT_FROM_EMAIL,
-                recipient_list=[proposal.student.email, proposal.mentor.email],
-                fail_silently=True,
-            )
-        except Exception:
-            pass
-        try:
-            channel_layer = get_channel_layer()
-            async_to_sync(channel_layer.group_send)(
-                f"user_{proposal.student.id}",
-                {
-                    "type": "notify",
-                    "event": "proposal_confirmed",
-                    "data": {"proposal_id": proposal.id, "meeting_id": meeting.id, "meet_link": meet_link,
-                             "recipient_id": proposal.student.id, "sender_id": proposal.mentor.id},
-                },
-            )
-            async_to_sync(channel_layer.group_send)(
-                f"user_{proposal.mentor.id}",
-                {
-                    "type": "notify",
-                    "event": "proposal_confirmed",
-                    "data": {"proposal_id": proposal.id, "meeting_id": meeting.id, "meet_link": meet_link,
-                             "recipient_id": proposal.mentor.id, "sender_id": proposal.mentor.id},
-                },
-            )
-        except Exception:
-            pass
+        notify_users([proposal.student.id, proposal.mentor.id], "proposal_confirmed", sender_id=proposal.mentor.id,
+                     proposal_id=proposal.id, meeting_id=meeting.id, link_status=meeting.link_status)
         return Response({"proposal": ProposalSerializer(proposal).data, "meeting": MeetingSerializer(meeting).data},
                         status=status.HTTP_201_CREATED)
 
     @action(detail=True, methods=["post"], permission_classes=[permissions.IsAuthenticated])
+    @transaction.atomic
     def clear_chosen(self, request, pk=None):
         proposal = self.get_object()
-        if request.user != proposal.mentor:
+        if request.user.id != proposal.mentor_id:
             return Response({"detail": "Only mentor can clear chosen slot."}, status=status.HTTP_403_FORBIDDEN)
         if not proposal.chosen_slot:
             return Response({"detail": "No chosen slot to clear."}, status=status.HTTP_400_BAD_REQUEST)
@@ -565,34 +708,19 @@ class ProposalViewSet(viewsets.ModelViewSet):
         proposal.chosen_slot = None
         proposal.status = "pending"
         proposal.save()
-        try:
-            frontend_url = getattr(settings, 'FRONTEND_URL', 'http://localhost:5173')
-            send_mail(
-                subject="Chosen slot was removed",
-                message=(
-                    f"Hello {proposal.student.username},\n\n"
-                    f"The mentor {proposal.mentor.username} removed the previously chosen slot {old.get('start')} — {old.get('end')}.\n"
-                    f"Please check the mentor's dashboard and choose another slot if available: {frontend_url}/proposals/{proposal.id}"
-                ),
-                from_email=settings.DEFAULT_FROM_EMAIL,
-                recipient_list=[proposal.student.email],
-                fail_silently=True,
-            )
-        except Exception:
-            pass
-        try:
-            channel_layer = get_channel_layer()
-            async_to_sync(channel_layer.group_send)(
-                f"user_{proposal.student.id}",
-                {
-                    "type": "notify",
-                    "event": "chosen_cleared",
-                    "data": {"proposal_id": proposal.id, "old_slot": old, "recipient_id": proposal.student.id,
-                             "sender_id": proposal.mentor.id},
-                },
-            )
-        except Exception:
-            pass
+        frontend_url = getattr(settings, 'FRONTEND_URL', 'http://localhost:5173')
+        queue_mail(
+            subject="Chosen slot was removed",
+            message=(
+                f"Hello {proposal.student.username},\n\n"
+                f"The mentor {proposal.mentor.username} removed the previously chosen slot {old.get('start')} — {old.get('end')}.\n"
+                f"Please check the mentor's dashboard and choose another slot if available: {frontend_url}/proposals/{proposal.id}"
+            ),
+            from_email=settings.DEFAULT_FROM_EMAIL,
+            recipient_list=[proposal.student.email],
+        )
+        notify_users([proposal.student.id], "chosen_cleared", sender_id=proposal.mentor.id,
+                     proposal_id=proposal.id, old_slot=old)
         return Response(ProposalSerializer(proposal).data, status=status.HTTP_200_OK)
 
 
@@ -600,10 +728,12 @@ class MeetingViewSet(viewsets.ModelViewSet):
     queryset = Meeting.objects.select_related("mentor", "student").all()
     serializer_class = MeetingSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = OptionalKeysetPagination
 
     def get_queryset(self):
         user = self.request.user
-        return Meeting.objects.filter(mentor=user) | Meeting.objects.filter(student=user)
+        return (Meeting.objects.filter(Q(mentor=user) | Q(student=user))
+                .select_related("mentor__mentor_profile", "student__student_profile"))
 
     @action(detail=True, methods=["post"], permission_classes=[permissions.IsAuthenticated])
     def feedback(self, request, pk=None):
@@ -614,7 +744,7 @@ class MeetingViewSet(viewsets.ModelViewSet):
         liked = payload.get("liked")
         cont = payload.get("continue")
         changed = False
-        if user == meeting.student:
+        if user.id == meeting.student_id:
             if attended is not None:
                 meeting.student_attended = bool(attended)
                 changed = True
@@ -624,7 +754,7 @@ class MeetingViewSet(viewsets.ModelViewSet):
             if cont is not None:
                 meeting.student_continue = bool(cont)
                 changed = True
-        elif user == meeting.mentor:
+        elif user.id == meeting.mentor_id:
             if attended is not None:
                 meeting.mentor_attended = bool(attended)
                 changed = True
@@ -661,6 +791,49 @@ class MeetingViewSet(viewsets.ModelViewSet):
         return Response({"detail": "feedback_saved"}, status=status.HTTP_200_OK)
 
 
+class NotificationViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    The user's inbox, newest first. `since` is a best-effort cursor: a notification whose transaction commits
+    after a higher id was already read can fall below it (see inbox_since).
+    """
+
+    serializer_class = NotificationSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    pagination_class = OptionalKeysetPagination
+
+    def get_queryset(self):
+        qs = Notification.objects.filter(recipient=self.request.user).order_by("-id")
+        since = self.request.query_params.get("since")
+        if since:
+            if not since.isdigit():
+                raise exceptions.ValidationError({"since": "Expected a notification id"})
+            qs = qs.filter(id__gt=int(since))
+        if self.request.query_params.get("unread") in ("1", "true"):
+            qs = qs.filter(read_at__isnull=True)
+        return qs
+
+    @action(detail=False, methods=["get"])
+    def unread_count(self, request):
+        counts = Notification.objects.filter(recipient=request.user).aggregate(
+            unread=Count("id", filter=Q(read_at__isnull=True)), latest_id=Max("id"))
+        return Response(counts, status=status.HTTP_200_OK)
+
+    @action(detail=False, methods=["post"])
+    def mark_read(self, request):
+        # {"ids": [...]} marks those, {"up_to": id} everything up to and including it, an empty body all
+        payload = request.data or {}
+        qs = Notification.objects.filter(recipient=request.user, read_at__isnull=True)
+        ids, up_to = payload.get("ids"), payload.get("up_to")
+        try:
+            if ids is not None:
+                qs = qs.filter(id__in=[int(pk) for pk in ids])
+            if up_to is not None:
+                qs = qs.filter(id__lte=int(up_to))
+        except (TypeError, ValueError):
+            return Response({"detail": "ids and up_to must be notification ids"}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({"updated": qs.update(read_at=timezone.now())}, status=status.HTTP_200_OK)
+
+
 class GoogleLoginView(APIView):
     permission_classes = [permissions.AllowAny]
     authentication_classes = []
@@ -671,19 +844,13 @@ class GoogleLoginView(APIView):
             return Response({'error': 'No token provided'}, status=status.HTTP_400_BAD_REQUEST)
         try:
             try:
-                from google.oauth2 import id_token
-                from google.auth.transport import requests as google_requests
-            except Exception:
+                id_info = get_google_verifier().verify(token, os.getenv('GOOGLE_CLIENT_ID'))
+            except ImportError:
                 return Response({'error': 'Google auth library not available'}, status=status.HTTP_400_BAD_REQUEST)
-            id_info = id_token.verify_oauth2_token(
-                token,
-                google_requests.Request(),
-                os.getenv('GOOGLE_CLIENT_ID')
-            )
             email = id_info['email']
             try:
                 user = User.objects.get(email=email)
-                refresh = RefreshToken.for_user(user)
+                refresh = FamilyRefreshToken.for_user(user)
                 return Response({
                     'status': 'login_success',
                     'refresh': str(refresh),
@@ -722,15 +889,9 @@ class GoogleRegisterView(APIView):
 
         try:
             try:
-                from google.oauth2 import id_token
-                from google.auth.transport import requests as google_requests
-            except Exception:
+                id_info = get_google_verifier().verify(token, os.getenv('GOOGLE_CLIENT_ID'))
+            except ImportError:
                 return Response({'error': 'Google auth library not available'}, status=status.HTTP_400_BAD_REQUEST)
-            id_info = id_token.verify_oauth2_token(
-                token,
-                google_requests.Request(),
-                os.getenv('GOOGLE_CLIENT_ID')
-            )
             email = id_info['email']
 
             if User.objects.filter(email=email).exists():
@@ -753,7 +914,7 @@ class GoogleRegisterView(APIView):
             else:
                 StudentProfile.objects.create(user=user, whatsapp_username=whatsapp)
 
-            refresh = RefreshToken.for_user(user)
+            refresh = FamilyRefreshToken.for_user(user)
             return Response({
                 'refresh': str(refresh),
                 'access': str(refresh.access_token),
@@ -0,0 +1,48 @@
+from urllib.parse import parse_qs
+
+from asgiref.sync import sync_to_async
+from channels.middleware import BaseMiddleware
+from django.contrib.auth.models import AnonymousUser
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.tokens import AccessToken
+
+from .tokens import revoked_families, token_family
+
+# browsers can't set headers on a websocket, so the access token comes either as ?token= or as the
+# subprotocol pair ["jwt", "<token>"]; in the latter case the handshake must answer with "jwt"
+SUBPROTOCOL = "jwt"
+
+
+def token_from_scope(scope):
+    """Return (raw access token, subprotocol to accept) from a websocket scope."""
+    subprotocols = list(scope.get("subprotocols") or [])
+    if SUBPROTOCOL in subprotocols:
+        index = subprotocols.index(SUBPROTOCOL)
+        if index + 1 < len(subprotocols):
+            return subprotocols[index + 1], SUBPROTOCOL
+    tokens = parse_qs(scope.get("query_string", b"").decode()).get("token")
+    return (tokens[0] if tokens else None), None
+
+
+async def authenticate_scope(scope):
+    # signature and expiry only: the user is rebuilt from the claims, never loaded from the database
+    raw, subprotocol = token_from_scope(scope)
+    if not raw:
+        return AnonymousUser(), None
+    try:
+        token = AccessToken(raw)
+    except TokenError:
+        return AnonymousUser(), None
+    if await sync_to_async(revoked_families.is_revoked, thread_sensitive=False)(token_family(token)):
+        return AnonymousUser(), None
+    return TokenUser(token), subprotocol
+
+
+class JWTAuthMiddleware(BaseMiddleware):
+    """Sets scope["user"] from a simplejwt access token; unauthenticated sockets get AnonymousUser."""
+
+    async def __call__(self, scope, receive, send):
+        scope = dict(scope)
+        scope["user"], scope["jwt_subprotocol"] = await authenticate_scope(scope)
+        return await super().__call__(scope, receive, send)
@@ -9,15 +9,18 @@ https://docs.djangoproject.com/en/4.2/howto/deployment/asgi/
 
 import os
 from django.core.asgi import get_asgi_application
-from channels.routing import ProtocolTypeRouter, URLRouter
-from channels.auth import AuthMiddlewareStack
-import backend.routing
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
+# set up Django before importing the consumers, which use the models
+django_asgi_app = get_asgi_application()
+
+from channels.routing import ProtocolTypeRouter, URLRouter  # noqa: E402
+from backend.ws_auth import JWTAuthMiddleware  # noqa: E402
+import backend.routing  # noqa: E402
 
 application = ProtocolTypeRouter({
-    "http": get_asgi_application(),
-    "websocket": AuthMiddlewareStack(
+    "http": django_asgi_app,
+    "websocket": JWTAuthMiddleware(
         URLRouter(
             backend.routing.websocket_urlpatterns
         )
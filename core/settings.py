@@ -25,6 +25,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'backend.middleware.QueryStatsMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -67,6 +68,20 @@ DATABASES = {
     }
 }
 
+if DATABASES['default']['ENGINE'] == 'django.db.backends.sqlite3':
+    # several worker processes write the same file (outbox, channel layer); wait for the lock instead of failing
+    DATABASES['default']['OPTIONS'] = {'timeout': int(os.getenv('DB_TIMEOUT', '20'))}
+
+# with more than one worker use a shared backend (Redis/Memcached) so JWT revocations reach them all
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', 'mentormatch'),
+    }
+}
+MENTOR_DIRECTORY_CACHE = os.getenv('MENTOR_DIRECTORY_CACHE', 'default')
+MENTOR_DIRECTORY_CACHE_TIMEOUT = int(os.getenv('MENTOR_DIRECTORY_CACHE_TIMEOUT', 300))
+
 AUTH_PASSWORD_VALIDATORS = [
     {'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator'},
     {'NAME': 'django.contrib.auth.password_validation.MinimumLengthValidator'},
@@ -93,7 +108,7 @@ CORS_ALLOW_CREDENTIALS = True
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'backend.authentication.CachedJWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticatedOrReadOnly',
@@ -114,11 +129,56 @@ FRONTEND_URL = os.getenv('FRONTEND_URL', 'http://localhost:5173')
 GOOGLE_SERVICE_ACCOUNT_FILE = os.getenv('GOOGLE_SERVICE_ACCOUNT_FILE', str(BASE_DIR / 'service-account.json'))
 GOOGLE_CALENDAR_ID = os.getenv('GOOGLE_CALENDAR_ID', 'primary')
 GOOGLE_IMPERSONATE_USER = os.getenv('GOOGLE_IMPERSONATE_USER', 'mentorship-project')
+GOOGLE_MEET_STRATEGY_TTL = int(os.getenv('GOOGLE_MEET_STRATEGY_TTL', 3600))
+# calendar clients built per organizer (impersonation subject), least recently used dropped first
+GOOGLE_CALENDAR_CLIENT_POOL_SIZE = int(os.getenv('GOOGLE_CALENDAR_CLIENT_POOL_SIZE', 256))
+CALENDAR_BACKEND = os.getenv('CALENDAR_BACKEND', 'backend.calendar_backends.GoogleCalendarBackend')
+# not read from the environment: tests swap in FakeGoogleIdTokenVerifier with override_settings
+GOOGLE_ID_TOKEN_VERIFIER = 'backend.google_auth.GoogleIdTokenVerifier'
+# 'worker' needs `manage.py provision_meet_links --loop` running (it also retries 'thread'/'inline' failures)
+MEET_LINK_PROVISIONING = os.getenv('MEET_LINK_PROVISIONING', 'worker')
+# seconds a provisioning job holds its claim on a meeting before another job may take the meeting over
+MEET_LINK_LEASE_SECONDS = int(os.getenv('MEET_LINK_LEASE_SECONDS', 300))
+AVAILABILITY_HORIZON_DAYS = int(os.getenv('AVAILABILITY_HORIZON_DAYS', 365))
+# ?overlaps_with_me ranks mentors by the overlap in this many days from the student's first free time
+OVERLAP_RANKING_DAYS = int(os.getenv('OVERLAP_RANKING_DAYS', 90))
+QUERY_STATS = os.getenv('QUERY_STATS', 'False') == 'True'
+
+SIMPLE_JWT = {
+    # tags refresh tokens with a family claim so a logout can revoke the access tokens minted from them
+    'TOKEN_OBTAIN_SERIALIZER': 'backend.tokens.FamilyTokenObtainPairSerializer',
+    # checks the blacklist through the in-memory filter in backend.blacklist
+    'TOKEN_REFRESH_SERIALIZER': 'backend.tokens.FamilyTokenRefreshSerializer',
+}
+# how often each process pulls new blacklist rows into its filter, and rebuilds it to drop expired tokens
+JWT_BLACKLIST_SYNC_INTERVAL = float(os.getenv('JWT_BLACKLIST_SYNC_INTERVAL', 2))
+JWT_BLACKLIST_REBUILD_INTERVAL = float(os.getenv('JWT_BLACKLIST_REBUILD_INTERVAL', 3600))
+# seconds blacklist rows keep being re-read, so rows committed out of id order are still picked up
+JWT_BLACKLIST_SYNC_MARGIN = float(os.getenv('JWT_BLACKLIST_SYNC_MARGIN', 60))
+# shared cache for revoked token families, and seconds a process trusts its local answer
+JWT_REVOCATION_CACHE = os.getenv('JWT_REVOCATION_CACHE', 'default')
+JWT_REVOCATION_LOCAL_TTL = int(os.getenv('JWT_REVOCATION_LOCAL_TTL', 10))
+# users resolved by CachedJWTAuthentication: shared cache entry lifetime and per-process memo
+JWT_USER_CACHE = os.getenv('JWT_USER_CACHE', 'default')
+JWT_USER_CACHE_TIMEOUT = int(os.getenv('JWT_USER_CACHE_TIMEOUT', 300))
+JWT_USER_CACHE_LOCAL_TTL = int(os.getenv('JWT_USER_CACHE_LOCAL_TTL', 5))
+# put the role in issued tokens so role checks skip the user lookup until the token expires
+JWT_ROLE_CLAIM = os.getenv('JWT_ROLE_CLAIM', 'False') == 'True'
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {'console': {'class': 'logging.StreamHandler'}},
+    'loggers': {
+        'backend.queries': {'handlers': ['console'], 'level': os.getenv('QUERY_STATS_LOG_LEVEL', 'INFO')},
+    },
+}
 
 os.environ['SSL_CERT_FILE'] = certifi.where()
 
 CHANNEL_LAYERS = {
     "default": {
-        "BACKEND": "channels.layers.InMemoryChannelLayer"
+        # in-memory suits one process; several workers need channels_redis or backend.channel_layer.DatabaseChannelLayer
+        "BACKEND": os.getenv('CHANNEL_LAYER_BACKEND', 'channels.layers.InMemoryChannelLayer'),
     }
 }
\ No newline at end of file